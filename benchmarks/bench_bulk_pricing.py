@@ -0,0 +1,49 @@
+"""
+Benchmark of bulk pricing a venue's delivery area with the scalar functions versus the NumPy path in bulk_pricing.py.
+
+Run from the project root with:
+    python -m benchmarks.bench_bulk_pricing --points 10000 1000000
+"""
+import argparse
+import random
+import time
+from dopc.bulk_pricing import computeDistances, computeDeliveryFees, HAVE_NUMPY
+from dopc.pricing import PricingTable
+from benchmarks.fake_home_api import buildDynamicPayload
+
+VENUE_LAT, VENUE_LON = 60.17012143, 24.92813512
+
+
+def timeRun(user_lats, user_lons, table, use_numpy: bool) -> float:
+    start = time.perf_counter()
+    distances = computeDistances(user_lats, user_lons, VENUE_LAT, VENUE_LON, use_numpy=use_numpy)
+    computeDeliveryFees(distances, table, use_numpy=use_numpy)
+    return time.perf_counter() - start
+
+
+def main(point_counts: list):
+    if not HAVE_NUMPY:
+        print("NumPy is not installed, only the pure Python fallback can be measured")
+    delivery_specs = buildDynamicPayload("home-assignment-venue-helsinki")["venue_raw"]["delivery_specs"]
+    table = PricingTable(
+        delivery_specs["order_minimum_no_surcharge"],
+        delivery_specs["delivery_pricing"]["base_price"],
+        delivery_specs["delivery_pricing"]["distance_ranges"],
+    )
+    rng = random.Random(0)
+    for count in point_counts:
+        user_lats = [VENUE_LAT + rng.uniform(-0.03, 0.03) for _ in range(count)]
+        user_lons = [VENUE_LON + rng.uniform(-0.05, 0.05) for _ in range(count)]
+        python_time = timeRun(user_lats, user_lons, table, use_numpy=False)
+        line = f"{count:>9} points: pure Python {python_time:8.3f}s"
+        if HAVE_NUMPY:
+            numpy_time = timeRun(user_lats, user_lons, table, use_numpy=True)
+            line += f", NumPy {numpy_time:8.3f}s ({python_time / numpy_time:.0f}x)"
+        print(line)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--points", type=int, nargs="+", default=[10000, 1000000], help="Numbers of user locations to price")
+    args = parser.parse_args()
+    main(args.points)
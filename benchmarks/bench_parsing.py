@@ -0,0 +1,83 @@
+"""
+Benchmark of decoding and parsing large venue payloads, as the Home Assignment API returns them with many fields
+DOPC does not use: the previous json.loads() and indexing, against venue_parsing.py with the json module
+and with orjson (if installed), including the validation of the distance ranges.
+
+Run from the project root with:
+    python -m benchmarks.bench_parsing
+
+Results are printed and saved as JSON in benchmarks/results/ (or --output).
+"""
+import argparse
+import json
+import random
+import timeit
+from dopc import venue_parsing
+from dopc.venue_parsing import decodeJson, parseStaticPayload, parseDynamicPayload
+from benchmarks.reporting import saveResults
+
+
+def buildLargePayloads(rng: random.Random, extra_items: int, tiers: int):
+    """
+    This function returns a static and a dynamic payload as JSON bytes, padded with realistic unused fields.
+    """
+    padding = {
+        "name": [{"lang": lang, "value": f"Venue {lang}"} for lang in ("en", "fi", "sv", "de", "ja")],
+        "opening_times": {day: [{"type": "open", "value": rng.randrange(86400)}] for day in ("monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday")},
+        "items": [{"id": f"item-{idx}", "name": f"Item {idx}", "price": rng.randrange(100, 5000), "tags": ["vegan", "spicy"][: idx % 3],
+                   "image": f"https://example.invalid/{idx}.jpg", "description": "x" * rng.randrange(20, 200)} for idx in range(extra_items)],
+    }
+    static_payload = {"venue_raw": {"location": {"coordinates": [24.92813512, 60.17012143]}, **padding}}
+    distance_ranges = [{"min": idx * 250, "max": (idx + 1) * 250, "a": idx * 10, "b": idx % 3, "flag": None} for idx in range(tiers)]
+    distance_ranges.append({"min": tiers * 250, "max": 0, "a": 0, "b": 0, "flag": None})
+    dynamic_payload = {"venue_raw": {"delivery_specs": {
+        "order_minimum_no_surcharge": 1000,
+        "delivery_pricing": {"base_price": 190, "distance_ranges": distance_ranges},
+        "delivery_enabled": True,
+    }, **padding}}
+    return json.dumps(static_payload).encode(), json.dumps(dynamic_payload).encode()
+
+
+def parseWithIndexing(static_body: bytes, dynamic_body: bytes):
+    # What fetchStaticData() and fetchDynamicData() used to do with response.json()
+    static_data = json.loads(static_body)
+    dynamic_data = json.loads(dynamic_body)
+    venue_coordinates = static_data["venue_raw"]["location"]["coordinates"]
+    delivery_specs = dynamic_data["venue_raw"]["delivery_specs"]
+    return venue_coordinates, delivery_specs["order_minimum_no_surcharge"], delivery_specs["delivery_pricing"]["base_price"], delivery_specs["delivery_pricing"]["distance_ranges"]
+
+
+def parseWithVenueParsing(static_body: bytes, dynamic_body: bytes):
+    return parseStaticPayload(decodeJson(static_body)), parseDynamicPayload(decodeJson(dynamic_body))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--items", type=int, default=500, help="Unused items padding each payload")
+    parser.add_argument("--tiers", type=int, default=16, help="Distance ranges of the venue")
+    parser.add_argument("--number", type=int, default=200, help="Parses per repeat")
+    parser.add_argument("--repeat", type=int, default=5, help="Repeats, the best one is reported")
+    parser.add_argument("--output", help="Path of the JSON results file")
+    args = parser.parse_args()
+
+    static_body, dynamic_body = buildLargePayloads(random.Random(0), args.items, args.tiers)
+    orjson = venue_parsing.orjson
+
+    def timeParse(function) -> float:
+        return min(timeit.repeat(lambda: function(static_body, dynamic_body), number=args.number, repeat=args.repeat)) / args.number * 1e6
+
+    results = {"payload_bytes": len(static_body) + len(dynamic_body), "us_per_venue": {}}
+    results["us_per_venue"]["json_indexing"] = timeParse(parseWithIndexing)
+    venue_parsing.orjson = None
+    results["us_per_venue"]["venue_parsing_json"] = timeParse(parseWithVenueParsing)
+    venue_parsing.orjson = orjson
+    if orjson is not None:
+        results["us_per_venue"]["venue_parsing_orjson"] = timeParse(parseWithVenueParsing)
+    print(f"static + dynamic payload: {results['payload_bytes']} bytes")
+    for name, us in results["us_per_venue"].items():
+        print(f"{name:>22}: {us:8.1f} us/venue")
+    print(f"results saved to {saveResults('parsing', results, args.output)}")
+
+
+if __name__ == "__main__":
+    main()
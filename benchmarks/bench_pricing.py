@@ -0,0 +1,45 @@
+"""
+Microbenchmark comparing computeDeliveryFeeAndSurcharge() on raw distance_ranges dicts
+against a compiled PricingTable, for venues with few and many distance tiers.
+
+Run from the project root with:
+    python -m benchmarks.bench_pricing
+"""
+import random
+import timeit
+from dopc.helpers import computeDeliveryFeeAndSurcharge
+from dopc.pricing import PricingTable
+
+
+def buildDistanceRanges(tiers: int, tier_width: int = 250) -> list:
+    distance_ranges = [
+        {"min": idx * tier_width, "max": (idx + 1) * tier_width, "a": idx * 10, "b": idx % 3, "flag": None}
+        for idx in range(tiers)
+    ]
+    distance_ranges.append({"min": tiers * tier_width, "max": 0, "a": 0, "b": 0, "flag": None})
+    return distance_ranges
+
+
+def main():
+    rng = random.Random(0)
+    for tiers in (4, 16, 64, 256):
+        distance_ranges = buildDistanceRanges(tiers)
+        table = PricingTable(1000, 190, distance_ranges)
+        distances = [rng.randrange(0, tiers * 250) for _ in range(1000)]
+
+        def runDicts():
+            for distance in distances:
+                computeDeliveryFeeAndSurcharge(800, distance, 1000, 190, distance_ranges)
+
+        def runTable():
+            for distance in distances:
+                table.computeDeliveryFeeAndSurcharge(800, distance)
+
+        dicts_time = min(timeit.repeat(runDicts, number=20, repeat=5)) / (20 * len(distances))
+        table_time = min(timeit.repeat(runTable, number=20, repeat=5)) / (20 * len(distances))
+        print(f"{tiers:>4} tiers: dict scan {dicts_time * 1e9:8.0f} ns/quote, "
+              f"PricingTable {table_time * 1e9:6.0f} ns/quote ({dicts_time / table_time:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+Microbenchmark of the response serialization of the pricing endpoint: what FastAPI does with a returned dict
+or a raised HTTPException, against the price template and prebuilt error responses of responses.py.
+
+Run from the project root with:
+    python -m benchmarks.bench_responses
+
+Results are printed and saved as JSON in benchmarks/results/ (or --output).
+"""
+import argparse
+import timeit
+from fastapi import HTTPException
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from dopc.responses import renderPrice, renderError, jsonResponse
+from dopc.service import DELIVERY_DISTANCE_TOO_LARGE_DETAIL, DELIVERY_DISTANCE_TOO_LARGE_RESPONSE, getInvalidParamsDetail
+from benchmarks.reporting import saveResults
+
+
+def raiseAndHandle(status_code: int, detail) -> JSONResponse:
+    # An HTTPException is raised through the endpoint and rendered by FastAPI's http_exception_handler()
+    try:
+        raise HTTPException(status_code=status_code, detail=detail)
+    except HTTPException as e:
+        return JSONResponse({"detail": e.detail}, status_code=e.status_code, headers=e.headers)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--number", type=int, default=20000, help="Calls per repeat")
+    parser.add_argument("--repeat", type=int, default=5, help="Repeats, the best one is reported")
+    parser.add_argument("--output", help="Path of the JSON results file")
+    args = parser.parse_args()
+
+    price = {"total_price": 1190, "small_order_surcharge": 0, "cart_value": 1000, "delivery": {"fee": 190, "distance": 177}}
+    invalid_params = {"cart_value": -100, "user_lat": 91.0}
+    cases = {
+        "price": (
+            lambda: JSONResponse(jsonable_encoder(price)),
+            lambda: jsonResponse(renderPrice(price)),
+        ),
+        "out_of_range": (
+            lambda: raiseAndHandle(400, DELIVERY_DISTANCE_TOO_LARGE_DETAIL),
+            DELIVERY_DISTANCE_TOO_LARGE_RESPONSE.response,
+        ),
+        "invalid_params": (
+            lambda: raiseAndHandle(400, getInvalidParamsDetail(invalid_params)),
+            lambda: jsonResponse(renderError(getInvalidParamsDetail(invalid_params)), 400),
+        ),
+    }
+    results = {}
+    for name, (fastapi_path, fast_path) in cases.items():
+        fastapi_ns, fast_ns = (
+            min(timeit.repeat(function, number=args.number, repeat=args.repeat)) / args.number * 1e9
+            for function in (fastapi_path, fast_path)
+        )
+        results[name] = {"fastapi_ns": fastapi_ns, "fast_ns": fast_ns, "saved_ns": fastapi_ns - fast_ns}
+        print(f"{name:>15}: FastAPI {fastapi_ns:7.0f} ns, fast path {fast_ns:7.0f} ns, saved {fastapi_ns - fast_ns:7.0f} ns/response")
+    print(f"results saved to {saveResults('responses', results, args.output)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""
+Benchmark comparing a new httpx client per upstream request (the previous behaviour of the fetchers)
+against the shared, pooled client started in the lifespan of the DOPC service.
+
+Run from the project root with:
+    python -m benchmarks.bench_upstream_client --requests 500
+
+The stub upstream is plain HTTP on loopback, so only the TCP handshake is saved here.
+Against the real Home Assignment API each avoided connection also saves a TLS handshake.
+"""
+import argparse
+import asyncio
+import time
+import httpx
+from dopc.upstream_client import buildUpstreamClient
+from benchmarks.fake_home_api import startFakeHomeApi
+
+
+async def runPerRequestClient(url: str, count: int) -> float:
+    start = time.perf_counter()
+    for _ in range(count):
+        async with httpx.AsyncClient() as client:
+            (await client.get(url)).raise_for_status()
+    return time.perf_counter() - start
+
+
+async def runSharedClient(url: str, count: int) -> float:
+    start = time.perf_counter()
+    async with buildUpstreamClient() as client:
+        for _ in range(count):
+            (await client.get(url)).raise_for_status()
+    return time.perf_counter() - start
+
+
+async def main(count: int):
+    server, base_url = startFakeHomeApi()
+    url = f"{base_url}/home-assignment-venue-helsinki/static"
+    try:
+        for name, runner in (("per-request client", runPerRequestClient), ("shared pooled client", runSharedClient)):
+            connections_before = server.connections
+            elapsed = await runner(url, count)
+            connections = server.connections - connections_before
+            print(f"{name:>22}: {count} requests in {elapsed:.3f}s "
+                  f"({elapsed / count * 1e6:.0f} us/request, {connections} TCP connections)")
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=500, help="Number of sequential upstream requests per mode")
+    args = parser.parse_args()
+    asyncio.run(main(args.requests))
@@ -0,0 +1,161 @@
+"""
+This file contains a local stub of the Home Assignment API static and dynamic venue endpoints.
+It is used by the benchmarks so that they do not depend on the real Home Assignment API.
+The stub runs in a background thread and counts the TCP connections it accepts.
+Latency and a rate of 503 errors can be injected to exercise the resilience layer.
+
+It can also be run on its own, e.g. to point a DOPC instance at it with DOPC_HOME_API_BASE:
+    python -m benchmarks.fake_home_api --port 9000 --venues 1000 --latency 0.02 --error-rate 0.01
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# The venues of the Home Assignment API, which always exist in the stub
+HOME_ASSIGNMENT_VENUES = {
+    "home-assignment-venue-helsinki": (24.92813512, 60.17012143),
+    "home-assignment-venue-stockholm": (18.0314984, 59.3466978),
+    "home-assignment-venue-berlin": (13.4536149, 52.5003197),
+    "home-assignment-venue-tokyo": (139.7330523, 35.6521355),
+}
+
+
+def getBenchmarkVenueSlug(idx: int) -> str:
+    """
+    This function returns the slug of the idx-th generated benchmark venue.
+    """
+    return f"bench-venue-{idx}"
+
+
+def getVenueCoordinates(venue_slug: str) -> tuple:
+    """
+    This function returns the (lon, lat) of a venue. Generated venues are spread deterministically around Helsinki.
+    """
+    if venue_slug in HOME_ASSIGNMENT_VENUES:
+        return HOME_ASSIGNMENT_VENUES[venue_slug]
+    rng = random.Random(venue_slug)
+    return (24.93 + rng.uniform(-0.2, 0.2), 60.17 + rng.uniform(-0.1, 0.1))
+
+
+def buildStaticPayload(venue_slug: str) -> dict:
+    """
+    This function builds a static venue payload in the same shape as the Home Assignment API.
+    """
+    return {"venue_raw": {"location": {"coordinates": list(getVenueCoordinates(venue_slug))}}}
+
+
+def buildDynamicPayload(venue_slug: str) -> dict:
+    """
+    This function builds a dynamic venue payload in the same shape as the Home Assignment API.
+    """
+    return {
+        "venue_raw": {
+            "delivery_specs": {
+                "order_minimum_no_surcharge": 1000,
+                "delivery_pricing": {
+                    "base_price": 190,
+                    "distance_ranges": [
+                        {"min": 0, "max": 500, "a": 0, "b": 0, "flag": None},
+                        {"min": 500, "max": 1000, "a": 100, "b": 0, "flag": None},
+                        {"min": 1000, "max": 1500, "a": 200, "b": 0, "flag": None},
+                        {"min": 1500, "max": 2000, "a": 200, "b": 1, "flag": None},
+                        {"min": 2000, "max": 0, "a": 0, "b": 0, "flag": None},
+                    ],
+                },
+            }
+        }
+    }
+
+
+class FakeHomeApiHandler(BaseHTTPRequestHandler):
+    # HTTP/1.1 so that clients can keep connections alive between requests
+    protocol_version = "HTTP/1.1"
+    # Headers and body are written separately, so avoid delayed ACK stalls on keep-alive connections
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        with self.server.stats_lock:
+            self.server.connections += 1
+
+    def do_GET(self):
+        with self.server.stats_lock:
+            self.server.requests += 1
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        if self.server.error_rate and random.random() < self.server.error_rate:
+            self._sendJson(503, {"error": "injected failure"})
+            return
+        # Expected path: [<prefix>/]<venue_slug>/static or [<prefix>/]<venue_slug>/dynamic
+        parts = self.path.strip("/").split("/")
+        venue_slug = parts[-2] if len(parts) >= 2 else ""
+        if venue_slug not in HOME_ASSIGNMENT_VENUES and venue_slug not in self.server.venue_slugs:
+            self._sendJson(404, {"error": "not found"})
+        elif parts[-1] == "static":
+            self._sendJson(200, buildStaticPayload(venue_slug))
+        elif parts[-1] == "dynamic":
+            self._sendJson(200, buildDynamicPayload(venue_slug))
+        else:
+            self._sendJson(404, {"error": "not found"})
+
+    def _sendJson(self, status_code: int, payload: dict):
+        body = json.dumps(payload).encode()
+        self.send_response(status_code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Keep benchmark output clean
+        pass
+
+
+class FakeHomeApiServer(ThreadingHTTPServer):
+    # The default listen backlog of 5 drops connections when DOPC opens many at once, which DOPC would count as upstream failures
+    request_queue_size = 1024
+    daemon_threads = True
+
+
+def startFakeHomeApi(host: str = "127.0.0.1", port: int = 0, latency: float = 0.0, error_rate: float = 0.0, venue_count: int = 100):
+    """
+    This function starts the fake Home Assignment API in a background thread.
+
+    Parameters:
+        host: The interface to listen on
+        port: The port to listen on. 0 picks a free port
+        latency: Seconds to wait before answering each request
+        error_rate: The fraction of requests answered with 503
+        venue_count: The number of generated venues, see getBenchmarkVenueSlug()
+    Returns:
+        server: The running server. Call server.shutdown() to stop it
+        base_url: The URL prefix to use in place of HOME_API_BASE
+    """
+    server = FakeHomeApiServer((host, port), FakeHomeApiHandler)
+    server.stats_lock = threading.Lock()
+    server.connections = 0
+    server.requests = 0
+    server.latency = latency
+    server.error_rate = error_rate
+    server.venue_slugs = {getBenchmarkVenueSlug(idx) for idx in range(venue_count)}
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--venues", type=int, default=100, help="Number of generated venues")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds to wait before answering each request")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with 503")
+    args = parser.parse_args()
+    server, base_url = startFakeHomeApi(args.host, args.port, args.latency, args.error_rate, args.venues)
+    print(f"Fake Home Assignment API running, set DOPC_HOME_API_BASE={base_url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
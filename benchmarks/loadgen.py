@@ -0,0 +1,169 @@
+"""
+Load generator for GET /api/v1/delivery-order-price. Requests are sent open-loop at a fixed rate,
+so a slow service cannot slow down the load and hide its own queueing delay: each latency is measured
+from the moment the request was scheduled, not from when it was actually sent.
+Venues are picked with a Zipf distribution, so a few venues get most of the traffic as in production.
+
+By default a local fake Home Assignment API and a DOPC service pointed at it are started, each in its own
+process so that neither competes with the load generator for the GIL:
+    python -m benchmarks.loadgen --rps 200 --duration 30 --venues 1000 --upstream-latency 0.02
+
+Use --url to load an already running DOPC service instead.
+Results are printed and saved as JSON in benchmarks/results/ (or --output).
+"""
+import argparse
+import asyncio
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import httpx
+from benchmarks.fake_home_api import getBenchmarkVenueSlug, getVenueCoordinates
+from benchmarks.reporting import summarizeLatencies, saveResults
+
+QUOTE_PATH = "/api/v1/delivery-order-price"
+
+
+def buildZipfWeights(count: int, exponent: float) -> list:
+    """
+    This function returns cumulative weights for random.choices(), where the k-th item has weight 1/k^exponent.
+    """
+    cumulative_weights = []
+    total = 0.0
+    for rank in range(1, count + 1):
+        total += 1 / rank ** exponent
+        cumulative_weights.append(total)
+    return cumulative_weights
+
+
+def buildQuoteParams(rng: random.Random, venue_slug: str) -> dict:
+    """
+    This function returns query parameters for a quote within about 2 km of the venue.
+    """
+    venue_lon, venue_lat = getVenueCoordinates(venue_slug)
+    return {
+        "venue_slug": venue_slug,
+        "cart_value": rng.randrange(100, 3000),
+        "user_lat": round(venue_lat + rng.uniform(-0.015, 0.015), 6),
+        "user_lon": round(venue_lon + rng.uniform(-0.03, 0.03), 6),
+    }
+
+
+async def sendQuote(client: httpx.AsyncClient, scheduled_at: float, params: dict, latencies: list, status_counts: dict):
+    delay = scheduled_at - time.perf_counter()
+    if delay > 0:
+        await asyncio.sleep(delay)
+    try:
+        status = (await client.get(QUOTE_PATH, params=params)).status_code
+    except httpx.HTTPError as e:
+        status = type(e).__name__
+    latencies.append(time.perf_counter() - scheduled_at)
+    status_counts[status] = status_counts.get(status, 0) + 1
+
+
+async def runLoad(url: str, rps: float, duration: float, venue_slugs: list, zipf_exponent: float, seed: int = 0) -> dict:
+    """
+    This function sends quote requests at a fixed rate and returns the throughput and latency summary.
+    """
+    rng = random.Random(seed)
+    cumulative_weights = buildZipfWeights(len(venue_slugs), zipf_exponent)
+    total_requests = int(rps * duration)
+    latencies = []
+    status_counts = {}
+    limits = httpx.Limits(max_connections=1000, max_keepalive_connections=1000)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=30.0) as client:
+        start = time.perf_counter()
+        tasks = []
+        for idx in range(total_requests):
+            venue_slug = rng.choices(venue_slugs, cum_weights=cumulative_weights)[0]
+            tasks.append(asyncio.create_task(
+                sendQuote(client, start + idx / rps, buildQuoteParams(rng, venue_slug), latencies, status_counts)))
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - start
+    return {
+        "target_rps": rps,
+        "duration_s": duration,
+        "requests": total_requests,
+        "throughput_rps": total_requests / elapsed,
+        "status_counts": {str(status): count for status, count in sorted(status_counts.items(), key=str)},
+        "latency": summarizeLatencies(latencies),
+    }
+
+
+def startFakeHomeApiProcess(port: int, venue_count: int, latency: float, error_rate: float) -> subprocess.Popen:
+    """
+    This function starts the fake Home Assignment API in a subprocess.
+    """
+    return subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.fake_home_api", "--port", str(port), "--venues", str(venue_count),
+         "--latency", str(latency), "--error-rate", str(error_rate)],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def startService(port: int, home_api_base: str, workers: int, log_directory: str) -> subprocess.Popen:
+    """
+    This function starts the DOPC service in a subprocess, pointed at the given Home Assignment API.
+    """
+    env = dict(os.environ, DOPC_HOME_API_BASE=home_api_base, DOPC_LOG_DIRECTORY=log_directory)
+    return subprocess.Popen(
+        [sys.executable, "-m", "dopc", "--port", str(port), "--host", "127.0.0.1", "--workers", str(workers)],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def waitForServer(url: str, timeout: float = 10.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            httpx.get(url, timeout=1.0)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.1)
+    raise RuntimeError(f"The server at {url} did not start within {timeout} seconds")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", help="Load an already running DOPC service instead of starting one")
+    parser.add_argument("--rps", type=float, default=100, help="Requests per second")
+    parser.add_argument("--duration", type=float, default=10, help="Seconds of load")
+    parser.add_argument("--venues", type=int, default=100, help="Number of distinct venues")
+    parser.add_argument("--zipf", type=float, default=1.1, help="Zipf exponent of the venue popularity")
+    parser.add_argument("--upstream-latency", type=float, default=0.0, help="Seconds the fake Home Assignment API waits per request")
+    parser.add_argument("--upstream-error-rate", type=float, default=0.0, help="Fraction of fake Home Assignment API requests answered with 503")
+    parser.add_argument("--port", type=int, default=8765, help="Port of the started DOPC service")
+    parser.add_argument("--upstream-port", type=int, default=8766, help="Port of the started fake Home Assignment API")
+    parser.add_argument("--workers", type=int, default=1, help="Worker processes of the started DOPC service")
+    parser.add_argument("--output", help="Path of the JSON results file")
+    args = parser.parse_args()
+
+    venue_slugs = [getBenchmarkVenueSlug(idx) for idx in range(args.venues)]
+    processes = []
+    with tempfile.TemporaryDirectory() as log_directory:
+        try:
+            url = args.url
+            if url is None:
+                home_api_base = f"http://127.0.0.1:{args.upstream_port}"
+                processes.append(startFakeHomeApiProcess(
+                    args.upstream_port, args.venues, args.upstream_latency, args.upstream_error_rate))
+                waitForServer(home_api_base)
+                processes.append(startService(args.port, home_api_base, args.workers, log_directory))
+                url = f"http://127.0.0.1:{args.port}"
+                waitForServer(f"{url}/metrics")
+            results = asyncio.run(runLoad(url, args.rps, args.duration, venue_slugs, args.zipf))
+        finally:
+            for process in processes:
+                process.terminate()
+                process.wait()
+
+    results["settings"] = {key: value for key, value in vars(args).items() if key != "output"}
+    latency = results["latency"]
+    print(f"{results['requests']} requests at {args.rps:g} rps: throughput {results['throughput_rps']:.1f} rps, "
+          f"p50 {latency['p50_ms']:.2f} ms, p95 {latency['p95_ms']:.2f} ms, p99 {latency['p99_ms']:.2f} ms")
+    print(f"status codes: {results['status_counts']}")
+    print(f"results saved to {saveResults('loadgen', results, args.output)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Microbenchmarks of the per-quote computations: computeDistance(), computeDeliveryFeeAndSurcharge()
+on raw distance_ranges dicts and on a compiled PricingTable.
+
+Run from the project root with:
+    python -m benchmarks.microbench
+
+Results are printed and saved as JSON in benchmarks/results/ (or --output).
+"""
+import argparse
+import random
+import timeit
+from dopc.helpers import computeDistance, computeDeliveryFeeAndSurcharge
+from dopc.pricing import PricingTable
+from benchmarks.fake_home_api import buildDynamicPayload
+from benchmarks.reporting import saveResults
+
+
+def timePerCall(function, calls: int, number: int, repeat: int) -> float:
+    """
+    This function returns the best time per call in nanoseconds, where function makes `calls` calls per run.
+    """
+    return min(timeit.repeat(function, number=number, repeat=repeat)) / (number * calls) * 1e9
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--samples", type=int, default=1000, help="Inputs per run")
+    parser.add_argument("--number", type=int, default=50, help="Runs per repeat")
+    parser.add_argument("--repeat", type=int, default=5, help="Repeats, the best one is reported")
+    parser.add_argument("--output", help="Path of the JSON results file")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    delivery_specs = buildDynamicPayload("home-assignment-venue-helsinki")["venue_raw"]["delivery_specs"]
+    minimum_order_value = delivery_specs["order_minimum_no_surcharge"]
+    delivery_base_price = delivery_specs["delivery_pricing"]["base_price"]
+    distance_ranges = delivery_specs["delivery_pricing"]["distance_ranges"]
+    table = PricingTable(minimum_order_value, delivery_base_price, distance_ranges)
+    points = [(60.17 + rng.uniform(-0.02, 0.02), 24.93 + rng.uniform(-0.04, 0.04)) for _ in range(args.samples)]
+    distances = [rng.randrange(0, 2000) for _ in range(args.samples)]
+
+    def runDistance():
+        for user_lat, user_lon in points:
+            computeDistance(user_lat, user_lon, 60.17012143, 24.92813512)
+
+    def runFeeDicts():
+        for distance in distances:
+            computeDeliveryFeeAndSurcharge(800, distance, minimum_order_value, delivery_base_price, distance_ranges)
+
+    def runFeeTable():
+        for distance in distances:
+            table.computeDeliveryFeeAndSurcharge(800, distance)
+
+    results = {}
+    for name, function in (
+        ("computeDistance", runDistance),
+        ("computeDeliveryFeeAndSurcharge", runFeeDicts),
+        ("PricingTable.computeDeliveryFeeAndSurcharge", runFeeTable),
+    ):
+        results[name] = {"ns_per_call": timePerCall(function, args.samples, args.number, args.repeat)}
+        print(f"{name:>44}: {results[name]['ns_per_call']:8.0f} ns/call")
+    print(f"results saved to {saveResults('microbench', results, args.output)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+This file contains helpers shared by the benchmarks to summarize latencies and save results as JSON,
+so that runs can be compared across changes.
+"""
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+# Results are written here unless an output path is given
+DEFAULT_RESULTS_DIRECTORY = os.path.join(os.path.dirname(__file__), "results")
+
+
+def percentile(sorted_values: list, fraction: float) -> float:
+    """
+    This function returns a percentile of already sorted values, using the nearest-rank method.
+    """
+    if not sorted_values:
+        return float("nan")
+    rank = max(0, min(len(sorted_values) - 1, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+
+def summarizeLatencies(latencies: list) -> dict:
+    """
+    This function summarizes latencies in seconds into milliseconds percentiles.
+    """
+    ordered = sorted(latencies)
+    return {
+        "count": len(ordered),
+        "mean_ms": sum(ordered) / len(ordered) * 1000 if ordered else float("nan"),
+        "p50_ms": percentile(ordered, 0.50) * 1000,
+        "p95_ms": percentile(ordered, 0.95) * 1000,
+        "p99_ms": percentile(ordered, 0.99) * 1000,
+        "max_ms": ordered[-1] * 1000 if ordered else float("nan"),
+    }
+
+
+def getGitRevision() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def saveResults(benchmark: str, results: dict, output: str = None) -> str:
+    """
+    This function saves benchmark results with some context about the run as JSON.
+
+    Parameters:
+        benchmark: The name of the benchmark, used in the default file name
+        results: The results to save
+        output: The path of the JSON file. Defaults to results/<benchmark>-<timestamp>.json
+    Returns:
+        output: The path the results were written to
+    """
+    if output is None:
+        os.makedirs(DEFAULT_RESULTS_DIRECTORY, exist_ok=True)
+        output = os.path.join(DEFAULT_RESULTS_DIRECTORY, f"{benchmark}-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    document = {
+        "benchmark": benchmark,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "git_revision": getGitRevision(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "results": results,
+    }
+    with open(output, "w") as results_file:
+        json.dump(document, results_file, indent=2)
+    return output
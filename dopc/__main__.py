@@ -1,6 +1,21 @@
 from dopc.service import runService
 from dopc.helpers import getServicePort
+from dopc.admin_client import pushSnapshot, pushVenueUpdates
+from dopc.venue_store import parseSnapshotLines
+from dopc.venue_file import buildVenueFile, fetchVenueRecords
+from dopc.config import (
+    DOPC_DEFAULT_HOST,
+    DOPC_DEFAULT_WORKERS,
+    DOPC_DEFAULT_LOOP,
+    DOPC_DEFAULT_HTTP,
+    DOPC_DEFAULT_BACKLOG,
+    DOPC_DEFAULT_TIMEOUT_KEEP_ALIVE,
+    DOPC_DEFAULT_LIMIT_CONCURRENCY,
+    DOPC_DEFAULT_TIMEOUT_GRACEFUL_SHUTDOWN,
+)
 import argparse
+import asyncio
+import sys
 
 
 if __name__ == "__main__":
@@ -8,7 +23,68 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     default_port = getServicePort()
     parser.add_argument('--port', type=int, help="The port on which the DOPC service will run", default=default_port)
+    # Production settings. The defaults are specified in config.py
+    parser.add_argument('--host', help="The interface to listen on, e.g. 0.0.0.0 for all interfaces", default=DOPC_DEFAULT_HOST)
+    parser.add_argument('--workers', type=int, help="The number of worker processes, e.g. one per core", default=DOPC_DEFAULT_WORKERS)
+    parser.add_argument('--loop', choices=["auto", "asyncio", "uvloop"], help="The event loop implementation", default=DOPC_DEFAULT_LOOP)
+    parser.add_argument('--http', choices=["auto", "h11", "httptools"], help="The HTTP parser", default=DOPC_DEFAULT_HTTP)
+    parser.add_argument('--backlog', type=int, help="The maximum number of pending connections", default=DOPC_DEFAULT_BACKLOG)
+    parser.add_argument('--timeout-keep-alive', type=int, help="Seconds an idle client connection is kept open", default=DOPC_DEFAULT_TIMEOUT_KEEP_ALIVE)
+    parser.add_argument('--limit-concurrency', type=int, help="The maximum number of concurrent connections per worker before answering 503", default=DOPC_DEFAULT_LIMIT_CONCURRENCY)
+    parser.add_argument('--timeout-graceful-shutdown', type=int, help="Seconds to wait for in-flight requests on shutdown", default=DOPC_DEFAULT_TIMEOUT_GRACEFUL_SHUTDOWN)
+    parser.add_argument('--venue-snapshot', help="A JSON lines venue snapshot which every worker loads on startup")
+    parser.add_argument('--venue-file', help="A venue file built with build-venue-file, which every worker maps on startup")
+
+    # Subcommands that push venue data to a running service instead of starting one
+    subparsers = parser.add_subparsers(dest="command")
+    load_parser = subparsers.add_parser('load-snapshot', help="Replace all venues of a running service with a JSON lines snapshot")
+    load_parser.add_argument('path', help="The JSON lines snapshot")
+    load_parser.add_argument('--url', help="The base URL of the running service", default=f"http://127.0.0.1:{default_port}")
+    update_parser = subparsers.add_parser('update-venues', help="Add or replace the venues of a JSON lines file in a running service")
+    update_parser.add_argument('path', help="The JSON lines file")
+    update_parser.add_argument('--url', help="The base URL of the running service", default=f"http://127.0.0.1:{default_port}")
+    build_parser = subparsers.add_parser('build-venue-file', help="Build a venue file from a snapshot or from the Home Assignment API")
+    build_parser.add_argument('path', help="The venue file to write")
+    build_source = build_parser.add_mutually_exclusive_group(required=True)
+    build_source.add_argument('--snapshot', help="A JSON lines venue snapshot")
+    build_source.add_argument('--slugs', help="A file with one venue_slug per line, fetched from the Home Assignment API")
     args = parser.parse_args()
 
+    if args.command == 'build-venue-file':
+        if args.snapshot:
+            with open(args.snapshot, encoding="utf-8") as snapshot_file:
+                records = parseSnapshotLines(snapshot_file)
+        else:
+            with open(args.slugs, encoding="utf-8") as slugs_file:
+                records, failures = asyncio.run(fetchVenueRecords([line.strip() for line in slugs_file if line.strip()]))
+            for venue_slug, error in failures.items():
+                print(f"Could not fetch {venue_slug}: {error}", file=sys.stderr)
+            if failures and not records:
+                raise SystemExit(f"No venue could be fetched, {args.path} was not written")
+            if failures:
+                print(f"Skipped {len(failures)} venues which could not be fetched", file=sys.stderr)
+        size = buildVenueFile(records, args.path)
+        print(f"Wrote {len(records)} venues to {args.path} ({size} bytes)")
+        raise SystemExit
+    if args.command == 'load-snapshot':
+        print(pushSnapshot(args.url, args.path))
+        raise SystemExit
+    if args.command == 'update-venues':
+        for result in pushVenueUpdates(args.url, args.path):
+            print(result)
+        raise SystemExit
+
     # Run the DOPC service at the specified/default port
-    runService(args.port)
\ No newline at end of file
+    runService(
+        args.port,
+        host=args.host,
+        workers=args.workers,
+        loop=args.loop,
+        http=args.http,
+        backlog=args.backlog,
+        timeout_keep_alive=args.timeout_keep_alive,
+        limit_concurrency=args.limit_concurrency,
+        timeout_graceful_shutdown=args.timeout_graceful_shutdown,
+        venue_snapshot=args.venue_snapshot,
+        venue_file=args.venue_file,
+    )
@@ -0,0 +1,55 @@
+"""
+This file contains the client side of the venue store admin endpoints, used by the subcommands of python -m dopc:
+    python -m dopc load-snapshot venues.jsonl --url http://127.0.0.1:8000
+    python -m dopc update-venues changed_venues.jsonl --url http://127.0.0.1:8000
+Both files are JSON lines in the snapshot format described in venue_store.py.
+"""
+import json
+from urllib.parse import quote
+import httpx
+from dopc.config import ADMIN_TOKEN, ADMIN_TOKEN_HEADER
+
+
+def _buildHeaders(admin_token: str) -> dict:
+    return {ADMIN_TOKEN_HEADER: admin_token} if admin_token else {}
+
+
+def pushSnapshot(url: str, path: str, admin_token: str = ADMIN_TOKEN) -> dict:
+    """
+    This function sends a snapshot file to a running DOPC service, replacing all venues of its venue store.
+
+    Parameters:
+        url: The base URL of the DOPC service, e.g. http://127.0.0.1:8000
+        path: The path of the JSON lines snapshot
+        admin_token: The admin token of the service, if it requires one
+    Returns:
+        The response of the service, with the new version of the store and its number of venues
+    """
+    with open(path, "rb") as snapshot_file:
+        body = snapshot_file.read()
+    response = httpx.post(f"{url}/admin/venues/snapshot", content=body, headers=_buildHeaders(admin_token), timeout=60.0)
+    response.raise_for_status()
+    return response.json()
+
+
+def pushVenueUpdates(url: str, path: str, admin_token: str = ADMIN_TOKEN) -> list:
+    """
+    This function sends every venue of a JSON lines file to a running DOPC service as an incremental update.
+
+    Parameters:
+        url: The base URL of the DOPC service, e.g. http://127.0.0.1:8000
+        path: The path of the JSON lines file
+        admin_token: The admin token of the service, if it requires one
+    Returns:
+        The responses of the service, one per venue
+    """
+    responses = []
+    with open(path, encoding="utf-8") as updates_file, httpx.Client(base_url=url, headers=_buildHeaders(admin_token)) as client:
+        for line in updates_file:
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            response = client.put(f"/admin/venues/{quote(item['venue_slug'], safe='')}", json={"static": item["static"], "dynamic": item["dynamic"]})
+            response.raise_for_status()
+            responses.append(response.json())
+    return responses
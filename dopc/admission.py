@@ -0,0 +1,258 @@
+"""
+This file contains the admission control in front of the pricing endpoints, so that DOPC sheds excess load with fast
+responses instead of letting every request slow down under a traffic spike:
+    - a cap on the number of pricing requests in flight, with a short bounded queue in front of it
+    - token bucket rate limits per client and per venue_slug
+Shed requests are answered with 503 (overloaded) or 429 (rate limited) and a Retry-After header, without running the endpoint.
+All state is only touched from the event loop and never across an await, so no locks are needed.
+"""
+import asyncio
+import math
+import time
+from collections import deque
+from urllib.parse import parse_qsl
+from dopc.responses import PrebuiltResponse
+from dopc.metrics import registry, Counter, CallbackGauge
+from dopc.config import (
+    ADMISSION_MAX_IN_FLIGHT,
+    ADMISSION_MAX_QUEUE,
+    ADMISSION_QUEUE_TIMEOUT,
+    ADMISSION_RETRY_AFTER,
+    RATE_LIMIT_CLIENT_RPS,
+    RATE_LIMIT_CLIENT_BURST,
+    RATE_LIMIT_VENUE_RPS,
+    RATE_LIMIT_VENUE_BURST,
+    RATE_LIMIT_CLIENT_HEADER,
+    RATE_LIMIT_MAX_KEYS,
+    RATE_LIMIT_CLEANUP_INTERVAL,
+)
+
+# The paths admission control applies to. Other endpoints, e.g. /metrics and /admin, are always admitted
+PRICING_PATHS = frozenset(("/api/v1/delivery-order-price", "/api/v1/delivery-order-price/batch"))
+
+# The error responses of shed requests, serialized once
+OVERLOADED_RESPONSE = PrebuiltResponse(503, {"detail": {"message": "DOPC is overloaded. Please try again later."}})
+RATE_LIMITED_RESPONSE = PrebuiltResponse(429, {"detail": {"message": "Too many requests. Please try again later."}})
+
+requests_shed = registry.register(Counter(
+    "dopc_requests_shed_total", "Pricing requests rejected by admission control, by reason", ("reason",)))
+
+
+class AdmissionController:
+    """
+    Admits at most max_in_flight requests at a time. Up to max_queue further requests wait in first in, first out order
+    for at most queue_timeout seconds. A request which finds the queue full is rejected immediately.
+    A max_in_flight of 0 admits every request.
+    """
+
+    def __init__(self, max_in_flight: int, max_queue: int, queue_timeout: float):
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        self._waiters = deque()
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    async def acquire(self):
+        """
+        This function waits for a free slot. It returns None once the request is admitted,
+        otherwise the reason it was rejected: "queue_full" or "queue_timeout".
+        """
+        if self.max_in_flight <= 0:
+            return None
+        if self.in_flight < self.max_in_flight and not self._waiters:
+            self.in_flight += 1
+            return None
+        if len(self._waiters) >= self.max_queue:
+            return "queue_full"
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            # release() hands its slot over by resolving the future, so in_flight already counts this request
+            await asyncio.wait_for(waiter, self.queue_timeout)
+            return None
+        except TimeoutError:
+            if self._wasHandedSlot(waiter):
+                # The slot was handed over just as the wait timed out
+                return None
+            return "queue_timeout"
+        except asyncio.CancelledError:
+            # The client went away while waiting, so a slot handed over to it has to be passed on
+            if self._wasHandedSlot(waiter):
+                self.release()
+            raise
+
+    def _wasHandedSlot(self, waiter: asyncio.Future) -> bool:
+        if waiter.done() and not waiter.cancelled():
+            return True
+        if waiter in self._waiters:
+            self._waiters.remove(waiter)
+        return False
+
+    def release(self):
+        """
+        This function frees the slot of a finished request, handing it to the longest waiting request if there is one.
+        """
+        if self.max_in_flight <= 0:
+            return
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.in_flight -= 1
+
+
+class TokenBucketLimiter:
+    """
+    A token bucket per key: every key may make burst requests at once, refilled at rate requests per second.
+    Buckets which have refilled completely are the same as new ones, so they are removed every cleanup_interval
+    seconds, or as soon as there are more than max_keys buckets. A rate of 0 disables the limiter.
+    """
+
+    def __init__(self, rate: float, burst: float, max_keys: int = RATE_LIMIT_MAX_KEYS,
+                 cleanup_interval: float = RATE_LIMIT_CLEANUP_INTERVAL, clock=time.monotonic):
+        self.rate = rate
+        self.burst = max(burst, 1.0)
+        self.max_keys = max_keys
+        self.cleanup_interval = cleanup_interval
+        self.clock = clock
+        # key -> [tokens, time of the last refill]
+        self._buckets = {}
+        self._last_cleanup = clock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.rate > 0
+
+    def acquire(self, key) -> float:
+        """
+        This function takes a token from the bucket of key. It returns 0 if the request is allowed,
+        otherwise the seconds until the next token is available.
+        """
+        now = self.clock()
+        if now - self._last_cleanup >= self.cleanup_interval or len(self._buckets) > self.max_keys:
+            self.cleanup(now)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            self._buckets[key] = [self.burst - 1, now]
+            return 0.0
+        tokens = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+        bucket[1] = now
+        if tokens >= 1:
+            bucket[0] = tokens - 1
+            return 0.0
+        bucket[0] = tokens
+        return (1 - tokens) / self.rate
+
+    def cleanup(self, now: float = None):
+        """
+        This function removes the buckets which have refilled completely. If there are still more than max_keys,
+        all buckets are removed, which at worst grants every client a new burst.
+        """
+        now = self.clock() if now is None else now
+        self._buckets = {key: bucket for key, bucket in self._buckets.items()
+                         if bucket[0] + (now - bucket[1]) * self.rate < self.burst}
+        if len(self._buckets) > self.max_keys:
+            self._buckets = {}
+        self._last_cleanup = now
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+admission_controller = AdmissionController(ADMISSION_MAX_IN_FLIGHT, ADMISSION_MAX_QUEUE, ADMISSION_QUEUE_TIMEOUT)
+client_limiter = TokenBucketLimiter(RATE_LIMIT_CLIENT_RPS, RATE_LIMIT_CLIENT_BURST)
+venue_limiter = TokenBucketLimiter(RATE_LIMIT_VENUE_RPS, RATE_LIMIT_VENUE_BURST)
+
+registry.register(CallbackGauge(
+    "dopc_admission_in_flight", "Pricing requests currently admitted", (), lambda: {(): admission_controller.in_flight}))
+registry.register(CallbackGauge(
+    "dopc_admission_queued", "Pricing requests currently waiting for admission", (), lambda: {(): admission_controller.queued}))
+registry.register(CallbackGauge(
+    "dopc_rate_limit_buckets", "Token buckets currently tracked, by limiter", ("limiter",),
+    lambda: {("client",): len(client_limiter), ("venue",): len(venue_limiter)}))
+
+
+def getClientKey(scope, header_name: bytes = None) -> str:
+    """
+    This function returns the key a client is rate limited by: the first address in header_name if it is set
+    (e.g. X-Forwarded-For behind a trusted proxy), otherwise the address of the connection.
+    """
+    if header_name is not None:
+        for name, value in scope["headers"]:
+            if name == header_name:
+                return value.decode("latin-1").split(",")[0].strip()
+    client = scope.get("client")
+    return client[0] if client else "unknown"
+
+
+def getVenueKey(scope):
+    """
+    This function returns the venue_slug in the query string of a request, or None if it has none, e.g. a batch request.
+    """
+    for name, value in parse_qsl(scope["query_string"].decode("latin-1")):
+        if name == "venue_slug":
+            return value
+    return None
+
+
+async def _sendShedResponse(send, response: PrebuiltResponse, retry_after: float):
+    await send({"type": "http.response.start", "status": response.status_code, "headers": [
+        (b"content-type", b"application/json"),
+        (b"content-length", str(len(response.body)).encode()),
+        (b"retry-after", str(max(1, math.ceil(retry_after))).encode()),
+    ]})
+    await send({"type": "http.response.body", "body": response.body})
+
+
+class AdmissionMiddleware:
+    """
+    ASGI middleware which applies the rate limits and the cap on requests in flight to the pricing endpoints.
+    Rate limits are checked first, so a client over its limit never takes a slot from other clients.
+    """
+
+    def __init__(self, app, paths: frozenset = PRICING_PATHS, controller: AdmissionController = None,
+                 client_limiter: TokenBucketLimiter = None, venue_limiter: TokenBucketLimiter = None,
+                 client_header: str = RATE_LIMIT_CLIENT_HEADER):
+        self.app = app
+        self.paths = paths
+        # The module level instances are looked up per request unless given, so that they can be replaced in tests
+        self.controller = controller
+        self.client_limiter = client_limiter
+        self.venue_limiter = venue_limiter
+        self.client_header = client_header.lower().encode() if client_header else None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+        client_bucket = client_limiter if self.client_limiter is None else self.client_limiter
+        if client_bucket.enabled:
+            wait = client_bucket.acquire(getClientKey(scope, self.client_header))
+            if wait:
+                requests_shed.inc("client_rate_limit")
+                await _sendShedResponse(send, RATE_LIMITED_RESPONSE, wait)
+                return
+        venue_bucket = venue_limiter if self.venue_limiter is None else self.venue_limiter
+        if venue_bucket.enabled:
+            venue_slug = getVenueKey(scope)
+            wait = venue_bucket.acquire(venue_slug) if venue_slug is not None else 0
+            if wait:
+                requests_shed.inc("venue_rate_limit")
+                await _sendShedResponse(send, RATE_LIMITED_RESPONSE, wait)
+                return
+
+        controller = admission_controller if self.controller is None else self.controller
+        reason = await controller.acquire()
+        if reason is not None:
+            requests_shed.inc(reason)
+            await _sendShedResponse(send, OVERLOADED_RESPONSE, ADMISSION_RETRY_AFTER)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            controller.release()
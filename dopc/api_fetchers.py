@@ -2,19 +2,39 @@
 This file contains functions that fetch data from the static and dynamic Home Assignment API endpoints.
 Modularizing the application by separating these functions helps to test and maintain the application better.
 """
+import logging
+import time
 import httpx
 from fastapi import HTTPException
 from dopc.helpers import getStaticInformationURL, getDynamicInformationURL
+from dopc.upstream_client import getUpstreamClient, buildUpstreamClient
+from dopc.resilience import resilientGet, UpstreamUnavailableError, DeadlineExceededError
+from dopc.venue_parsing import decodeJson, parseStaticPayload, parseDynamicPayload, InvalidVenuePayloadError
+from dopc.logging_config import logSampled
+from dopc.tracing import traceSpan
+from dopc.metrics import upstream_latency
 
-# For logging requests and error messages
-import os
-if not os.path.exists('logs'):
-    os.mkdir('logs')
-import logging
-from dopc.config import DEFAULT_LOG_DIRECTORY
-logging.basicConfig(level=logging.INFO,
-                    format='%(asctime)s - %(levelname)s - %(message)s',
-                    handlers=[logging.FileHandler(f'{DEFAULT_LOG_DIRECTORY}/home_api.log')])  # Log file will be created in 'logs' directory
+# For logging requests and error messages, see logging_config.py
+logger = logging.getLogger(__name__)
+
+
+async def getFromUpstream(url: str) -> httpx.Response:
+    """
+    This function makes a GET request to the Home Assignment API using the shared, pooled client,
+    with the circuit breaker, retries, concurrency limit and deadline of resilience.py.
+    If the shared client has not been started (e.g. the fetchers are used outside of the service),
+    a short-lived client with the same settings is used instead.
+
+    Parameters:
+        url: The Home Assignment API URL to request
+    Returns:
+        response: The httpx response returned by the Home Assignment API
+    """
+    client = getUpstreamClient()
+    if client is not None:
+        return await resilientGet(client, url)
+    async with buildUpstreamClient() as client:
+        return await resilientGet(client, url)
 
 
 async def fetchStaticData(venue_slug: str):
@@ -30,22 +50,36 @@ async def fetchStaticData(venue_slug: str):
     """
     staticInformationURL = getStaticInformationURL(venue_slug)
     try:
-        # Make an asynchronous GET request to the static URL
-        async with httpx.AsyncClient() as client:
-            response = await client.get(staticInformationURL)
+        # Make an asynchronous GET request to the static URL over the shared connection pool
+        start = time.perf_counter()
+        with traceSpan("static_upstream"):
+            response = await getFromUpstream(staticInformationURL)
+        latency = time.perf_counter() - start
+        upstream_latency.observe(latency, "static", response.status_code)
+        log_fields = {"venue_slug": venue_slug, "endpoint": "static", "status": response.status_code, "latency_ms": round(latency * 1000, 2)}
         # If the GET request to the returns 200, get the venue's longitude and latitude values
         if response.status_code == 200:
-            logging.info(f"Static URL returned 200 for slug: {venue_slug}")
-            static_data = response.json()
-            venue_coordinates = static_data["venue_raw"]["location"]["coordinates"]
-            return venue_coordinates
+            logSampled(logger, "Static URL returned 200 for slug: %s", venue_slug, extra=log_fields)
+            return parseStaticPayload(decodeJson(response.content)).coordinates
         # Otherwise, raise an exception because the value of venue_slug is incorrect
         else:
-            logging.error(f"Static URL returned {response.status_code} for slug: {venue_slug}")
+            logger.error("Static URL returned %s for slug: %s", response.status_code, venue_slug, extra=log_fields)
             raise HTTPException(status_code=response.status_code, detail=f"Error fetching data from Home Assignment API static URL. Please check the value of venue_slug.")
+    except InvalidVenuePayloadError as e:
+        # The Home Assignment API answered, but with data DOPC cannot price with
+        logger.error("Static URL returned malformed data for slug: %s: %s", venue_slug, e, extra={"venue_slug": venue_slug, "endpoint": "static", "status": 502})
+        raise HTTPException(status_code=502, detail=f"Home Assignment API static URL returned malformed venue data. {e}")
+    except UpstreamUnavailableError as e:
+        # The Home Assignment API is failing or overloaded, so the request is rejected without waiting for it
+        logger.error("Static URL call was shed for slug: %s: %s", venue_slug, e, extra={"venue_slug": venue_slug, "endpoint": "static", "status": 503})
+        raise HTTPException(status_code=503, detail="Home Assignment Static API is currently unavailable. Please try again later.", headers={"Retry-After": "1"})
+    except (DeadlineExceededError, httpx.TimeoutException):
+        # Handle a Home Assignment API which is too slow to answer in time
+        logger.error("Static URL timed out for slug: %s", venue_slug, extra={"venue_slug": venue_slug, "endpoint": "static", "status": 504})
+        raise HTTPException(status_code=504, detail="Timed out during request to Home Assignment Static API.")
     except httpx.RequestError as e:
         # Handle any errors of Home Assignment API
-        logging.error(f"Static URL returned 500 code for slug: {venue_slug}")
+        logger.error("Static URL returned 500 code for slug: %s", venue_slug, extra={"venue_slug": venue_slug, "endpoint": "static", "status": 500})
         raise HTTPException(status_code=500, detail=f"Error during request to Home Assignment Static API. Server returned: {e}")
     
 async def fetchDynamicData(venue_slug: str):
@@ -63,22 +97,35 @@ async def fetchDynamicData(venue_slug: str):
     """
     dynamicInformationURL = getDynamicInformationURL(venue_slug)
     try:
-        # Make an asynchronous GET request to the dynamic URL
-        async with httpx.AsyncClient() as client:
-            response = await client.get(dynamicInformationURL)
+        # Make an asynchronous GET request to the dynamic URL over the shared connection pool
+        start = time.perf_counter()
+        with traceSpan("dynamic_upstream"):
+            response = await getFromUpstream(dynamicInformationURL)
+        latency = time.perf_counter() - start
+        upstream_latency.observe(latency, "dynamic", response.status_code)
+        log_fields = {"venue_slug": venue_slug, "endpoint": "dynamic", "status": response.status_code, "latency_ms": round(latency * 1000, 2)}
         # If the GET request returns 200, get the venue's three dynamic params
         if response.status_code == 200:
-            logging.info(f"Dynamic URL returned 200 for slug: {venue_slug}")
-            dynamic_data = response.json()
-            minimum_order_value = dynamic_data["venue_raw"]["delivery_specs"]["order_minimum_no_surcharge"]
-            delivery_base_price = dynamic_data["venue_raw"]["delivery_specs"]["delivery_pricing"]["base_price"]
-            distance_ranges = dynamic_data["venue_raw"]["delivery_specs"]["delivery_pricing"]["distance_ranges"]
-            return minimum_order_value, delivery_base_price, distance_ranges
+            logSampled(logger, "Dynamic URL returned 200 for slug: %s", venue_slug, extra=log_fields)
+            specs = parseDynamicPayload(decodeJson(response.content))
+            return specs.minimum_order_value, specs.delivery_base_price, specs.distance_ranges
         # Otherwise, raise an exception because the value of venue_slug is incorrect
         else:
-            logging.error(f"Dynamic URL returned {response.status_code} for slug: {venue_slug}")
+            logger.error("Dynamic URL returned %s for slug: %s", response.status_code, venue_slug, extra=log_fields)
             raise HTTPException(status_code=response.status_code, detail="Error fetching data from Home Assignment API dynamic URL. Please check the value of venue_slug.")
+    except InvalidVenuePayloadError as e:
+        # The Home Assignment API answered, but with data DOPC cannot price with
+        logger.error("Dynamic URL returned malformed data for slug: %s: %s", venue_slug, e, extra={"venue_slug": venue_slug, "endpoint": "dynamic", "status": 502})
+        raise HTTPException(status_code=502, detail=f"Home Assignment API dynamic URL returned malformed venue data. {e}")
+    except UpstreamUnavailableError as e:
+        # The Home Assignment API is failing or overloaded, so the request is rejected without waiting for it
+        logger.error("Dynamic URL call was shed for slug: %s: %s", venue_slug, e, extra={"venue_slug": venue_slug, "endpoint": "dynamic", "status": 503})
+        raise HTTPException(status_code=503, detail="Home Assignment Dynamic API is currently unavailable. Please try again later.", headers={"Retry-After": "1"})
+    except (DeadlineExceededError, httpx.TimeoutException):
+        # Handle a Home Assignment API which is too slow to answer in time
+        logger.error("Dynamic URL timed out for slug: %s", venue_slug, extra={"venue_slug": venue_slug, "endpoint": "dynamic", "status": 504})
+        raise HTTPException(status_code=504, detail="Timed out during request to Home Assignment Dynamic API.")
     except httpx.RequestError as e:
         # Handle any errors of Home Assignment API
-        logging.error(f"Dynamic URL returned 500 code for slug: {venue_slug}")
+        logger.error("Dynamic URL returned 500 code for slug: %s", venue_slug, extra={"venue_slug": venue_slug, "endpoint": "dynamic", "status": 500})
         raise HTTPException(status_code=500, detail=f"Error during request to Home Assignment Dynamic API. Server returned: {e}")
\ No newline at end of file
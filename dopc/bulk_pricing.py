@@ -0,0 +1,124 @@
+"""
+This file contains bulk versions of computeDistance() and the delivery fee computation, e.g. for re-pricing
+a venue's whole delivery area grid or running offline fee simulations.
+If NumPy is installed (pip install anik-wolt-backend-internship-2025[bulk]) the computations are vectorized,
+otherwise they fall back to the scalar functions. Both give bit-for-bit the same integers as the scalar code.
+"""
+from dopc.helpers import computeDistance
+from dopc.pricing import PricingTable
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+HAVE_NUMPY = np is not None
+
+# The fee returned for distances outside the venue's delivery area
+OUT_OF_RANGE_FEE = -1
+
+# Earth's radius in metres, as in computeDistance()
+EARTH_RADIUS = 6371000
+
+# Distances whose fractional part is this close to .5 are recomputed with computeDistance(),
+# since NumPy's trigonometric functions may differ from the math module in the last bit
+_ROUNDING_TIE_MARGIN = 1e-6
+
+
+def computeDistances(user_lats, user_lons, venue_lats, venue_lons, use_numpy: bool = HAVE_NUMPY):
+    """
+    This function computes the Haversine distances between many users and venues.
+    Venue coordinates can be single floats, e.g. when pricing many locations for one venue, or sequences.
+
+    Parameters:
+        user_lats: A sequence of the users' latitude coordinates in degrees
+        user_lons: A sequence of the users' longitude coordinates in degrees
+        venue_lats: The venues' latitude coordinates in degrees, a float or a sequence
+        venue_lons: The venues' longitude coordinates in degrees, a float or a sequence
+        use_numpy: Whether to use the vectorized implementation. Defaults to True if NumPy is installed
+    Returns:
+        distances: The rounded distances in metres, a NumPy int64 array or a list of integers
+    """
+    if not use_numpy:
+        count = len(user_lats)
+        venue_lats = _broadcast(venue_lats, count)
+        venue_lons = _broadcast(venue_lons, count)
+        return [computeDistance(user_lats[idx], user_lons[idx], venue_lats[idx], venue_lons[idx]) for idx in range(count)]
+
+    user_lats = np.asarray(user_lats, dtype=np.float64)
+    user_lons = np.asarray(user_lons, dtype=np.float64)
+    venue_lats, venue_lons = np.broadcast_arrays(
+        np.asarray(venue_lats, dtype=np.float64), np.asarray(venue_lons, dtype=np.float64), user_lats
+    )[:2]
+
+    # Same formula and order of operations as computeDistance()
+    lat1 = np.radians(user_lats)
+    lon1 = np.radians(user_lons)
+    lat2 = np.radians(venue_lats)
+    lon2 = np.radians(venue_lons)
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    c = 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+    exact_distances = EARTH_RADIUS * c
+    # np.rint rounds halves to even, exactly like round()
+    distances = np.rint(exact_distances).astype(np.int64)
+
+    # Recompute the few distances that lie so close to a rounding tie that the last bit could matter
+    near_tie = np.abs(exact_distances - np.floor(exact_distances) - 0.5) < _ROUNDING_TIE_MARGIN
+    for idx in np.flatnonzero(near_tie):
+        distances[idx] = computeDistance(user_lats[idx], user_lons[idx], venue_lats[idx], venue_lons[idx])
+    return distances
+
+
+def computeDeliveryFees(distances, pricing_table: PricingTable, use_numpy: bool = HAVE_NUMPY):
+    """
+    This function computes the delivery fees of many distances using a venue's distance ranges.
+
+    Parameters:
+        distances: A sequence of integer distances in metres, e.g. returned by computeDistances()
+        pricing_table: The venue's compiled PricingTable
+        use_numpy: Whether to use the vectorized implementation. Defaults to True if NumPy is installed
+    Returns:
+        delivery_fees: The delivery fees, a NumPy int64 array or a list of integers.
+                       Distances outside the delivery area get OUT_OF_RANGE_FEE.
+    """
+    if not use_numpy:
+        return [_computeDeliveryFee(distance, pricing_table) for distance in distances]
+
+    distances = np.asarray(distances, dtype=np.int64)
+    range_min = np.frombuffer(pricing_table.range_min, dtype=np.float64)
+    range_max = np.frombuffer(pricing_table.range_max, dtype=np.float64)
+    range_idx = np.full(distances.shape, -1, dtype=np.int64)
+    if len(range_min) and pricing_table.sorted_ranges:
+        candidates = np.searchsorted(range_min, distances, side="right") - 1
+        clipped = np.maximum(candidates, 0)
+        found = (candidates >= 0) & (distances < range_max[clipped])
+        range_idx[found] = candidates[found]
+    else:
+        # Assign in reverse so that the first matching range wins, like the linear scan
+        for idx in range(len(range_min) - 1, -1, -1):
+            range_idx[(range_min[idx] <= distances) & (distances < range_max[idx])] = idx
+
+    deliverable = range_idx >= 0
+    chosen = range_idx[deliverable]
+    range_a = np.frombuffer(pricing_table.range_a, dtype=np.float64)[chosen]
+    range_b = np.frombuffer(pricing_table.range_b, dtype=np.float64)[chosen]
+    # Same formula and order of operations as computeDeliveryFeeAndSurcharge()
+    fees = pricing_table.delivery_base_price + range_a + range_b * distances[deliverable] / 10
+    delivery_fees = np.full(distances.shape, OUT_OF_RANGE_FEE, dtype=np.int64)
+    delivery_fees[deliverable] = np.rint(fees).astype(np.int64)
+    return delivery_fees
+
+
+def _computeDeliveryFee(distance: int, pricing_table: PricingTable) -> int:
+    # The scalar fallback of computeDeliveryFees()
+    idx = pricing_table.findRange(distance)
+    if idx < 0:
+        return OUT_OF_RANGE_FEE
+    return round(pricing_table.delivery_base_price + pricing_table.range_a[idx] + pricing_table.range_b[idx] * distance / 10)
+
+
+def _broadcast(values, count: int):
+    # Repeat a single coordinate for every user
+    if isinstance(values, (int, float)):
+        return [values] * count
+    return values
@@ -0,0 +1,239 @@
+"""
+This file contains a background warmer for the venue caches, so that popular venues never take the cold path
+of fetching both payloads from the Home Assignment API on the request path:
+    - the popularity of venues is tracked from the venue_slugs priced from the caches, decaying over time
+    - a seed list of venues is fetched at startup
+    - the top venues are refreshed shortly before their cache entries stop being fresh, with jitter
+      so that venues loaded at the same time are not refreshed in lockstep
+Refreshes are queued and run by a fixed number of workers, which bounds the concurrent upstream calls of the warmer.
+"""
+import asyncio
+import contextvars
+import heapq
+import logging
+import random
+import time
+from dopc.venue_cache import VenueDataCache
+from dopc.config import (
+    WARMER_TOP_N,
+    WARMER_INTERVAL,
+    WARMER_JITTER,
+    WARMER_REFRESH_AHEAD,
+    WARMER_MAX_CONCURRENCY,
+    WARMER_POPULARITY_DECAY,
+    WARMER_MAX_TRACKED,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class VenuePopularity:
+    """
+    Request counts per venue_slug, multiplied by decay on every call of decay(), so that recent requests weigh most.
+    At most max_tracked venues are tracked; beyond that the least popular half is forgotten.
+    """
+
+    def __init__(self, decay: float = WARMER_POPULARITY_DECAY, max_tracked: int = WARMER_MAX_TRACKED):
+        self.decay_factor = decay
+        self.max_tracked = max_tracked
+        self._counts = {}
+
+    def record(self, venue_slug: str, weight: float = 1.0):
+        self._counts[venue_slug] = self._counts.get(venue_slug, 0.0) + weight
+        if len(self._counts) > self.max_tracked:
+            self._counts = dict(heapq.nlargest(self.max_tracked // 2, self._counts.items(), key=lambda item: item[1]))
+
+    def forget(self, venue_slug: str):
+        self._counts.pop(venue_slug, None)
+
+    def decay(self):
+        """
+        This function decays all counts, and forgets the venues which have not been requested for a long time.
+        """
+        self._counts = {venue_slug: count * self.decay_factor for venue_slug, count in self._counts.items() if count * self.decay_factor >= 0.01}
+
+    def top(self, n: int) -> list:
+        """
+        This function returns the n most popular venue_slugs, most popular first.
+        """
+        return heapq.nlargest(n, self._counts, key=self._counts.__getitem__)
+
+    def __len__(self):
+        return len(self._counts)
+
+
+class CacheWarmer:
+    """
+    Keeps the top_n most popular venues fresh in the given caches. Every interval seconds (with jitter), an entry of
+    a top venue is queued for a refresh once it is due: when it is missing or at most refresh_ahead seconds from
+    the end of its TTL. max_concurrency workers run the queued refreshes.
+    """
+
+    def __init__(self, caches: tuple, top_n: int = WARMER_TOP_N, interval: float = WARMER_INTERVAL, jitter: float = WARMER_JITTER,
+                 refresh_ahead: float = WARMER_REFRESH_AHEAD, max_concurrency: int = WARMER_MAX_CONCURRENCY,
+                 popularity: VenuePopularity = None, clock=time.monotonic):
+        self.caches = caches
+        self.top_n = top_n
+        self.interval = interval
+        self.jitter = jitter
+        self.refresh_ahead = refresh_ahead
+        self.max_concurrency = max_concurrency
+        self.popularity = VenuePopularity() if popularity is None else popularity
+        self.clock = clock
+        self.refreshes = 0
+        self.refresh_errors = 0
+        self.last_round_at = None
+        self._queue = None
+        self._queued = set()
+        self._tasks = []
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def recordRequest(self, venue_slug: str):
+        """
+        This function counts a request for a venue towards its popularity.
+        """
+        self.popularity.record(venue_slug)
+
+    def isDue(self, cache: VenueDataCache, venue_slug: str) -> bool:
+        """
+        This function returns whether the venue's entry in the cache should be refreshed now.
+        """
+        age = cache.age(venue_slug)
+        if age is None:
+            return True
+        # Up to jitter * refresh_ahead earlier, so that venues loaded together are refreshed at different times
+        return age >= cache.ttl - self.refresh_ahead * (1 + self.jitter * random.random())
+
+    def scheduleRound(self) -> int:
+        """
+        This function queues the due refreshes of the top venues and decays their popularity.
+
+        Returns:
+            queued: The number of refreshes queued
+        """
+        self.last_round_at = self.clock()
+        queued = 0
+        for venue_slug in self.popularity.top(self.top_n):
+            # A venue which does not exist anymore is not refreshed again
+            if self.isMissing(venue_slug):
+                self.popularity.forget(venue_slug)
+                continue
+            for cache in self.caches:
+                if self.isDue(cache, venue_slug) and self._enqueue(cache, venue_slug):
+                    queued += 1
+        self.popularity.decay()
+        return queued
+
+    def isMissing(self, venue_slug: str) -> bool:
+        """
+        This function returns whether any of the caches holds a 404 for the venue.
+        """
+        return any(cache.isNegative(venue_slug) for cache in self.caches)
+
+    def warm(self, venue_slugs) -> int:
+        """
+        This function queues the given venues for fetching, e.g. a seed list at startup. Once their data has been
+        loaded, they also count as popular, so that they are kept fresh until their popularity decays.
+
+        Returns:
+            queued: The number of fetches queued
+        """
+        queued = 0
+        for venue_slug in venue_slugs:
+            if self.isMissing(venue_slug):
+                continue
+            for cache in self.caches:
+                if cache.peek(venue_slug) is None and self._enqueue(cache, venue_slug, seed=True):
+                    queued += 1
+        return queued
+
+    def start(self, seed_venues=()):
+        """
+        This function starts the scheduler and the workers on the running event loop, after queueing the seed venues.
+        """
+        if self.running:
+            return
+        self._queue = asyncio.Queue()
+        self._queued.clear()
+        # The tasks run in an empty context, so they do not inherit a request deadline or trace
+        context = contextvars.Context()
+        self._tasks = [asyncio.create_task(self._worker(), context=context) for _ in range(self.max_concurrency)]
+        self._tasks.append(asyncio.create_task(self._scheduler(), context=context))
+        if seed_venues:
+            logger.info("Warming %d seed venues", len(seed_venues))
+            self.warm(seed_venues)
+
+    async def stop(self):
+        """
+        This function cancels the scheduler, the workers and any refreshes in progress.
+        """
+        tasks, self._tasks = self._tasks, []
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+        self._queue = None
+        self._queued.clear()
+
+    def stats(self) -> dict:
+        """
+        This function returns the warmer's counters, and the seconds since each cache entry of the top venues was loaded.
+        """
+        return {
+            "running": self.running,
+            "tracked_venues": len(self.popularity),
+            "queue_depth": self.queue_depth,
+            "refreshes": self.refreshes,
+            "refresh_errors": self.refresh_errors,
+            "seconds_since_last_round": self.clock() - self.last_round_at if self.last_round_at is not None else None,
+            "hot_venues": {
+                venue_slug: {cache.name: cache.age(venue_slug) for cache in self.caches}
+                for venue_slug in self.popularity.top(self.top_n)
+            },
+        }
+
+    def oldestHotEntryAge(self, cache: VenueDataCache) -> float:
+        """
+        This function returns the age in seconds of the oldest entry of a top venue in the cache, or 0 if there is none.
+        """
+        ages = [cache.age(venue_slug) for venue_slug in self.popularity.top(self.top_n)]
+        return max((age for age in ages if age is not None), default=0.0)
+
+    def _enqueue(self, cache: VenueDataCache, venue_slug: str, seed: bool = False) -> bool:
+        # A venue is queued at most once per cache until its refresh has finished
+        key = (cache.name, venue_slug)
+        if self._queue is None or key in self._queued:
+            return False
+        self._queued.add(key)
+        self._queue.put_nowait((cache, venue_slug, seed))
+        return True
+
+    async def _scheduler(self):
+        while True:
+            await asyncio.sleep(self.interval * random.uniform(1 - self.jitter, 1 + self.jitter))
+            try:
+                self.scheduleRound()
+            except Exception:
+                logger.exception("Scheduling cache warmer refreshes failed")
+
+    async def _worker(self):
+        while True:
+            cache, venue_slug, seed = await self._queue.get()
+            try:
+                # The refresh goes through the cache's single flight, so it never duplicates a fetch of a request
+                if await cache.refresh(venue_slug):
+                    self.refreshes += 1
+                    if seed:
+                        # Each loaded cache entry of a seed venue adds its share, so a fully loaded seed counts as one request
+                        self.popularity.record(venue_slug, 1.0 / len(self.caches))
+                else:
+                    self.refresh_errors += 1
+            finally:
+                self._queued.discard((cache.name, venue_slug))
@@ -1,11 +1,119 @@
 """
 This file contains constant values that can be used in other files for ease of maintainability.
 """
-# This is the prefix of the Home Assignment API URL
-HOME_API_BASE = "https://consumer-api.development.dev.woltapi.com/home-assignment-api/v1/venues"
+import os
+
+# This is the prefix of the Home Assignment API URL. DOPC_HOME_API_BASE overrides it, e.g. to benchmark against a local fake
+HOME_API_BASE = os.environ.get("DOPC_HOME_API_BASE", "https://consumer-api.development.dev.woltapi.com/home-assignment-api/v1/venues")
 
 # This is the default port on which the DOPC service will run if no port is specified.
 DOPC_DEFAULT_PORT = 8000
 
+# Defaults of the server settings, which can be changed with the arguments of python -m dopc
+DOPC_DEFAULT_HOST = "127.0.0.1" # Use 0.0.0.0 to listen on all interfaces
+DOPC_DEFAULT_WORKERS = 1 # Number of worker processes, e.g. one per core on the pricing nodes
+DOPC_DEFAULT_LOOP = "auto" # Event loop: auto, asyncio or uvloop
+DOPC_DEFAULT_HTTP = "auto" # HTTP parser: auto, h11 or httptools
+DOPC_DEFAULT_BACKLOG = 2048 # Maximum number of pending connections
+DOPC_DEFAULT_TIMEOUT_KEEP_ALIVE = 5 # Seconds an idle client connection is kept open
+DOPC_DEFAULT_LIMIT_CONCURRENCY = None # Maximum concurrent connections per worker before answering 503, None for no limit
+DOPC_DEFAULT_TIMEOUT_GRACEFUL_SHUTDOWN = 10 # Seconds to wait for in-flight requests on shutdown
+UPSTREAM_DRAIN_TIMEOUT = 5.0 # Seconds to wait for in-flight upstream calls on shutdown before closing the client
+
 # This is the default log directory, which will contain log messages for DOPC and Home Assignment API calls
-DEFAULT_LOG_DIRECTORY = "logs"
\ No newline at end of file
+DEFAULT_LOG_DIRECTORY = "logs"
+
+# Logging settings, which can be overridden with environment variables
+LOG_DIRECTORY = os.environ.get("DOPC_LOG_DIRECTORY", DEFAULT_LOG_DIRECTORY)
+LOG_FILE = os.environ.get("DOPC_LOG_FILE", "dopc.log") # Inside LOG_DIRECTORY. Use "-" to log to stderr instead
+LOG_LEVEL = os.environ.get("DOPC_LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.environ.get("DOPC_LOG_FORMAT", "json") # "json" for structured records, "text" for plain lines
+LOG_SUCCESS_SAMPLE_RATE = float(os.environ.get("DOPC_LOG_SUCCESS_SAMPLE_RATE", "0.1")) # Fraction of successful upstream calls logged
+
+# Settings for the shared httpx client used for all Home Assignment API calls.
+# A single pooled client avoids a new TCP/TLS handshake on every upstream request.
+UPSTREAM_MAX_CONNECTIONS = 100 # Maximum number of concurrent connections in the pool
+UPSTREAM_MAX_KEEPALIVE_CONNECTIONS = 20 # Maximum number of idle connections kept open
+UPSTREAM_KEEPALIVE_EXPIRY = 30.0 # Seconds after which an idle connection is closed
+UPSTREAM_HTTP2 = False # Requires the optional 'h2' package, i.e. pip install httpx[http2]
+UPSTREAM_CONNECT_TIMEOUT = 2.0 # Seconds to establish a connection
+UPSTREAM_READ_TIMEOUT = 3.0 # Seconds to wait for a chunk of the response
+UPSTREAM_WRITE_TIMEOUT = 3.0 # Seconds to send a chunk of the request
+UPSTREAM_POOL_TIMEOUT = 1.0 # Seconds to wait for a free connection from the pool
+
+# Settings for the in-process venue data caches, all durations in seconds.
+# Once an entry is older than the TTL it is still served, but refreshed in the background (stale-while-revalidate).
+# Once it is older than the stale TTL it is fetched again on the request path.
+STATIC_CACHE_TTL = 3600.0 # Venue coordinates almost never change
+STATIC_CACHE_STALE_TTL = 86400.0
+DYNAMIC_CACHE_TTL = 10.0 # Delivery specs change rarely, but should be picked up quickly
+DYNAMIC_CACHE_STALE_TTL = 60.0
+NEGATIVE_CACHE_TTL = 30.0 # How long a venue_slug which returned 404 is remembered
+VENUE_CACHE_MAX_ENTRIES = 10000 # Per cache, least recently used venues are evicted first
+
+# Settings of the background warmer which keeps the venue caches fresh for popular venues, see cache_warmer.py
+WARMER_ENABLED = os.environ.get("DOPC_CACHE_WARMER", "1") == "1"
+WARMER_SEED_VENUES = [venue_slug.strip() for venue_slug in os.environ.get("DOPC_WARM_VENUES", "").split(",") if venue_slug.strip()] # Fetched at startup
+WARMER_TOP_N = int(os.environ.get("DOPC_WARMER_TOP_N", "50")) # Number of most popular venues kept fresh
+WARMER_INTERVAL = 1.0 # Seconds between scheduling rounds
+WARMER_JITTER = 0.2 # Fraction by which the interval and the refresh time of each venue are randomized
+WARMER_REFRESH_AHEAD = 2.0 # Seconds before the end of the TTL at which a venue is refreshed
+WARMER_MAX_CONCURRENCY = 4 # Refreshes running at once, and so upstream calls made by the warmer
+WARMER_POPULARITY_DECAY = 0.99 # Factor applied to the popularity of venues every round, a half-life of about 70 rounds
+WARMER_MAX_TRACKED = 10000 # Venues whose popularity is tracked
+
+# Settings of the index of venue delivery areas, used to reject out of range requests early, see spatial.py
+GEO_INDEX_CELL_DEGREES = 0.05 # Size of the grid cells, about 5.5 km in latitude
+GEO_INDEX_TTL = DYNAMIC_CACHE_STALE_TTL # A delivery area is used no longer than the delivery specs it comes from would be served
+
+# Settings of the optional cache of computed prices, see quote_cache.py. Prices are only cached if the distance rounds
+# to the same metre everywhere within one cell of the rounded coordinates, so cached prices are exact
+QUOTE_CACHE_MAX_ENTRIES = int(os.environ.get("DOPC_QUOTE_CACHE_SIZE", "0")) # 0 disables the cache
+QUOTE_CACHE_PRECISION = int(os.environ.get("DOPC_QUOTE_CACHE_PRECISION", "7")) # Decimals of the user's coordinates, 7 is about 1 centimetre
+
+# Serialize the pricing responses with the byte templates of responses.py instead of FastAPI's encoder. The output is identical, but the mode is opt-in
+FAST_RESPONSES = os.environ.get("DOPC_FAST_RESPONSES", "0") == "1"
+
+# The maximum number of items accepted by the batch delivery order price endpoint
+BATCH_MAX_ITEMS = 500
+
+# Protections around calls to the Home Assignment API, so that DOPC fails fast instead of queueing
+UPSTREAM_MAX_CONCURRENCY = 200 # Maximum number of concurrent upstream calls per worker
+UPSTREAM_ACQUIRE_TIMEOUT = 0.5 # Seconds to wait for a free upstream call slot before shedding the request
+UPSTREAM_MAX_RETRIES = 2 # Retries after connection errors, timeouts and 5xx responses
+UPSTREAM_RETRY_BASE_DELAY = 0.05 # Seconds, doubled on every retry and randomized (full jitter)
+UPSTREAM_RETRY_MAX_DELAY = 0.5 # Upper bound of the delay between retries in seconds
+CIRCUIT_BREAKER_FAILURE_THRESHOLD = 5 # Consecutive failures after which calls to a host are rejected immediately
+CIRCUIT_BREAKER_RESET_TIMEOUT = 10.0 # Seconds after which a trial call is let through an open circuit
+REQUEST_DEADLINE = 4.0 # Seconds an incoming request may spend on upstream calls
+REQUEST_DEADLINE_MIN = 0.1 # The shortest deadline in seconds clients can ask for with the header
+REQUEST_DEADLINE_HEADER = "X-Request-Timeout-Ms" # Lets clients ask for a shorter deadline, in milliseconds
+
+# Admission control in front of the pricing endpoints, see admission.py
+ADMISSION_MAX_IN_FLIGHT = int(os.environ.get("DOPC_MAX_IN_FLIGHT", "256")) # Pricing requests handled at once per worker, 0 for no limit
+ADMISSION_MAX_QUEUE = int(os.environ.get("DOPC_ADMISSION_QUEUE", "64")) # Further requests waiting for a slot, more are answered with 503
+ADMISSION_QUEUE_TIMEOUT = 0.1 # Seconds a request waits for a slot before it is answered with 503
+ADMISSION_RETRY_AFTER = 1 # Seconds in the Retry-After header of a 503
+# Token bucket rate limits per worker, in requests per second. 0 disables a limit.
+# Behind a proxy all clients share its address, so set RATE_LIMIT_CLIENT_HEADER to the header with the client's address
+RATE_LIMIT_CLIENT_RPS = float(os.environ.get("DOPC_RATE_LIMIT_CLIENT", "0"))
+RATE_LIMIT_CLIENT_BURST = float(os.environ.get("DOPC_RATE_LIMIT_CLIENT_BURST", str(2 * RATE_LIMIT_CLIENT_RPS)))
+RATE_LIMIT_VENUE_RPS = float(os.environ.get("DOPC_RATE_LIMIT_VENUE", "0"))
+RATE_LIMIT_VENUE_BURST = float(os.environ.get("DOPC_RATE_LIMIT_VENUE_BURST", str(2 * RATE_LIMIT_VENUE_RPS)))
+RATE_LIMIT_CLIENT_HEADER = os.environ.get("DOPC_CLIENT_ADDRESS_HEADER") # e.g. X-Forwarded-For, only behind a trusted proxy
+RATE_LIMIT_MAX_KEYS = 100000 # Buckets kept per limiter before all of them are dropped
+RATE_LIMIT_CLEANUP_INTERVAL = 60.0 # Seconds between removals of full buckets
+
+# Venue data can be pushed to DOPC instead of fetched per request, see venue_store.py
+VENUE_SNAPSHOT_ENV = "DOPC_VENUE_SNAPSHOT" # Environment variable with the path of a JSON lines snapshot loaded by every worker on startup
+VENUE_FILE_ENV = "DOPC_VENUE_FILE" # Environment variable with the path of a venue file which every worker maps on startup, see venue_file.py
+VENUE_FILE_FETCH_CONCURRENCY = 50 # Venues fetched at once when a venue file is built from the Home Assignment API, each with two calls
+ADMIN_TOKEN = os.environ.get("DOPC_ADMIN_TOKEN") # If set, the /admin endpoints require it in the ADMIN_TOKEN_HEADER
+ADMIN_TOKEN_HEADER = "X-Admin-Token"
+ADMIN_ALLOW_LOOPBACK = os.environ.get("DOPC_ADMIN_ALLOW_LOOPBACK", "0") == "1" # Without a token, answer admin requests from loopback addresses
+
+# Request tracing, see tracing.py
+TRACING_ENABLED = os.environ.get("DOPC_TRACING", "1") == "1" # Request IDs and Server-Timing headers
+TRACE_SLOW_THRESHOLD_MS = float(os.environ.get("DOPC_TRACE_SLOW_MS", "250")) # Requests at least this slow are kept in /debug/traces, 0 to keep none
+TRACE_BUFFER_SIZE = 100 # Number of slow request traces kept per worker
+REQUEST_ID_HEADER = "X-Request-ID"
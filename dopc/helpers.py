@@ -40,6 +40,20 @@ def computeDistance(userLat: float, userLon: float, venueLat: float, venueLon: f
     Returns:
         distance: An integer value of the straight line distance between the user and venue
     """
+    return round(computeExactDistance(userLat, userLon, venueLat, venueLon))
+
+def computeExactDistance(userLat: float, userLon: float, venueLat: float, venueLon: float) -> float:
+    """
+    This function computes the distance like computeDistance(), but without rounding it to whole metres.
+
+    Parameters:
+        userLat: A float value of the user's latitude coordinate in degrees
+        userLon: A float value of the user's longitude coordinate in degrees
+        venueLat: A float value of the venue's latitude coordinate in degrees
+        venueLon: A float value of the venue's longitude coordinate in degrees
+    Returns:
+        distance: A float value of the straight line distance between the user and venue in metres
+    """
     # Earth's radius is approximately 6371 kilometres
     earth_radius = 6371000 # In metres
     
@@ -57,8 +71,7 @@ def computeDistance(userLat: float, userLon: float, venueLat: float, venueLon: f
     # Multiply c by earth's radius to get the distance
     distance = earth_radius * c
 
-    # Return rounded distance
-    return round(distance)
+    return distance
 
 def computeDeliveryFeeAndSurcharge(cart_value: int, distance: int, minimum_order_value: float, delivery_base_price: float, distance_ranges: list):
     """
@@ -96,6 +109,52 @@ def computeDeliveryFeeAndSurcharge(cart_value: int, distance: int, minimum_order
     return delivery_fee, surcharge
 
 
+def getInvalidParams(venue_slug: str, cart_value: int, user_lat: float, user_lon: float) -> dict:
+    """
+    A function that checks the parameters of a delivery order price request.
+    It is shared by the single and batch endpoints, so that both validate requests in the same way.
+
+    Parameters:
+        venue_slug: A string that uniquely identifies a venue
+        cart_value: An integer that represents the value of items in the cart
+        user_lat: A float that represents the user's latitude coordinate in degrees
+        user_lon: A float that represents the user's longitude coordinate in degrees
+    Returns:
+        invalid_params: A dict of the invalid or missing parameters and their values. Empty if all are valid
+    """
+    invalid_params = {}
+
+    # venue_slug is invalid if it is empty or unspecified
+    if not venue_slug:
+        invalid_params["venue_slug"] = ""
+    # cart_value is invalid if it is less than 0
+    if cart_value < 0:
+        invalid_params["cart_value"] = cart_value
+    invalid_params.update(getInvalidCoordinates(user_lat, user_lon))
+
+    return invalid_params
+
+
+def getInvalidCoordinates(user_lat: float, user_lon: float) -> dict:
+    """
+    A function that checks the user's coordinates of a request.
+
+    Parameters:
+        user_lat: A float that represents the user's latitude coordinate in degrees
+        user_lon: A float that represents the user's longitude coordinate in degrees
+    Returns:
+        invalid_params: A dict of the invalid or missing coordinates and their values. Empty if both are valid
+    """
+    invalid_params = {}
+    # user_lat is invalid if it is unspecified or outside the range [-90, +90] degrees
+    if user_lat is None or not (-90 <= user_lat <= 90):
+        invalid_params["user_lat"] = user_lat
+    # user_lon is invalid if it is unspecified or outside the range [-180, +180] degrees
+    if user_lon is None or not (-180 <= user_lon <= 180):
+        invalid_params["user_lon"] = user_lon
+    return invalid_params
+
+
 def getServicePort() -> int:
     """
     A helper function to fetch the default port configuration from the config file.
@@ -0,0 +1,126 @@
+"""
+This file sets up logging for all DOPC modules, which log through logging.getLogger(__name__).
+Records are put on a queue by a QueueHandler and written by a QueueListener in a background thread,
+so the event loop never blocks on disk writes. Records are formatted as JSON lines by default,
+including structured fields such as venue_slug, status and latency_ms passed with extra={...},
+and the request_id of the request during which the record was logged.
+"""
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+from dopc.tracing import getRequestId
+from dopc.config import LOG_DIRECTORY, LOG_FILE, LOG_LEVEL, LOG_FORMAT, LOG_SUCCESS_SAMPLE_RATE
+
+# All DOPC loggers are children of this logger
+DOPC_LOGGER_NAME = "dopc"
+
+# The attributes every LogRecord has. Anything else was passed with extra={...} and is added to the JSON record
+_STANDARD_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime", "taskName"}
+
+_listener = None
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Formats a record as one JSON object per line.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _STANDARD_RECORD_ATTRIBUTES:
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class RequestIdFilter(logging.Filter):
+    """
+    Adds the ID of the current request to records. It runs where the record is logged, before the record is queued.
+    """
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        request_id = getRequestId()
+        if request_id is not None:
+            record.request_id = request_id
+        return True
+
+
+def setupLogging(level: str = LOG_LEVEL, log_directory: str = LOG_DIRECTORY, log_file: str = LOG_FILE, log_format: str = LOG_FORMAT):
+    """
+    This function routes the records of all DOPC loggers through a queue to a background listener.
+    It is called on startup of the service, and calling it again replaces the previous setup.
+
+    Parameters:
+        level: The minimum level of records which are logged, e.g. "INFO"
+        log_directory: The directory of the log file
+        log_file: The name of the log file, or "-" to log to stderr
+        log_format: "json" for structured records, "text" for plain lines
+    """
+    global _listener
+    stopLogging()
+
+    if log_file == "-":
+        destination = logging.StreamHandler()
+    else:
+        os.makedirs(log_directory, exist_ok=True)
+        destination = logging.FileHandler(os.path.join(log_directory, log_file))
+    if log_format == "json":
+        destination.setFormatter(JsonFormatter())
+    else:
+        destination.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(name)s - %(message)s'))
+
+    log_queue = queue.SimpleQueue()
+    dopc_logger = logging.getLogger(DOPC_LOGGER_NAME)
+    dopc_logger.setLevel(level)
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    queue_handler.addFilter(RequestIdFilter())
+    dopc_logger.handlers = [queue_handler]
+    dopc_logger.propagate = False
+
+    _listener = logging.handlers.QueueListener(log_queue, destination)
+    _listener.start()
+
+
+def stopLogging():
+    """
+    This function writes all queued records, stops the background listener and closes the log file.
+    """
+    global _listener
+    if _listener is None:
+        return
+    listener, _listener = _listener, None
+    listener.stop()
+    for handler in listener.handlers:
+        handler.close()
+    dopc_logger = logging.getLogger(DOPC_LOGGER_NAME)
+    dopc_logger.handlers = []
+    dopc_logger.propagate = True
+
+
+def logSampled(logger: logging.Logger, message: str, *args, extra: dict = None, sample_rate: float = None):
+    """
+    This function logs a frequent INFO message, such as a successful upstream call, for only a fraction of calls.
+    The check happens before a record is created, so skipped messages cost almost nothing.
+
+    Parameters:
+        logger: The logger to use
+        message: The message, with %-style placeholders for args
+        args: Values for the placeholders, only formatted if the record is written
+        extra: Structured fields added to the record
+        sample_rate: The fraction of calls to log. Defaults to LOG_SUCCESS_SAMPLE_RATE
+    """
+    if sample_rate is None:
+        sample_rate = LOG_SUCCESS_SAMPLE_RATE
+    if sample_rate >= 1 or random.random() < sample_rate:
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(message, *args, extra=extra)
@@ -0,0 +1,225 @@
+"""
+This file contains low-overhead, in-process metrics for the DOPC service, exposed in the Prometheus text format
+on the /metrics endpoint. No external service or client library is needed: every worker aggregates its own
+counters and histograms in plain dicts and lists, and renders them when scraped.
+"""
+import time
+from bisect import bisect_left
+from dopc.tracing import traceSpan
+
+# Latency buckets in seconds, from 100 microseconds for pure computations up to upstream timeouts
+DEFAULT_LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+def _formatLabels(labelnames: tuple, labelvalues: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, labelvalues)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _formatValue(value) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """
+    A monotonically increasing value per combination of label values.
+    """
+    __slots__ = ("name", "help", "labelnames", "values")
+    type = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: tuple = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.values = {}
+
+    def inc(self, *labelvalues, amount: float = 1):
+        self.values[labelvalues] = self.values.get(labelvalues, 0) + amount
+
+    def get(self, *labelvalues) -> float:
+        return self.values.get(labelvalues, 0)
+
+    def render(self) -> list:
+        return [f"{self.name}{_formatLabels(self.labelnames, labels)} {_formatValue(value)}" for labels, value in self.values.items()]
+
+
+class Gauge(Counter):
+    """
+    A value which can go up and down, e.g. the number of requests in flight.
+    """
+    __slots__ = ()
+    type = "gauge"
+
+    def dec(self, *labelvalues, amount: float = 1):
+        self.values[labelvalues] = self.values.get(labelvalues, 0) - amount
+
+    def set(self, *labelvalues, value: float):
+        self.values[labelvalues] = value
+
+
+class CallbackGauge:
+    """
+    A gauge whose values are read from a function when the metrics are rendered, e.g. cache counters.
+    The function returns a dict mapping tuples of label values to values.
+    """
+    __slots__ = ("name", "help", "labelnames", "callback")
+    type = "gauge"
+
+    def __init__(self, name: str, help: str, labelnames: tuple, callback):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.callback = callback
+
+    def render(self) -> list:
+        return [f"{self.name}{_formatLabels(self.labelnames, labels)} {_formatValue(value)}" for labels, value in self.callback().items()]
+
+
+class CallbackCounter(CallbackGauge):
+    """
+    A counter whose values are read from a function when the metrics are rendered, e.g. cache hits since startup.
+    The values must only increase, except when the counted object is reset.
+    """
+    __slots__ = ()
+    type = "counter"
+
+
+class Histogram:
+    """
+    Counts observations in cumulative buckets per combination of label values, e.g. latencies in seconds.
+    """
+    __slots__ = ("name", "help", "labelnames", "buckets", "values")
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: tuple = (), buckets: tuple = DEFAULT_LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.buckets = tuple(sorted(buckets))
+        # Per label values: [bucket counts (non-cumulative, last one is +Inf), sum, count]
+        self.values = {}
+
+    def observe(self, value: float, *labelvalues):
+        series = self.values.get(labelvalues)
+        if series is None:
+            series = self.values[labelvalues] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+
+    def count(self, *labelvalues) -> int:
+        series = self.values.get(labelvalues)
+        return series[2] if series else 0
+
+    def render(self) -> list:
+        lines = []
+        for labels, (bucket_counts, total, count) in self.values.items():
+            cumulative = 0
+            for upper_bound, bucket_count in zip(self.buckets + (float("inf"),), bucket_counts):
+                cumulative += bucket_count
+                bucket_label = 'le="' + _formatValue(upper_bound) + '"'
+                lines.append(f"{self.name}_bucket{_formatLabels(self.labelnames, labels, bucket_label)} {cumulative}")
+            lines.append(f"{self.name}_sum{_formatLabels(self.labelnames, labels)} {_formatValue(total)}")
+            lines.append(f"{self.name}_count{_formatLabels(self.labelnames, labels)} {count}")
+        return lines
+
+
+class Registry:
+    """
+    A collection of metrics which are rendered together.
+    """
+
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        """
+        This function renders all metrics in the Prometheus text exposition format.
+        """
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+# The metrics of the DOPC service
+stage_latency = registry.register(Histogram(
+    "dopc_stage_latency_seconds", "Time spent in each stage of pricing a delivery", ("stage",)))
+upstream_latency = registry.register(Histogram(
+    "dopc_upstream_latency_seconds", "Latency of Home Assignment API calls", ("endpoint", "status")))
+requests_total = registry.register(Counter(
+    "dopc_http_requests_total", "HTTP responses by route and status code", ("route", "status")))
+requests_in_flight = registry.register(Gauge(
+    "dopc_http_requests_in_flight", "HTTP requests currently being handled"))
+errors_total = registry.register(Counter(
+    "dopc_errors_total", "Failed quotes by error class", ("error",)))
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware which counts responses by route and status code, and tracks the requests in flight.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        status = [500]
+
+        async def sendWithStatus(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        requests_in_flight.inc()
+        try:
+            await self.app(scope, receive, sendWithStatus)
+        finally:
+            requests_in_flight.dec()
+            # Use the route template rather than the raw path, so unknown paths cannot create new series
+            route = scope.get("route")
+            requests_total.inc(getattr(route, "path", "unmatched"), status[0])
+
+
+class _StageTimer:
+    __slots__ = ("stage", "start", "span")
+
+    def __init__(self, stage: str):
+        self.stage = stage
+        self.span = traceSpan(stage)
+
+    def __enter__(self):
+        self.span.__enter__()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        stage_latency.observe(time.perf_counter() - self.start, self.stage)
+        self.span.__exit__(*exc_info)
+
+
+def timeStage(stage: str) -> _StageTimer:
+    """
+    This function returns a context manager which observes the time spent in a stage of pricing a delivery.
+    The stage is also recorded as a span in the trace of the request, see tracing.py.
+    """
+    return _StageTimer(stage)
@@ -0,0 +1,114 @@
+"""
+This file contains a compiled pricing table for a venue.
+computeDeliveryFeeAndSurcharge() in helpers.py walks the raw distance_ranges dicts on every request.
+A PricingTable is built once per version of a venue's dynamic data instead, storing the range boundaries
+and a/b coefficients in flat arrays, so that the delivery fee is found with a binary search.
+"""
+from array import array
+from bisect import bisect_right
+
+
+def getTableVersion(minimum_order_value: float, delivery_base_price: float, range_min, range_max, range_a, range_b) -> int:
+    """
+    This function returns the version of a compiled table, derived from everything a price depends on.
+    Tables compiled from equal delivery specs get the same version, so results derived from a table stay valid when
+    the same dynamic data is fetched again, and results derived from a table with other specs can be told apart.
+    """
+    return hash((minimum_order_value, delivery_base_price, tuple(range_min), tuple(range_max), tuple(range_a), tuple(range_b)))
+
+
+class PricingTable:
+    """
+    The compiled delivery pricing of a venue. It gives exactly the same results as computeDeliveryFeeAndSurcharge(),
+    including the rule that the last distance range only marks the end of the delivery area.
+    """
+    __slots__ = (
+        "minimum_order_value",
+        "delivery_base_price",
+        "range_min",
+        "range_max",
+        "range_a",
+        "range_b",
+        "max_distance",
+        "sorted_ranges",
+        "version",
+    )
+
+    def __init__(self, minimum_order_value: float, delivery_base_price: float, distance_ranges: list):
+        """
+        Parameters:
+            minimum_order_value: Provided by Home Assignment API dynamic URL
+            delivery_base_price: Provided by Home Assignment API dynamic URL
+            distance_ranges: A range of distance values provided by the Home Assignment API dynamic URL
+        """
+        self.minimum_order_value = minimum_order_value
+        self.delivery_base_price = delivery_base_price
+
+        # The last range is never used for pricing, and empty ranges can never match a distance
+        usable_ranges = [distance_range for distance_range in distance_ranges[:-1] if distance_range["min"] < distance_range["max"]]
+        self.range_min = array("d", (distance_range["min"] for distance_range in usable_ranges))
+        self.range_max = array("d", (distance_range["max"] for distance_range in usable_ranges))
+        self.range_a = array("d", (distance_range["a"] for distance_range in usable_ranges))
+        self.range_b = array("d", (distance_range["b"] for distance_range in usable_ranges))
+
+        # A binary search finds the same range as the linear scan only if the ranges are sorted and do not overlap.
+        # Upstream data always looks like that, but anything else falls back to a linear scan in the original order.
+        self.sorted_ranges = all(self.range_max[idx] <= self.range_min[idx + 1] for idx in range(len(usable_ranges) - 1))
+
+        # Sentinel: no distance at or beyond this value can be delivered to
+        self.max_distance = max(self.range_max, default=0.0)
+        self.version = getTableVersion(minimum_order_value, delivery_base_price, self.range_min, self.range_max, self.range_a, self.range_b)
+
+    @classmethod
+    def fromArrays(cls, minimum_order_value: float, delivery_base_price: float, range_min, range_max, range_a, range_b, sorted_ranges: bool, max_distance: float):
+        """
+        This function builds a PricingTable from already compiled range arrays, without copying them.
+        Any sequence of floats works, e.g. memoryview slices of a mapped venue file, see venue_file.py.
+        """
+        table = cls.__new__(cls)
+        table.minimum_order_value = minimum_order_value
+        table.delivery_base_price = delivery_base_price
+        table.range_min = range_min
+        table.range_max = range_max
+        table.range_a = range_a
+        table.range_b = range_b
+        table.sorted_ranges = sorted_ranges
+        table.max_distance = max_distance
+        table.version = getTableVersion(minimum_order_value, delivery_base_price, range_min, range_max, range_a, range_b)
+        return table
+
+    def findRange(self, distance: int) -> int:
+        """
+        This function returns the index of the distance range containing the distance, or -1 if there is none.
+        """
+        if distance >= self.max_distance:
+            return -1
+        if self.sorted_ranges:
+            idx = bisect_right(self.range_min, distance) - 1
+            if idx >= 0 and distance < self.range_max[idx]:
+                return idx
+            return -1
+        for idx in range(len(self.range_min)):
+            if self.range_min[idx] <= distance < self.range_max[idx]:
+                return idx
+        return -1
+
+    def computeDeliveryFeeAndSurcharge(self, cart_value: int, distance: int):
+        """
+        This function computes the delivery fee and surcharge for a given cart_value and distance.
+        If the delivery is outside the range of available values, an exception is thrown which is handled by DOPC.
+
+        Parameters:
+            cart_value: An integer representing the input cart_value passed to DOPC
+            distance: An integer, denoting the straight line distance between user and venue
+        Returns:
+            delivery_fee: An integer, computed based on the given formula in the document
+            surcharge: An integer computed based on the given instructions
+        """
+        idx = self.findRange(distance)
+        if idx < 0:
+            raise ValueError("The delivery distance is too large! Delivery not possible!")
+        # Same formula and order of operations as computeDeliveryFeeAndSurcharge()
+        delivery_fee = round(self.delivery_base_price + self.range_a[idx] + self.range_b[idx] * distance / 10)
+        surcharge = round(self.minimum_order_value - cart_value) if self.minimum_order_value > cart_value else 0
+        return delivery_fee, surcharge
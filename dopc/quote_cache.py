@@ -0,0 +1,128 @@
+"""
+This file contains an optional cache of computed prices. Apps poll for a price while the user edits their cart,
+so the same venue, cart_value and almost the same location are priced again and again.
+Prices are cached by venue coordinates, PricingTable version, cart_value and the user's coordinates rounded to
+QUOTE_CACHE_PRECISION decimals. A price is only cached if the distance rounds to the same whole metre everywhere
+within the rounded coordinates, so a cached price is always exactly the price which would be computed.
+The version of a PricingTable is derived from the delivery specs it was compiled from, so refetching unchanged
+dynamic data keeps the cached prices of a venue. Once its specs change, the old prices are never served again,
+and they are evicted as least recently used.
+"""
+import math
+from collections import OrderedDict
+from dopc.metrics import registry, CallbackGauge, CallbackCounter
+from dopc.config import QUOTE_CACHE_MAX_ENTRIES, QUOTE_CACHE_PRECISION
+
+# Stored for quotes whose delivery distance is too large, so that they are not computed again either
+OUT_OF_RANGE = object()
+
+# The same earth radius as computeDistance()
+EARTH_RADIUS = 6371000.0
+
+
+class QuoteCache:
+    """
+    A size-bounded LRU cache of prices. A cache with max_entries 0 is disabled and stores nothing.
+    """
+
+    def __init__(self, max_entries: int, precision: int):
+        """
+        Parameters:
+            max_entries: The maximum number of cached prices, 0 to disable the cache
+            precision: The number of decimals the user's coordinates are rounded to. 7 decimals are about 1 centimetre
+        """
+        self.max_entries = max_entries
+        self.precision = precision
+        # The largest distance in metres between two points whose coordinates round to the same key, per unit of 1 + cos(latitude)
+        self._cell_size = EARTH_RADIUS * math.radians(10 ** -precision)
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.skipped = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def makeKey(self, cart_value: int, user_lat: float, user_lon: float, venue_coordinates: list, pricing_table) -> tuple:
+        """
+        This function returns the cache key of a quote.
+        """
+        return (venue_coordinates[0], venue_coordinates[1], pricing_table.version, cart_value,
+                round(user_lat, self.precision), round(user_lon, self.precision))
+
+    def isCacheable(self, exact_distance: float, user_lat: float) -> bool:
+        """
+        This function returns whether every location whose coordinates round to the same key as the user's
+        is at a distance which rounds to the same whole metre. Otherwise the quote must not be cached.
+
+        Parameters:
+            exact_distance: The unrounded distance of the user from the venue in metres, see computeExactDistance()
+            user_lat: The user's latitude in degrees
+        """
+        # Within one key, the latitude differs by at most 10^-precision degrees, which is cell_size metres,
+        # and so does the longitude, which is cell_size * cos(latitude) metres
+        error = self._cell_size * (1 + abs(math.cos(math.radians(user_lat)))) + 1e-6
+        if math.floor(exact_distance - error + 0.5) == math.floor(exact_distance + error + 0.5):
+            return True
+        self.skipped += 1
+        return False
+
+    def get(self, key: tuple):
+        """
+        This function returns the cached price of a quote, OUT_OF_RANGE, or None if it is not cached.
+        """
+        result = self._entries.get(key)
+        if result is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return result
+
+    def put(self, key: tuple, result):
+        """
+        This function stores the price of a quote, or OUT_OF_RANGE.
+        """
+        self._entries[key] = result
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        """
+        This function removes all cached prices.
+        """
+        self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self) -> dict:
+        """
+        This function returns the cache's counters.
+        """
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "skipped": self.skipped,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+        }
+
+
+quote_cache = QuoteCache(QUOTE_CACHE_MAX_ENTRIES, QUOTE_CACHE_PRECISION)
+
+registry.register(CallbackCounter(
+    "dopc_quote_cache_events_total", "Quote cache lookups and evictions since startup, by event", ("event",),
+    lambda: {(event,): value for event, value in quote_cache.stats().items() if event not in ("entries", "hit_ratio")}))
+registry.register(CallbackGauge(
+    "dopc_quote_cache_hit_ratio", "Fraction of quotes answered from the quote cache", (),
+    lambda: {(): quote_cache.stats()["hit_ratio"]}))
+registry.register(CallbackGauge(
+    "dopc_quote_cache_entries", "Prices currently held in the quote cache", (),
+    lambda: {(): len(quote_cache)}))
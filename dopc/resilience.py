@@ -0,0 +1,371 @@
+"""
+This file contains the protections around calls to the Home Assignment API, so that DOPC fails fast and sheds load
+instead of queueing when the upstream server is slow or failing:
+    - a circuit breaker per upstream host
+    - capped exponential-backoff retries with full jitter for GET requests, which are idempotent
+    - a limit on the number of concurrent upstream calls
+    - a deadline per incoming request, which caps the time spent on all of its upstream calls
+"""
+import asyncio
+import contextlib
+import contextvars
+import random
+import time
+import httpx
+from dopc.config import (
+    UPSTREAM_MAX_CONCURRENCY,
+    UPSTREAM_ACQUIRE_TIMEOUT,
+    UPSTREAM_MAX_RETRIES,
+    UPSTREAM_RETRY_BASE_DELAY,
+    UPSTREAM_RETRY_MAX_DELAY,
+    CIRCUIT_BREAKER_FAILURE_THRESHOLD,
+    CIRCUIT_BREAKER_RESET_TIMEOUT,
+    REQUEST_DEADLINE,
+    REQUEST_DEADLINE_MIN,
+    REQUEST_DEADLINE_HEADER,
+)
+from dopc.metrics import registry, CallbackGauge
+
+
+class UpstreamUnavailableError(Exception):
+    """
+    Raised without contacting the upstream server, because its circuit is open or too many calls are in flight.
+    """
+
+
+class DeadlineExceededError(Exception):
+    """
+    Raised when the deadline of the incoming request has passed before the upstream call could complete.
+    """
+
+
+class SharedDeadline:
+    """
+    The deadline of a call shared by several requests, see single_flight.py. It is the latest deadline of the requests
+    waiting for the call, or None if one of them has no deadline, so it is extended while the call is running.
+    """
+    __slots__ = ("deadline", "_timeouts")
+
+    def __init__(self, deadline):
+        self.deadline = deadline
+        # The asyncio timeouts of the upstream calls currently bounded by this deadline
+        self._timeouts = set()
+
+    def extend(self, deadline):
+        """
+        This function moves the deadline to the given monotonic time, or removes it for None, if that is later.
+        """
+        if self.deadline is None or (deadline is not None and deadline <= self.deadline):
+            return
+        self.deadline = deadline
+        for timeout in self._timeouts:
+            timeout.reschedule(None if deadline is None else asyncio.get_running_loop().time() + deadline - time.monotonic())
+
+    @contextlib.asynccontextmanager
+    async def limit(self):
+        """
+        This function returns a context manager which raises TimeoutError once the deadline passes, like asyncio.timeout().
+        """
+        remaining = None if self.deadline is None else self.deadline - time.monotonic()
+        timeout = asyncio.timeout(remaining)
+        self._timeouts.add(timeout)
+        try:
+            async with timeout:
+                yield
+        finally:
+            self._timeouts.discard(timeout)
+
+
+class CircuitBreaker:
+    """
+    A circuit breaker for one upstream host. After failure_threshold consecutive failures the circuit opens and
+    calls are rejected immediately. After reset_timeout one trial call is let through (half-open); if it succeeds
+    the circuit closes again, otherwise it stays open for another reset_timeout.
+    """
+    __slots__ = ("failure_threshold", "reset_timeout", "clock", "failures", "opened_at", "trial_in_progress")
+
+    def __init__(self, failure_threshold: int = CIRCUIT_BREAKER_FAILURE_THRESHOLD, reset_timeout: float = CIRCUIT_BREAKER_RESET_TIMEOUT, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.failures = 0
+        self.opened_at = None
+        self.trial_in_progress = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if self.clock() - self.opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def allowRequest(self) -> bool:
+        """
+        This function returns whether a call may be made. In the half-open state only one trial call is allowed.
+        """
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half-open" and not self.trial_in_progress:
+            self.trial_in_progress = True
+            return True
+        return False
+
+    def recordSuccess(self):
+        self.failures = 0
+        self.opened_at = None
+        self.trial_in_progress = False
+
+    def recordFailure(self):
+        self.failures += 1
+        if self.trial_in_progress or self.failures >= self.failure_threshold:
+            self.opened_at = self.clock()
+        self.trial_in_progress = False
+
+
+# One circuit breaker per upstream host
+_circuit_breakers = {}
+
+# The limiter is created lazily per event loop, since an asyncio.Semaphore must not be shared between loops
+_limiter = None
+_limiter_loop = None
+
+# The monotonic time by which the current incoming request has to be answered, or None if it has no deadline.
+# Calls shared by several requests have a SharedDeadline instead
+_request_deadline = contextvars.ContextVar("request_deadline", default=None)
+
+# The number of upstream calls currently in flight, e.g. to wait for them on shutdown
+_in_flight_calls = 0
+
+
+registry.register(CallbackGauge(
+    "dopc_upstream_calls_in_flight", "Home Assignment API calls currently in flight", (), lambda: {(): _in_flight_calls}))
+registry.register(CallbackGauge(
+    "dopc_upstream_circuit_open", "Whether the circuit of an upstream host is open (1) or not (0)", ("host",),
+    lambda: {(host,): int(circuit_breaker.state == "open") for host, circuit_breaker in _circuit_breakers.items()}))
+
+
+def getCircuitBreaker(host: str) -> CircuitBreaker:
+    """
+    This function returns the circuit breaker of an upstream host, creating it if necessary.
+    """
+    circuit_breaker = _circuit_breakers.get(host)
+    if circuit_breaker is None:
+        circuit_breaker = _circuit_breakers[host] = CircuitBreaker()
+    return circuit_breaker
+
+
+def resetCircuitBreakers():
+    """
+    This function closes all circuits by forgetting every circuit breaker.
+    """
+    _circuit_breakers.clear()
+
+
+def getLimiter() -> asyncio.Semaphore:
+    """
+    This function returns the semaphore limiting concurrent upstream calls on the running event loop.
+    """
+    global _limiter, _limiter_loop
+    loop = asyncio.get_running_loop()
+    if _limiter is None or _limiter_loop is not loop:
+        _limiter = asyncio.Semaphore(UPSTREAM_MAX_CONCURRENCY)
+        _limiter_loop = loop
+    return _limiter
+
+
+def getInFlightCalls() -> int:
+    """
+    This function returns the number of upstream calls currently in flight.
+    """
+    return _in_flight_calls
+
+
+async def drainUpstreamCalls(timeout: float) -> bool:
+    """
+    This function waits until no upstream calls are in flight, e.g. on shutdown before the client is closed.
+
+    Parameters:
+        timeout: The maximum number of seconds to wait
+    Returns:
+        True if all calls finished, False if some were still in flight after the timeout
+    """
+    deadline = time.monotonic() + timeout
+    while _in_flight_calls and time.monotonic() < deadline:
+        await asyncio.sleep(0.01)
+    return _in_flight_calls == 0
+
+
+def setRequestDeadline(timeout: float):
+    """
+    This function sets the deadline of the current request to timeout seconds from now.
+    It returns a token which can be passed to resetRequestDeadline().
+    """
+    return _request_deadline.set(time.monotonic() + timeout)
+
+
+def resetRequestDeadline(token):
+    _request_deadline.reset(token)
+
+
+def getDeadline():
+    """
+    This function returns the monotonic time of the deadline of the current request, or None if it has no deadline.
+    """
+    deadline = _request_deadline.get()
+    if type(deadline) is SharedDeadline:
+        return deadline.deadline
+    return deadline
+
+
+def getRemainingTime():
+    """
+    This function returns the seconds left until the deadline of the current request, or None if it has no deadline.
+    """
+    deadline = getDeadline()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+def setSharedDeadline(shared_deadline: SharedDeadline):
+    """
+    This function makes the deadline of the current context a SharedDeadline, e.g. in the context of a shared call.
+    """
+    return _request_deadline.set(shared_deadline)
+
+
+def _limitToDeadline():
+    # The deadline of the current context as a context manager, following the extensions of a SharedDeadline
+    deadline = _request_deadline.get()
+    if type(deadline) is SharedDeadline:
+        return deadline.limit()
+    return asyncio.timeout(deadline - time.monotonic())
+
+
+def getRetryDelay(attempt: int) -> float:
+    """
+    This function returns how long to wait before retry number attempt (starting at 0),
+    using exponential backoff capped at UPSTREAM_RETRY_MAX_DELAY with full jitter.
+    """
+    return random.uniform(0, min(UPSTREAM_RETRY_MAX_DELAY, UPSTREAM_RETRY_BASE_DELAY * 2 ** attempt))
+
+
+async def resilientGet(client: httpx.AsyncClient, url: str, max_retries: int = UPSTREAM_MAX_RETRIES) -> httpx.Response:
+    """
+    This function makes a GET request to an upstream URL with all protections of this file.
+    Connection errors, timeouts and 5xx responses count as failures and are retried while the deadline allows it.
+    Any other response, including 404, is returned as is.
+
+    Parameters:
+        client: The httpx client to use for the request
+        url: The upstream URL to request
+        max_retries: The maximum number of retries after the first attempt
+    Returns:
+        response: The httpx response. After the last retry this can also be a 5xx response
+    Raises:
+        UpstreamUnavailableError: If the host's circuit is open, or no upstream call slot became free in time
+        DeadlineExceededError: If the deadline of the incoming request passed
+        httpx.RequestError: If the last attempt failed with a connection error or timeout
+    """
+    global _in_flight_calls
+    circuit_breaker = getCircuitBreaker(httpx.URL(url).host)
+    limiter = getLimiter()
+    attempt = 0
+    while True:
+        remaining = getRemainingTime()
+        if remaining is not None and remaining <= 0:
+            raise DeadlineExceededError(f"Deadline exceeded before request to {url}")
+        if not circuit_breaker.allowRequest():
+            raise UpstreamUnavailableError(f"Circuit for {httpx.URL(url).host} is open")
+
+        # Wait for a free upstream call slot, but not longer than the deadline allows
+        acquire_timeout = UPSTREAM_ACQUIRE_TIMEOUT if remaining is None else min(UPSTREAM_ACQUIRE_TIMEOUT, remaining)
+        try:
+            await asyncio.wait_for(limiter.acquire(), acquire_timeout)
+        except TimeoutError:
+            # No call was made, so the trial slot of a half-open circuit has to be given back
+            circuit_breaker.trial_in_progress = False
+            raise UpstreamUnavailableError(f"Too many concurrent upstream calls, request to {url} was shed")
+
+        _in_flight_calls += 1
+        response = error = None
+        try:
+            remaining = getRemainingTime()
+            if remaining is None:
+                response = await client.get(url)
+            else:
+                # The per-phase timeouts of the client still apply, but the whole call may not outlive the deadline
+                try:
+                    async with _limitToDeadline():
+                        response = await client.get(url)
+                except TimeoutError:
+                    # The caller's deadline says nothing about the health of the upstream server, and clients choose
+                    # their own deadline, so it must not count as a failure. The trial slot of a half-open circuit is given back
+                    circuit_breaker.trial_in_progress = False
+                    raise DeadlineExceededError(f"Deadline exceeded during request to {url}")
+        except httpx.RequestError as e:
+            error = e
+        except asyncio.CancelledError:
+            # The call did not finish, so it must not block the trial slot of a half-open circuit
+            circuit_breaker.trial_in_progress = False
+            raise
+        finally:
+            _in_flight_calls -= 1
+            limiter.release()
+
+        if error is None and response.status_code < 500:
+            circuit_breaker.recordSuccess()
+            return response
+        circuit_breaker.recordFailure()
+        # The call slot is released while waiting for the retry
+        if not await _waitForRetry(attempt, max_retries):
+            if error is not None:
+                raise error
+            return response
+        attempt += 1
+
+
+async def _waitForRetry(attempt: int, max_retries: int) -> bool:
+    # Sleep before the next retry. Returns False if there are no retries left or the deadline would pass while waiting
+    if attempt >= max_retries:
+        return False
+    delay = getRetryDelay(attempt)
+    remaining = getRemainingTime()
+    if remaining is not None and delay >= remaining:
+        return False
+    await asyncio.sleep(delay)
+    return True
+
+
+class DeadlineMiddleware:
+    """
+    ASGI middleware which gives every incoming request a deadline for its upstream calls.
+    Clients can ask for a shorter deadline with the REQUEST_DEADLINE_HEADER header, in milliseconds,
+    but not for one shorter than REQUEST_DEADLINE_MIN.
+    """
+
+    def __init__(self, app, default_timeout: float = REQUEST_DEADLINE, min_timeout: float = REQUEST_DEADLINE_MIN):
+        self.app = app
+        self.default_timeout = default_timeout
+        self.min_timeout = min(min_timeout, default_timeout)
+        self.header_name = REQUEST_DEADLINE_HEADER.lower().encode()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        timeout = self.default_timeout
+        for name, value in scope["headers"]:
+            if name == self.header_name:
+                try:
+                    timeout = min(timeout, max(self.min_timeout, int(value) / 1000))
+                except ValueError:
+                    pass
+                break
+        token = setRequestDeadline(timeout)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            resetRequestDeadline(token)
@@ -0,0 +1,58 @@
+"""
+This file contains a fast path for serializing the responses of the pricing endpoints.
+FastAPI runs every returned dict through jsonable_encoder() and json.dumps(), and every HTTPException through
+its exception handler, although the price always has the same shape and most errors have constant details.
+Here a price is formatted into a byte template, and constant error responses are serialized once at import.
+The bytes are exactly what FastAPI would send: the same compact separators and the same application/json content type.
+"""
+import json
+from starlette.responses import Response
+
+# The price of a delivery. All of its values are integers, see priceQuote() in service.py
+PRICE_TEMPLATE = '{"total_price":%d,"small_order_surcharge":%d,"cart_value":%d,"delivery":{"fee":%d,"distance":%d}}'
+
+
+def dumpJson(content) -> bytes:
+    """
+    This function serializes content exactly like the JSONResponse of FastAPI.
+    """
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+
+def renderPrice(price: dict) -> bytes:
+    """
+    This function serializes a price returned by priceQuote(). Values which are not integers fall back to dumpJson().
+    """
+    delivery = price["delivery"]
+    values = (price["total_price"], price["small_order_surcharge"], price["cart_value"], delivery["fee"], delivery["distance"])
+    if all(type(value) is int for value in values):
+        return (PRICE_TEMPLATE % values).encode("ascii")
+    return dumpJson(price)
+
+
+def renderError(detail) -> bytes:
+    """
+    This function serializes an error detail in the body format of an HTTPException.
+    """
+    return dumpJson({"detail": detail})
+
+
+class PrebuiltResponse:
+    """
+    A JSON response body which is serialized once and sent as is.
+    """
+    __slots__ = ("status_code", "body")
+
+    def __init__(self, status_code: int, content):
+        self.status_code = status_code
+        self.body = dumpJson(content)
+
+    def response(self) -> Response:
+        return Response(content=self.body, status_code=self.status_code, media_type="application/json")
+
+
+def jsonResponse(body: bytes, status_code: int = 200) -> Response:
+    """
+    This function wraps an already serialized JSON body in a response.
+    """
+    return Response(content=body, status_code=status_code, media_type="application/json")
@@ -1,22 +1,104 @@
 """
 This file contains the code for the DOPC service
 """
-from fastapi import FastAPI, HTTPException, Query
+import asyncio
+import ipaddress
+import os
+import secrets
+from contextlib import asynccontextmanager
+from typing import Optional
+from fastapi import FastAPI, HTTPException, Query, Request, Depends
+from fastapi.responses import PlainTextResponse
+from pydantic import BaseModel
 import uvicorn
-from dopc.helpers import computeDistance, computeDeliveryFeeAndSurcharge
-from dopc.api_fetchers import fetchStaticData, fetchDynamicData
+from dopc.helpers import computeExactDistance, getInvalidParams, getInvalidCoordinates
+from dopc.pricing import PricingTable
+from dopc.venue_data import getVenueData, closeVenueCaches, openVenueFile, closeVenueFile, venue_store, static_cache, dynamic_cache, geo_index, cache_warmer
+from dopc.venue_store import buildVenueRecord, parseSnapshotLines
+from dopc.upstream_client import startUpstreamClient, closeUpstreamClient
+from dopc.resilience import DeadlineMiddleware, drainUpstreamCalls
+from dopc.logging_config import setupLogging, stopLogging
+from dopc.quote_cache import quote_cache, OUT_OF_RANGE
+from dopc.responses import PrebuiltResponse, renderPrice, renderError, dumpJson, jsonResponse
+from dopc.metrics import registry, errors_total, timeStage, MetricsMiddleware
+from dopc.tracing import TracingMiddleware, getSlowTraces
+from dopc.admission import AdmissionMiddleware
+from dopc.config import (
+    BATCH_MAX_ITEMS,
+    FAST_RESPONSES,
+    VENUE_SNAPSHOT_ENV,
+    VENUE_FILE_ENV,
+    ADMIN_TOKEN,
+    ADMIN_TOKEN_HEADER,
+    ADMIN_ALLOW_LOOPBACK,
+    TRACE_SLOW_THRESHOLD_MS,
+    WARMER_ENABLED,
+    WARMER_SEED_VENUES,
+    UPSTREAM_DRAIN_TIMEOUT,
+    DOPC_DEFAULT_HOST,
+    DOPC_DEFAULT_WORKERS,
+    DOPC_DEFAULT_LOOP,
+    DOPC_DEFAULT_HTTP,
+    DOPC_DEFAULT_BACKLOG,
+    DOPC_DEFAULT_TIMEOUT_KEEP_ALIVE,
+    DOPC_DEFAULT_LIMIT_CONCURRENCY,
+    DOPC_DEFAULT_TIMEOUT_GRACEFUL_SHUTDOWN,
+)
 
-# For logging requests and error messages
-import os
-if not os.path.exists('logs'):
-    os.mkdir('logs')
+# For logging requests and error messages, see logging_config.py
 import logging
-from dopc.config import DEFAULT_LOG_DIRECTORY
-logging.basicConfig(level=logging.INFO,
-                    format='%(asctime)s - %(levelname)s - %(message)s',
-                    handlers=[logging.FileHandler(f'{DEFAULT_LOG_DIRECTORY}/dopc.log')]) 
+logger = logging.getLogger(__name__)
 
-dopc = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Startup and shutdown of the DOPC service. With several workers, every worker process runs this on its own,
+    so each has its own upstream client and venue caches.
+    A single pooled client is shared by all calls to the Home Assignment API for the lifetime of the service.
+    If a venue file or snapshot is configured, it is mapped or loaded before the first request is served.
+    The cache warmer is started in the background, beginning with the seed venues, see cache_warmer.py.
+    On shutdown, the cache warmer is stopped and upstream calls which are still in flight (e.g. background cache refreshes) are drained first.
+    """
+    setupLogging()
+    snapshot_path = os.environ.get(VENUE_SNAPSHOT_ENV)
+    if snapshot_path:
+        venue_store.loadFile(snapshot_path)
+    venue_file_path = os.environ.get(VENUE_FILE_ENV)
+    if venue_file_path:
+        logger.info("Mapped %d venues from venue file %s", len(openVenueFile(venue_file_path)), venue_file_path)
+    await startUpstreamClient()
+    if WARMER_ENABLED:
+        cache_warmer.start(WARMER_SEED_VENUES)
+    try:
+        yield
+    finally:
+        await cache_warmer.stop()
+        if not await drainUpstreamCalls(UPSTREAM_DRAIN_TIMEOUT):
+            logger.warning("Upstream calls were still in flight after %s seconds, closing the client anyway", UPSTREAM_DRAIN_TIMEOUT)
+        await closeVenueCaches()
+        closeVenueFile()
+        await closeUpstreamClient()
+        stopLogging()
+
+dopc = FastAPI(lifespan=lifespan)
+# Shed pricing requests beyond the rate limits and the cap on requests in flight, see admission.py.
+# Inside the deadline middleware, so that the time waiting for admission counts against the deadline
+dopc.add_middleware(AdmissionMiddleware)
+# Every request gets a deadline for its calls to the Home Assignment API
+dopc.add_middleware(DeadlineMiddleware)
+# Count responses and requests in flight, see metrics.py
+dopc.add_middleware(MetricsMiddleware)
+# Outermost, so that the trace of a request covers all of its time, see tracing.py
+dopc.add_middleware(TracingMiddleware)
+
+# The error detail returned when the user is too far away from the venue
+DELIVERY_DISTANCE_TOO_LARGE_DETAIL = {
+    "message": "Invalid request! Delivery distance is too large! Delivery not possible!",
+}
+# The same error, serialized once for the fast responses, as a response and as a batch result
+DELIVERY_DISTANCE_TOO_LARGE_RESPONSE = PrebuiltResponse(400, {"detail": DELIVERY_DISTANCE_TOO_LARGE_DETAIL})
+DELIVERY_DISTANCE_TOO_LARGE_RESULT = PrebuiltResponse(400, {"status_code": 400, "detail": DELIVERY_DISTANCE_TOO_LARGE_DETAIL})
 
 @dopc.get("/api/v1/delivery-order-price")
 async def getDeliveryOrderPrice(
@@ -38,54 +120,375 @@ async def getDeliveryOrderPrice(
         A json object according the requirements specification
     """
     # Handling of invalid or missing parameters
-    invalid_params = {}
-    
-    # venue_slug is invalid if it is empty or unspecified
-    if not venue_slug:
-        invalid_params["venue_slug"] = ""
-    # cart_value is invalid if it is less than 0
-    if cart_value < 0:
-        invalid_params["cart_value"] = cart_value
-    # user_lat is invalid if it is unspecified or outside the range [-90, +90] degrees
-    if user_lat is None or not (-90 <= user_lat <= 90):
-        invalid_params["user_lat"] = user_lat
-    # user_lon is invalid if it is unspecified or outside the range [-180, +180] degrees
-    if user_lon is None or not (-180 <= user_lat <= 180):
-        invalid_params["user_lon"] = user_lon
-
+    with timeStage("validation"):
+        invalid_params = getInvalidParams(venue_slug, cart_value, user_lat, user_lon)
     if invalid_params:
-        logging.error(f"Received request at DOPC endpoint with invalid params: {invalid_params}")
-        raise HTTPException(
-            status_code=400,
-            detail={
-                "message": "Invalid request. One or more parameters are missing or invalid.",
-                "invalid_parameters": invalid_params,
-                "hint": "Please ensure to use correct parameter values",
-            }
-        )
-    
-    # Fetch the necessary parameters from the two endpoints
-    # First from the Home Assignment API static URL
-    venue_lon, venue_lat = await fetchStaticData(venue_slug)
-    
-    # Then from the Home Assignment API dynamic URL
-    minimum_order_value, delivery_base_price, distance_ranges = await fetchDynamicData(venue_slug)
+        errors_total.inc("invalid_params")
+        logger.error("Received request at DOPC endpoint with invalid params: %s", invalid_params, extra={"venue_slug": venue_slug, "status": 400})
+        if FAST_RESPONSES:
+            return jsonResponse(renderError(getInvalidParamsDetail(invalid_params)), 400)
+        raise HTTPException(status_code=400, detail=getInvalidParamsDetail(invalid_params))
 
-    # Compute the distance using the coordinates of the user and venue
-    distance = computeDistance(user_lat, user_lon, venue_lat, venue_lon)
+    # Coordinates outside the known delivery area of the venue are rejected without fetching anything
+    if geo_index.excludes(venue_slug, user_lat, user_lon):
+        errors_total.inc("out_of_range")
+        logger.error("Delivery distance is too large. Coordinates are outside the delivery area of the venue", extra={"venue_slug": venue_slug, "status": 400})
+        return getDeliveryDistanceTooLargeResponse()
+    
+    # Fetch the necessary parameters from the Home Assignment API static and dynamic URLs concurrently
+    try:
+        venue_coordinates, pricing_table = await getVenueData(venue_slug)
+    except HTTPException as e:
+        errors_total.inc(getUpstreamErrorClass(e.status_code))
+        raise
 
-    # Finally calculate the delivery fee and return a response based on the specified format
     # If the delivery distance is too large, it has to be handled accordingly
     try:
-        delivery_fee, surcharge = computeDeliveryFeeAndSurcharge(cart_value, distance, minimum_order_value, delivery_base_price, distance_ranges)
+        price = priceQuote(cart_value, user_lat, user_lon, venue_coordinates, pricing_table)
     except ValueError as e:
-        logging.error(f"Delivery distance is too large. computeDeliveryFeeAndSurcharge() threw exception {e}")
+        errors_total.inc("out_of_range")
+        logger.error("Delivery distance is too large. computeDeliveryFeeAndSurcharge() threw exception %s", e, extra={"venue_slug": venue_slug, "status": 400})
+        return getDeliveryDistanceTooLargeResponse()
+    if FAST_RESPONSES:
+        return jsonResponse(renderPrice(price))
+    return price
+
+
+def getDeliveryDistanceTooLargeResponse():
+    """
+    This function returns the prebuilt out of range response, or raises it as an HTTPException if fast responses are off.
+    """
+    if FAST_RESPONSES:
+        return DELIVERY_DISTANCE_TOO_LARGE_RESPONSE.response()
+    raise HTTPException(status_code=400, detail=DELIVERY_DISTANCE_TOO_LARGE_DETAIL)
+
+
+class QuoteRequest(BaseModel):
+    """
+    One item of a batch request. The defaults match the query parameter defaults of the single endpoint,
+    so missing values are reported as invalid parameters of the item instead of failing the whole batch.
+    """
+    venue_slug: str = ""
+    cart_value: int = -9000
+    user_lat: Optional[float] = None
+    user_lon: Optional[float] = None
+
+
+class BatchQuoteRequest(BaseModel):
+    items: list[QuoteRequest]
+
+
+@dopc.post("/api/v1/delivery-order-price/batch")
+async def getDeliveryOrderPriceBatch(batch: BatchQuoteRequest):
+    """
+    This endpoint prices many (venue_slug, cart_value, user_lat, user_lon) tuples in one call.
+    Each venue's Home Assignment API data is fetched once, no matter how many items use it.
+
+    Parameters:
+        batch: A json object with a list of items, each having the parameters of the single endpoint
+    Returns:
+        A json object with one result per item, in the same order. Each result has the status_code the
+        single endpoint would have returned, and either the price or the error detail.
+    """
+    if len(batch.items) > BATCH_MAX_ITEMS:
+        logger.error("Received batch request with %d items, the maximum is %d", len(batch.items), BATCH_MAX_ITEMS, extra={"status": 413})
         raise HTTPException(
-            status_code=400,
+            status_code=413,
             detail={
-                "message": "Invalid request! Delivery distance is too large! Delivery not possible!",
+                "message": f"Invalid request. A batch can contain at most {BATCH_MAX_ITEMS} items.",
             }
         )
+
+    # Validate all items first, exactly like the single endpoint, and reject items outside the known delivery areas
+    invalid_items = [getInvalidParams(item.venue_slug, item.cart_value, item.user_lat, item.user_lon) for item in batch.items]
+    excluded_items = [not invalid_params and geo_index.excludes(item.venue_slug, item.user_lat, item.user_lon) for item, invalid_params in zip(batch.items, invalid_items)]
+
+    # Fetch the data of each distinct venue once, concurrently
+    venue_slugs = list(dict.fromkeys(
+        item.venue_slug for item, invalid_params, excluded in zip(batch.items, invalid_items, excluded_items) if not invalid_params and not excluded))
+    venue_results = await asyncio.gather(*(getVenueData(venue_slug) for venue_slug in venue_slugs), return_exceptions=True)
+    venue_data_by_slug = dict(zip(venue_slugs, venue_results))
+
+    results = []
+    for item, invalid_params, excluded in zip(batch.items, invalid_items, excluded_items):
+        if invalid_params:
+            errors_total.inc("invalid_params")
+            results.append({"status_code": 400, "detail": getInvalidParamsDetail(invalid_params)})
+            continue
+        if excluded:
+            errors_total.inc("out_of_range")
+            results.append({"status_code": 400, "detail": DELIVERY_DISTANCE_TOO_LARGE_DETAIL})
+            continue
+        venue_result = venue_data_by_slug[item.venue_slug]
+        if isinstance(venue_result, HTTPException):
+            errors_total.inc(getUpstreamErrorClass(venue_result.status_code))
+            results.append({"status_code": venue_result.status_code, "detail": venue_result.detail})
+            continue
+        if isinstance(venue_result, BaseException):
+            raise venue_result
+        venue_coordinates, pricing_table = venue_result
+        try:
+            results.append({"status_code": 200, "price": priceQuote(item.cart_value, item.user_lat, item.user_lon, venue_coordinates, pricing_table)})
+        except ValueError:
+            errors_total.inc("out_of_range")
+            results.append({"status_code": 400, "detail": DELIVERY_DISTANCE_TOO_LARGE_DETAIL})
+    if FAST_RESPONSES:
+        return jsonResponse(renderBatchResults(results))
+    return {"results": results}
+
+
+def renderBatchResults(results: list) -> bytes:
+    """
+    This function serializes the results of a batch request, using the price template and the prebuilt out of range result.
+    """
+    parts = []
+    for result in results:
+        if result["status_code"] == 200:
+            parts.append(b'{"status_code":200,"price":' + renderPrice(result["price"]) + b"}")
+        elif result.get("detail") is DELIVERY_DISTANCE_TOO_LARGE_DETAIL:
+            parts.append(DELIVERY_DISTANCE_TOO_LARGE_RESULT.body)
+        else:
+            parts.append(dumpJson(result))
+    return b'{"results":[' + b",".join(parts) + b"]}"
+
+
+@dopc.get("/api/v1/venues/delivering-to")
+async def getVenuesDeliveringTo(
+    user_lat: float = Query(None, description = "The user's latitude"),
+    user_lon: float = Query(None, description = "The user's longitude")
+):
+    """
+    This endpoint lists the venues which deliver to the user's coordinates, among the venues this worker has
+    seen recently (priced, pushed or cached). No venue data is fetched from the Home Assignment API.
+
+    Parameters:
+        user_lat: A float that represents the user's latitude coordinate in degrees
+        user_lon: A float that represents the user's longitude coordinate in degrees
+    Returns:
+        A json object with the venue_slug and delivery distance of each venue, nearest first
+    """
+    invalid_params = getInvalidCoordinates(user_lat, user_lon)
+    if invalid_params:
+        errors_total.inc("invalid_params")
+        logger.error("Received venue query with invalid params: %s", invalid_params, extra={"status": 400})
+        raise HTTPException(status_code=400, detail=getInvalidParamsDetail(invalid_params))
+    return {"venues": [
+        {"venue_slug": venue_slug, "distance": distance} for venue_slug, distance in geo_index.venuesDeliveringTo(user_lat, user_lon)
+    ]}
+
+
+@dopc.get("/metrics", response_class=PlainTextResponse)
+async def getMetrics():
+    """
+    This endpoint exposes the metrics of this worker in the Prometheus text format, see metrics.py.
+    """
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+
+def isLoopbackClient(request: Request) -> bool:
+    """
+    This function returns whether a request comes from the same host, over a loopback address.
+    """
+    if request.client is None:
+        return False
+    try:
+        return ipaddress.ip_address(request.client.host).is_loopback
+    except ValueError:
+        return False
+
+
+def checkAdminToken(request: Request):
+    """
+    This dependency rejects requests to the admin and debug endpoints without the configured ADMIN_TOKEN.
+    Without an ADMIN_TOKEN these endpoints can replace all pricing data unauthenticated, so they are closed,
+    unless ADMIN_ALLOW_LOOPBACK opens them to loopback addresses. Behind a reverse proxy on the same host,
+    every request comes from a loopback address, so that is only safe without such a proxy.
+    """
+    if ADMIN_TOKEN is None:
+        if not (ADMIN_ALLOW_LOOPBACK and isLoopbackClient(request)):
+            logger.error("Rejected admin request to %s without a configured token", request.url.path, extra={"status": 403})
+            raise HTTPException(status_code=403, detail={"message": "Forbidden. Set DOPC_ADMIN_TOKEN to use the admin endpoints."})
+        return
+    if not secrets.compare_digest(request.headers.get(ADMIN_TOKEN_HEADER, ""), ADMIN_TOKEN):
+        logger.error("Rejected admin request to %s without a valid token", request.url.path, extra={"status": 401})
+        raise HTTPException(status_code=401, detail={"message": f"Invalid request. A valid {ADMIN_TOKEN_HEADER} header is required."})
+
+
+class VenueUpdate(BaseModel):
+    """
+    The payloads of the Home Assignment API static and dynamic URLs for one venue, in the same shape.
+    """
+    static: dict
+    dynamic: dict
+
+
+@dopc.post("/admin/venues/snapshot", dependencies=[Depends(checkAdminToken)])
+async def loadVenueSnapshot(request: Request):
+    """
+    This endpoint replaces all venues of the venue store with a snapshot, sent as JSON lines in the request body.
+    Each line has a venue_slug and the static and dynamic payloads, see venue_store.py. The snapshot is parsed
+    off the event loop and swapped in at once. If any line is invalid, the store is left unchanged.
+    Only the worker which receives the request is updated; with several workers, load the snapshot on startup instead.
+
+    Returns:
+        A json object with the new version of the store and its number of venues
+    """
+    body = await request.body()
+    try:
+        records = await asyncio.to_thread(parseSnapshotLines, body.splitlines())
+    except ValueError as e:
+        logger.error("Rejected venue snapshot: %s", e, extra={"status": 400})
+        raise HTTPException(status_code=400, detail={"message": f"Invalid venue snapshot. {e}"})
+    version = venue_store.swap(records)
+    # The snapshot may change any delivery area, so none of the known ones is used anymore
+    geo_index.clear()
+    logger.info("Loaded %d venues from pushed snapshot, store version %d", len(records), version)
+    return {"version": version, "venues": len(records)}
+
+
+@dopc.put("/admin/venues/{venue_slug}", dependencies=[Depends(checkAdminToken)])
+async def updateVenue(venue_slug: str, update: VenueUpdate):
+    """
+    This endpoint adds or replaces a single venue of the venue store.
+
+    Returns:
+        A json object with the new version of the store
+    """
+    try:
+        record = buildVenueRecord(update.static, update.dynamic)
+    except ValueError as e:
+        logger.error("Rejected update of venue %s: %s", venue_slug, e, extra={"venue_slug": venue_slug, "status": 400})
+        raise HTTPException(status_code=400, detail={"message": f"Invalid venue update. {e}"})
+    version = venue_store.update(venue_slug, record)
+    geo_index.remove(venue_slug)
+    return {"version": version, "venue_slug": venue_slug}
+
+
+@dopc.delete("/admin/venues/{venue_slug}", dependencies=[Depends(checkAdminToken)])
+async def removeVenue(venue_slug: str):
+    """
+    This endpoint removes a venue from the venue store, so that it is fetched from the Home Assignment API again.
+    """
+    if not venue_store.remove(venue_slug):
+        raise HTTPException(status_code=404, detail={"message": f"Venue {venue_slug} is not in the venue store."})
+    # Cached data may be older than the removed venue, so it is fetched again
+    static_cache.invalidate(venue_slug)
+    dynamic_cache.invalidate(venue_slug)
+    geo_index.remove(venue_slug)
+    return {"version": venue_store.version, "venue_slug": venue_slug}
+
+
+@dopc.get("/admin/venues", dependencies=[Depends(checkAdminToken)])
+async def getVenueStoreStats():
+    """
+    This endpoint returns the version, size and lookup counters of the venue store of this worker.
+    """
+    return venue_store.stats()
+
+
+@dopc.get("/admin/cache-warmer", dependencies=[Depends(checkAdminToken)])
+async def getCacheWarmerStats():
+    """
+    This endpoint returns the counters of the cache warmer of this worker, its queue depth,
+    and the age in seconds of the cached data of the venues it keeps fresh.
+    """
+    return cache_warmer.stats()
+
+
+@dopc.get("/debug/traces", dependencies=[Depends(checkAdminToken)])
+async def getTraces():
+    """
+    This endpoint returns the span trees of the recent requests of this worker which were slower than TRACE_SLOW_THRESHOLD_MS, newest first.
+    """
+    return {"threshold_ms": TRACE_SLOW_THRESHOLD_MS, "traces": getSlowTraces()}
+
+
+def getUpstreamErrorClass(status_code: int) -> str:
+    """
+    This function maps the status code of a failed Home Assignment API fetch to the error class used in metrics.
+    """
+    if status_code == 404:
+        return "upstream_404"
+    if status_code == 502:
+        return "upstream_malformed"
+    if status_code == 503:
+        return "upstream_unavailable"
+    if status_code == 504:
+        return "upstream_timeout"
+    return "upstream_error"
+
+
+def getInvalidParamsDetail(invalid_params: dict) -> dict:
+    """
+    This function builds the error detail returned for a request with invalid or missing parameters.
+    """
+    return {
+        "message": "Invalid request. One or more parameters are missing or invalid.",
+        "invalid_parameters": invalid_params,
+        "hint": "Please ensure to use correct parameter values",
+    }
+
+
+def priceQuote(cart_value: int, user_lat: float, user_lon: float, venue_coordinates: list, pricing_table: PricingTable) -> dict:
+    """
+    This function computes the price of a delivery in the response format of the specification.
+    If the quote cache is enabled, the price of the same quote is reused, see quote_cache.py.
+
+    Parameters:
+        cart_value: An integer that represents the value of items in the cart
+        user_lat: A float that represents the user's latitude coordinate in degrees
+        user_lon: A float that represents the user's longitude coordinate in degrees
+        venue_coordinates: A list containing two floats venue_lon and venue_lat
+        pricing_table: The venue's compiled PricingTable
+    Returns:
+        A dict according the requirements specification
+    Raises:
+        ValueError: If the delivery distance is too large
+    """
+    venue_lon, venue_lat = venue_coordinates
+    if not quote_cache.enabled:
+        return computeQuote(cart_value, measureDistance(user_lat, user_lon, venue_lat, venue_lon), pricing_table)
+    key = quote_cache.makeKey(cart_value, user_lat, user_lon, venue_coordinates, pricing_table)
+    price = quote_cache.get(key)
+    if price is None:
+        exact_distance = measureDistance(user_lat, user_lon, venue_lat, venue_lon)
+        # Quotes whose distance could round differently elsewhere within the key are not cached
+        cacheable = quote_cache.isCacheable(exact_distance, user_lat)
+        try:
+            price = computeQuote(cart_value, exact_distance, pricing_table)
+        except ValueError:
+            if cacheable:
+                quote_cache.put(key, OUT_OF_RANGE)
+            raise
+        if cacheable:
+            quote_cache.put(key, price)
+    if price is OUT_OF_RANGE:
+        raise ValueError("The delivery distance is too large! Delivery not possible!")
+    return price
+
+
+def measureDistance(user_lat: float, user_lon: float, venue_lat: float, venue_lon: float) -> float:
+    """
+    This function computes the unrounded distance between the user and the venue as the "distance" stage.
+    """
+    with timeStage("distance"):
+        return computeExactDistance(user_lat, user_lon, venue_lat, venue_lon)
+
+
+def computeQuote(cart_value: int, exact_distance: float, pricing_table: PricingTable) -> dict:
+    """
+    This function computes the price of a delivery like priceQuote(), without the quote cache.
+
+    Parameters:
+        cart_value: An integer that represents the value of items in the cart
+        exact_distance: The unrounded distance between the user and the venue in metres, see measureDistance()
+        pricing_table: The venue's compiled PricingTable
+    """
+    distance = round(exact_distance)
+
+    # Finally calculate the delivery fee and return a response based on the specified format
+    with timeStage("fee"):
+        delivery_fee, surcharge = pricing_table.computeDeliveryFeeAndSurcharge(cart_value, distance)
     total_delivery_price = cart_value + surcharge + delivery_fee
     return {
         "total_price": total_delivery_price,
@@ -97,6 +500,68 @@ async def getDeliveryOrderPrice(
         }        
     }
 
-def runService(port: int):
-    print(f"Started DOPC Service on port {port}")
-    uvicorn.run(dopc, host="127.0.0.1", port=port)
\ No newline at end of file
+def runService(
+    port: int,
+    host: str = DOPC_DEFAULT_HOST,
+    workers: int = DOPC_DEFAULT_WORKERS,
+    loop: str = DOPC_DEFAULT_LOOP,
+    http: str = DOPC_DEFAULT_HTTP,
+    backlog: int = DOPC_DEFAULT_BACKLOG,
+    timeout_keep_alive: int = DOPC_DEFAULT_TIMEOUT_KEEP_ALIVE,
+    limit_concurrency: int = DOPC_DEFAULT_LIMIT_CONCURRENCY,
+    timeout_graceful_shutdown: int = DOPC_DEFAULT_TIMEOUT_GRACEFUL_SHUTDOWN,
+    venue_snapshot: Optional[str] = None,
+    venue_file: Optional[str] = None,
+):
+    """
+    This function runs the DOPC service with uvicorn.
+
+    Parameters:
+        port: The port on which the DOPC service will run
+        host: The interface to listen on
+        workers: The number of worker processes
+        loop: The event loop implementation: auto, asyncio or uvloop
+        http: The HTTP parser: auto, h11 or httptools
+        backlog: The maximum number of pending connections
+        timeout_keep_alive: Seconds an idle client connection is kept open
+        limit_concurrency: The maximum number of concurrent connections per worker before answering 503
+        timeout_graceful_shutdown: Seconds to wait for in-flight requests on shutdown
+        venue_snapshot: The path of a JSON lines venue snapshot which every worker loads on startup
+        venue_file: The path of a venue file which every worker maps on startup
+    """
+    # Passed through the environment, since worker processes do not share the arguments of this one
+    if venue_snapshot:
+        os.environ[VENUE_SNAPSHOT_ENV] = os.path.abspath(venue_snapshot)
+    if venue_file:
+        os.environ[VENUE_FILE_ENV] = os.path.abspath(venue_file)
+    # uvloop and httptools are optional (pip install uvicorn[standard]), so fall back if they are missing
+    loop = _ensureInstalled(loop, "uvloop", "auto")
+    http = _ensureInstalled(http, "httptools", "auto")
+
+    # Several workers can only be started from an import string, since each worker process imports the app itself
+    app = "dopc.service:dopc" if workers > 1 else dopc
+    print(f"Started DOPC Service on {host}:{port} with {workers} worker(s)")
+    uvicorn.run(
+        app,
+        host=host,
+        port=port,
+        workers=workers,
+        loop=loop,
+        http=http,
+        backlog=backlog,
+        timeout_keep_alive=timeout_keep_alive,
+        limit_concurrency=limit_concurrency,
+        timeout_graceful_shutdown=timeout_graceful_shutdown,
+    )
+
+
+def _ensureInstalled(choice: str, module_name: str, fallback: str) -> str:
+    # Returns the choice, or the fallback if the choice is a module which is not installed
+    if choice != module_name:
+        return choice
+    try:
+        __import__(module_name)
+    except ImportError:
+        print(f"{module_name} is not installed, using {fallback} instead")
+        return fallback
+    return choice
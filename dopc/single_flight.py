@@ -0,0 +1,78 @@
+"""
+This file contains a single-flight helper that coalesces concurrent requests for the same key.
+While a call for a key is in flight, every other caller asking for the same key waits for that call
+instead of sending its own request, so hundreds of quotes for one venue_slug share one upstream request.
+The shared call runs in a copy of the context of the caller which started it, so its logs and spans belong to that
+request. Its deadline is the latest deadline of the callers waiting for it, so its upstream calls stop once no caller
+is waiting anymore. Every caller waits for it at most until its own deadline, see resilience.py.
+"""
+import asyncio
+import contextvars
+from dopc.resilience import getDeadline, getRemainingTime, setSharedDeadline, SharedDeadline, DeadlineExceededError
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls per key. The shared call runs in its own task, so a caller that is
+    cancelled (e.g. a client disconnecting) does not cancel the call for everybody else.
+    """
+    __slots__ = ("_in_flight",)
+
+    def __init__(self):
+        self._in_flight = {}
+
+    async def do(self, key, fetcher, *args):
+        """
+        This function returns the result of fetcher(*args), sharing it with concurrent callers for the same key.
+        Exceptions raised by the fetcher are propagated to every waiting caller.
+
+        Parameters:
+            key: The key used to coalesce calls, e.g. the venue_slug
+            fetcher: An async function to call if no call for the key is in flight
+            args: Positional arguments passed on to the fetcher
+        Returns:
+            The result of the shared fetcher call
+        Raises:
+            DeadlineExceededError: If the deadline of the caller passes before the shared call finishes.
+                The shared call keeps running for the other callers
+        """
+        entry = self._in_flight.get(key)
+        # A finished task stays registered until its done callback runs, so it must not be reused
+        if entry is None or entry[0].done():
+            shared_deadline = SharedDeadline(getDeadline())
+            context = contextvars.copy_context()
+            context.run(setSharedDeadline, shared_deadline)
+            task = asyncio.get_running_loop().create_task(fetcher(*args), context=context)
+            self._in_flight[key] = (task, shared_deadline)
+            task.add_done_callback(lambda done_task: self._forget(key, done_task))
+        else:
+            task, shared_deadline = entry
+            shared_deadline.extend(getDeadline())
+        # Shield the shared task so that a cancelled or impatient caller does not cancel it for the other callers
+        remaining = getRemainingTime()
+        if remaining is None:
+            return await asyncio.shield(task)
+        if remaining <= 0:
+            raise DeadlineExceededError(f"Deadline exceeded before the shared call for {key!r} finished")
+        try:
+            return await asyncio.wait_for(asyncio.shield(task), remaining)
+        except TimeoutError:
+            if task.done() and not task.cancelled():
+                # The shared call finished at the same time, e.g. at its own deadline, so its outcome is returned
+                return task.result()
+            raise DeadlineExceededError(f"Deadline exceeded before the shared call for {key!r} finished")
+
+    def _forget(self, key, task):
+        # Only remove the entry if it still belongs to this task
+        entry = self._in_flight.get(key)
+        if entry is not None and entry[0] is task:
+            del self._in_flight[key]
+        # Mark the exception as retrieved in case every caller was cancelled before it finished
+        if not task.cancelled():
+            task.exception()
+
+    def inFlight(self) -> int:
+        """
+        This function returns the number of keys which currently have a call in flight.
+        """
+        return len(self._in_flight)
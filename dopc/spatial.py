@@ -0,0 +1,208 @@
+"""
+This file contains the precomputed delivery areas of venues and a grid index over them.
+A venue delivers up to the end of its last usable distance range (PricingTable.max_distance), so a request for
+coordinates outside the bounding box of that radius can be rejected without fetching the venue, without the full
+haversine formula and without searching the distance ranges. The same areas answer which known venues deliver
+to a point, using a grid of cells over venue coordinates so that only nearby venues are checked.
+"""
+import math
+import time
+from dopc.helpers import computeDistance
+from dopc.pricing import PricingTable
+
+# The same earth radius as computeDistance()
+EARTH_RADIUS = 6371000 # In metres
+
+# Added to the delivery radius of the bounding boxes, so that rounding the distance in computeDistance()
+# can never make a point outside a box deliverable
+BOUNDING_BOX_MARGIN = 1.0 # In metres
+
+
+class DeliveryArea:
+    """
+    The delivery area of a venue: its coordinates, its maximum delivery distance and the bounding box of that circle.
+    """
+    __slots__ = ("venue_lat", "venue_lon", "max_distance", "pricing_table", "min_lat", "max_lat", "min_lon", "max_lon", "updated_at")
+
+    def __init__(self, venue_coordinates: list, pricing_table: PricingTable, updated_at: float):
+        """
+        Parameters:
+            venue_coordinates: A list containing two floats venue_lon and venue_lat
+            pricing_table: The venue's compiled PricingTable
+            updated_at: The time at which the venue data was seen, see VenueGeoIndex
+        """
+        self.venue_lon, self.venue_lat = venue_coordinates
+        self.max_distance = pricing_table.max_distance
+        self.pricing_table = pricing_table
+        self.updated_at = updated_at
+
+        # Latitude bounds: moving along a meridian is the shortest way to change latitude
+        angular_radius = (self.max_distance + BOUNDING_BOX_MARGIN) / EARTH_RADIUS
+        delta_lat = math.degrees(angular_radius)
+        self.min_lat = self.venue_lat - delta_lat
+        self.max_lat = self.venue_lat + delta_lat
+        # Longitude bounds, unless the circle reaches a pole or crosses the antimeridian, where any longitude is possible
+        lat = math.radians(self.venue_lat)
+        if abs(lat) + angular_radius < math.pi / 2:
+            delta_lon = math.degrees(math.asin(math.sin(angular_radius) / math.cos(lat)))
+        else:
+            delta_lon = 180.0
+        if self.venue_lon - delta_lon < -180.0 or self.venue_lon + delta_lon > 180.0:
+            delta_lon = 180.0
+        self.min_lon = self.venue_lon - delta_lon if delta_lon < 180.0 else -180.0
+        self.max_lon = self.venue_lon + delta_lon if delta_lon < 180.0 else 180.0
+
+    def excludes(self, user_lat: float, user_lon: float) -> bool:
+        """
+        This function returns True if the venue certainly does not deliver to the coordinates.
+        False means the exact distance has to be computed to decide.
+        """
+        return not (self.min_lat <= user_lat <= self.max_lat and self.min_lon <= user_lon <= self.max_lon)
+
+    def matches(self, venue_coordinates: list, pricing_table: PricingTable) -> bool:
+        """
+        This function returns True if the area was computed from the same venue data.
+        """
+        return pricing_table is self.pricing_table and venue_coordinates[0] == self.venue_lon and venue_coordinates[1] == self.venue_lat
+
+
+class VenueGeoIndex:
+    """
+    The delivery areas of the venues DOPC has seen recently, keyed by venue_slug, with a grid index over them.
+    Every area is registered in each grid cell its bounding box overlaps, so a point only has to be checked
+    against the venues registered in its own cell. Areas are only used for ttl seconds after their venue was last seen,
+    so that a changed delivery radius is picked up no later than the venue caches would pick it up. Expired areas are
+    removed when new areas are added, at most once per ttl, so the index does not grow with venues which are gone.
+    """
+
+    def __init__(self, cell_degrees: float, ttl: float, max_cells_per_venue: int = 64, clock=time.monotonic):
+        """
+        Parameters:
+            cell_degrees: The size of the grid cells in degrees of latitude and longitude
+            ttl: Seconds for which the area of a venue is used after the venue was last seen
+            max_cells_per_venue: Areas overlapping more cells than this are checked on every query instead
+            clock: A function returning the current time in seconds
+        """
+        self.cell_degrees = cell_degrees
+        self.ttl = ttl
+        self.max_cells_per_venue = max_cells_per_venue
+        self.clock = clock
+        self._areas = {}
+        self._cells = {}
+        self._wide = set()
+        self._next_prune = clock() + ttl
+        self.rejections = 0
+
+    def update(self, venue_slug: str, venue_coordinates: list, pricing_table: PricingTable) -> DeliveryArea:
+        """
+        This function records the data of a venue. If it did not change, only the time it was last seen is updated.
+        """
+        now = self.clock()
+        area = self._areas.get(venue_slug)
+        if area is not None and area.matches(venue_coordinates, pricing_table):
+            area.updated_at = now
+            return area
+        self.remove(venue_slug)
+        if now >= self._next_prune:
+            self.pruneExpired()
+        area = DeliveryArea(venue_coordinates, pricing_table, now)
+        self._areas[venue_slug] = area
+        cells = self._getCells(area)
+        if cells is None:
+            self._wide.add(venue_slug)
+        for cell in cells or ():
+            self._cells.setdefault(cell, set()).add(venue_slug)
+        return area
+
+    def remove(self, venue_slug: str):
+        """
+        This function removes a venue from the index.
+        """
+        area = self._areas.pop(venue_slug, None)
+        if area is None:
+            return
+        self._wide.discard(venue_slug)
+        for cell in self._getCells(area) or ():
+            venue_slugs = self._cells.get(cell)
+            if venue_slugs is not None:
+                venue_slugs.discard(venue_slug)
+                if not venue_slugs:
+                    del self._cells[cell]
+
+    def pruneExpired(self) -> int:
+        """
+        This function removes the areas of all venues which were not seen within the ttl, and returns their number.
+        """
+        now = self.clock()
+        expired = [venue_slug for venue_slug, area in self._areas.items() if now - area.updated_at >= self.ttl]
+        for venue_slug in expired:
+            self.remove(venue_slug)
+        self._next_prune = now + self.ttl
+        return len(expired)
+
+    def get(self, venue_slug: str):
+        """
+        This function returns the DeliveryArea of a venue if it was seen within the ttl, otherwise None.
+        """
+        area = self._areas.get(venue_slug)
+        if area is None or self.clock() - area.updated_at >= self.ttl:
+            return None
+        return area
+
+    def excludes(self, venue_slug: str, user_lat: float, user_lon: float) -> bool:
+        """
+        This function returns True if the venue is known and certainly does not deliver to the coordinates.
+        """
+        area = self.get(venue_slug)
+        if area is None or not area.excludes(user_lat, user_lon):
+            return False
+        self.rejections += 1
+        return True
+
+    def venuesDeliveringTo(self, user_lat: float, user_lon: float) -> list:
+        """
+        This function returns the venues of the index which deliver to the coordinates, nearest first.
+
+        Parameters:
+            user_lat: A float that represents the user's latitude coordinate in degrees
+            user_lon: A float that represents the user's longitude coordinate in degrees
+        Returns:
+            A list of (venue_slug, distance) tuples
+        """
+        candidates = self._cells.get(self._getCell(user_lat, user_lon), set()) | self._wide
+        now = self.clock()
+        results = []
+        for venue_slug in candidates:
+            area = self._areas[venue_slug]
+            if now - area.updated_at >= self.ttl or area.excludes(user_lat, user_lon):
+                continue
+            distance = computeDistance(user_lat, user_lon, area.venue_lat, area.venue_lon)
+            if area.pricing_table.findRange(distance) >= 0:
+                results.append((venue_slug, distance))
+        results.sort(key=lambda result: (result[1], result[0]))
+        return results
+
+    def clear(self):
+        """
+        This function removes all venues from the index.
+        """
+        self._areas.clear()
+        self._cells.clear()
+        self._wide.clear()
+
+    def __len__(self):
+        return len(self._areas)
+
+    def __contains__(self, venue_slug: str):
+        return venue_slug in self._areas
+
+    def _getCell(self, lat: float, lon: float) -> tuple:
+        return (math.floor(lat / self.cell_degrees), math.floor(lon / self.cell_degrees))
+
+    def _getCells(self, area: DeliveryArea):
+        # The cells overlapped by the bounding box of the area, or None for very large areas, which are kept aside
+        min_row, min_column = self._getCell(area.min_lat, area.min_lon)
+        max_row, max_column = self._getCell(area.max_lat, area.max_lon)
+        if (max_row - min_row + 1) * (max_column - min_column + 1) > self.max_cells_per_venue:
+            return None
+        return [(row, column) for row in range(min_row, max_row + 1) for column in range(min_column, max_column + 1)]
@@ -0,0 +1,171 @@
+"""
+This file contains lightweight request tracing for the DOPC service.
+Every request gets a request ID and a Trace, which collects a span for each stage timed with timeStage()
+(see metrics.py) and for each Home Assignment API call. The time per stage is returned in a Server-Timing header.
+A fetch of venue data shared between requests (see single_flight.py) is recorded in the trace of the request which started it.
+The full span tree of requests slower than TRACE_SLOW_THRESHOLD_MS is kept in a ring buffer, see /debug/traces.
+A span is a few list operations, and without an active trace recording a span costs a single context variable lookup.
+"""
+import contextvars
+import itertools
+import os
+import time
+from collections import deque
+from dopc.config import TRACING_ENABLED, TRACE_SLOW_THRESHOLD_MS, TRACE_BUFFER_SIZE, REQUEST_ID_HEADER
+
+_current_trace = contextvars.ContextVar("trace", default=None)
+_current_span = contextvars.ContextVar("span", default=-1)
+
+# Request IDs are a random prefix per process and a counter, which is much cheaper than a UUID per request
+_request_id_prefix = os.urandom(4).hex()
+_request_ids = itertools.count(1)
+
+# The span trees of the slowest recent requests, newest last
+slow_traces = deque(maxlen=TRACE_BUFFER_SIZE)
+
+
+class Trace:
+    """
+    The spans of one request. Each span is a list [name, parent index, start, end], with times from time.perf_counter().
+    """
+    __slots__ = ("request_id", "method", "path", "started_at", "start", "end", "status", "spans")
+
+    def __init__(self, request_id: str, method: str, path: str):
+        self.request_id = request_id
+        self.method = method
+        self.path = path
+        self.started_at = time.time()
+        self.start = time.perf_counter()
+        self.end = None
+        self.status = None
+        self.spans = []
+
+    def duration(self) -> float:
+        """
+        This function returns the seconds since the start of the request, or its total duration once it has finished.
+        """
+        return (self.end if self.end is not None else time.perf_counter()) - self.start
+
+    def serverTiming(self) -> str:
+        """
+        This function returns the value of the Server-Timing header: the milliseconds spent per span name, and in total.
+        """
+        durations = {}
+        for name, _, start, end in self.spans:
+            if end is not None:
+                durations[name] = durations.get(name, 0.0) + end - start
+        parts = [f"{name};dur={duration * 1000:.3f}" for name, duration in durations.items()]
+        parts.append(f"total;dur={self.duration() * 1000:.3f}")
+        return ", ".join(parts)
+
+    def toDict(self) -> dict:
+        """
+        This function returns the trace with its spans as a tree, with times in milliseconds from the start of the request.
+        """
+        nodes = [
+            {"name": name, "start_ms": round((start - self.start) * 1000, 3),
+             "duration_ms": round((end - start) * 1000, 3) if end is not None else None, "children": []}
+            for name, _, start, end in self.spans
+        ]
+        roots = []
+        for node, (_, parent, _, _) in zip(nodes, self.spans):
+            (nodes[parent]["children"] if parent >= 0 else roots).append(node)
+        return {
+            "request_id": self.request_id,
+            "method": self.method,
+            "path": self.path,
+            "status": self.status,
+            "started_at": self.started_at,
+            "duration_ms": round(self.duration() * 1000, 3),
+            "spans": roots,
+        }
+
+
+class _Span:
+    __slots__ = ("name", "trace", "idx", "token")
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        self.trace = _current_trace.get()
+        if self.trace is not None:
+            self.idx = len(self.trace.spans)
+            self.trace.spans.append([self.name, _current_span.get(), time.perf_counter(), None])
+            self.token = _current_span.set(self.idx)
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.trace is not None:
+            self.trace.spans[self.idx][3] = time.perf_counter()
+            _current_span.reset(self.token)
+
+
+def traceSpan(name: str) -> _Span:
+    """
+    This function returns a context manager which records a span in the trace of the current request, if there is one.
+    Spans opened inside it, also in tasks started inside it, become its children.
+    """
+    return _Span(name)
+
+
+def getRequestId():
+    """
+    This function returns the ID of the current request, or None outside of a request.
+    """
+    trace = _current_trace.get()
+    return trace.request_id if trace is not None else None
+
+
+def getSlowTraces() -> list:
+    """
+    This function returns the span trees of the recent requests slower than the threshold, newest first.
+    """
+    return list(reversed(slow_traces))
+
+
+class TracingMiddleware:
+    """
+    ASGI middleware which traces every request: it assigns a request ID (or keeps a valid one sent by the client),
+    returns it and a Server-Timing header with the response, and keeps the trace of slow requests.
+    """
+
+    def __init__(self, app, enabled: bool = TRACING_ENABLED, slow_threshold_ms: float = TRACE_SLOW_THRESHOLD_MS):
+        self.app = app
+        self.enabled = enabled
+        # A threshold of 0 or less turns off the sampling of slow requests
+        self.slow_threshold = slow_threshold_ms / 1000 if slow_threshold_ms > 0 else None
+        self.header_name = REQUEST_ID_HEADER.lower().encode()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.enabled:
+            await self.app(scope, receive, send)
+            return
+        trace = Trace(self._getRequestId(scope), scope["method"], scope["path"])
+
+        async def sendWithTracingHeaders(message):
+            if message["type"] == "http.response.start":
+                trace.status = message["status"]
+                headers = list(message.get("headers", ()))
+                headers.append((self.header_name, trace.request_id.encode()))
+                headers.append((b"server-timing", trace.serverTiming().encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        token = _current_trace.set(trace)
+        try:
+            await self.app(scope, receive, sendWithTracingHeaders)
+        finally:
+            _current_trace.reset(token)
+            trace.end = time.perf_counter()
+            if self.slow_threshold is not None and trace.end - trace.start >= self.slow_threshold:
+                slow_traces.append(trace.toDict())
+
+    def _getRequestId(self, scope) -> str:
+        # A request ID from the client is kept if it is short and printable, so it cannot break logs or headers
+        for name, value in scope["headers"]:
+            if name == self.header_name:
+                if 0 < len(value) <= 128 and value.isascii() and value.decode().isprintable():
+                    return value.decode()
+                break
+        return f"{_request_id_prefix}-{next(_request_ids):x}"
@@ -0,0 +1,97 @@
+"""
+This file manages the shared httpx client used for all calls to the Home Assignment API.
+Creating a new client for every request means a fresh TCP and TLS handshake each time, so instead
+one long-lived client with a connection pool is started in the lifespan of the DOPC service.
+"""
+import logging
+import httpx
+from dopc.config import (
+    UPSTREAM_MAX_CONNECTIONS,
+    UPSTREAM_MAX_KEEPALIVE_CONNECTIONS,
+    UPSTREAM_KEEPALIVE_EXPIRY,
+    UPSTREAM_HTTP2,
+    UPSTREAM_CONNECT_TIMEOUT,
+    UPSTREAM_READ_TIMEOUT,
+    UPSTREAM_WRITE_TIMEOUT,
+    UPSTREAM_POOL_TIMEOUT,
+)
+
+logger = logging.getLogger(__name__)
+
+# The client shared by all requests. It is None until startUpstreamClient() is called.
+_upstream_client = None
+
+
+def buildUpstreamClient(
+    max_connections: int = UPSTREAM_MAX_CONNECTIONS,
+    max_keepalive_connections: int = UPSTREAM_MAX_KEEPALIVE_CONNECTIONS,
+    keepalive_expiry: float = UPSTREAM_KEEPALIVE_EXPIRY,
+    http2: bool = UPSTREAM_HTTP2,
+    connect_timeout: float = UPSTREAM_CONNECT_TIMEOUT,
+    read_timeout: float = UPSTREAM_READ_TIMEOUT,
+    write_timeout: float = UPSTREAM_WRITE_TIMEOUT,
+    pool_timeout: float = UPSTREAM_POOL_TIMEOUT,
+    transport: httpx.AsyncBaseTransport = None,
+) -> httpx.AsyncClient:
+    """
+    This function creates an httpx client with the configured connection pool limits and timeouts.
+    If HTTP/2 is requested but the optional 'h2' package is not installed, HTTP/1.1 is used instead.
+
+    Parameters:
+        max_connections: The maximum number of concurrent connections in the pool
+        max_keepalive_connections: The maximum number of idle connections kept open
+        keepalive_expiry: Seconds after which an idle connection is closed
+        http2: Whether HTTP/2 should be negotiated with the upstream server
+        connect_timeout, read_timeout, write_timeout, pool_timeout: Per-phase timeouts in seconds
+        transport: An optional custom transport, mainly used by tests to fake the upstream server
+    Returns:
+        client: An httpx.AsyncClient which has to be closed with aclose() when no longer needed
+    """
+    if http2:
+        try:
+            import h2  # noqa: F401
+        except ImportError:
+            logger.warning("HTTP/2 was requested for upstream calls but 'h2' is not installed. Falling back to HTTP/1.1")
+            http2 = False
+
+    limits = httpx.Limits(
+        max_connections=max_connections,
+        max_keepalive_connections=max_keepalive_connections,
+        keepalive_expiry=keepalive_expiry,
+    )
+    timeout = httpx.Timeout(
+        connect=connect_timeout,
+        read=read_timeout,
+        write=write_timeout,
+        pool=pool_timeout,
+    )
+    return httpx.AsyncClient(limits=limits, timeout=timeout, http2=http2, transport=transport)
+
+
+async def startUpstreamClient(**client_options) -> httpx.AsyncClient:
+    """
+    This function creates the shared upstream client. It is called once in the lifespan of the DOPC service.
+    Any keyword arguments are passed on to buildUpstreamClient().
+    """
+    global _upstream_client
+    if _upstream_client is None:
+        _upstream_client = buildUpstreamClient(**client_options)
+    return _upstream_client
+
+
+async def closeUpstreamClient():
+    """
+    This function closes the shared upstream client and all of its pooled connections.
+    """
+    global _upstream_client
+    if _upstream_client is not None:
+        client, _upstream_client = _upstream_client, None
+        await client.aclose()
+
+
+def getUpstreamClient():
+    """
+    This function returns the shared upstream client, or None if it has not been started.
+    The fetchers fall back to a short-lived client in that case, e.g. when they are called outside of the service.
+    """
+    return _upstream_client
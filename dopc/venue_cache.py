@@ -0,0 +1,224 @@
+"""
+This file contains an in-process cache for Home Assignment API venue data, keyed by venue_slug.
+Venue coordinates almost never change and delivery specs change rarely, so fetching them on every
+request wastes upstream calls. Each cache supports:
+    - a fresh TTL, after which entries are refreshed in the background while the stale value is served
+    - a stale TTL, after which entries are dropped and fetched again on the request path
+    - negative caching of venue slugs for which the Home Assignment API returned 404
+    - size-bounded LRU eviction
+"""
+import asyncio
+import contextvars
+import logging
+import time
+from collections import OrderedDict
+from fastapi import HTTPException
+from dopc.single_flight import SingleFlight
+from dopc.resilience import DeadlineExceededError
+
+logger = logging.getLogger(__name__)
+
+
+class CacheEntry:
+    __slots__ = ("value", "error", "loaded_at", "fresh_until", "stale_until")
+
+    def __init__(self, value, error, loaded_at: float, fresh_until: float, stale_until: float):
+        self.value = value
+        # For negative entries, the (status_code, detail) of the upstream error; None otherwise
+        self.error = error
+        self.loaded_at = loaded_at
+        self.fresh_until = fresh_until
+        self.stale_until = stale_until
+
+
+class VenueDataCache:
+    """
+    A size-bounded LRU cache with stale-while-revalidate in front of one of the venue data fetchers.
+    Concurrent misses and refreshes for the same venue_slug share one upstream request.
+    """
+
+    def __init__(self, name: str, fetcher, ttl: float, stale_ttl: float, negative_ttl: float, max_entries: int, clock=time.monotonic):
+        """
+        Parameters:
+            name: A short name for the cache, used in logs and metrics, e.g. "static"
+            fetcher: An async function taking a venue_slug, e.g. fetchStaticData
+            ttl: Seconds for which an entry is fresh and served without contacting the Home Assignment API
+            stale_ttl: Seconds (counted from loading) for which an expired entry is still served while being refreshed
+            negative_ttl: Seconds for which a 404 from the Home Assignment API is remembered
+            max_entries: The maximum number of venues kept in the cache
+            clock: A function returning the current time in seconds
+        """
+        self.name = name
+        self.fetcher = fetcher
+        self.ttl = ttl
+        self.stale_ttl = max(stale_ttl, ttl)
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self.clock = clock
+        self._entries = OrderedDict()
+        self._flight = SingleFlight()
+        self._refresh_tasks = {}
+        self.hits = 0
+        self.stale_hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.refreshes = 0
+        self.refresh_errors = 0
+
+    async def get(self, venue_slug: str):
+        """
+        This function returns the cached data for a venue, fetching it from the Home Assignment API on a miss.
+        A stale entry is returned immediately and refreshed in the background.
+
+        Parameters:
+            venue_slug: A string that uniquely identifies a venue
+        Returns:
+            The value returned by the fetcher for the venue
+        Raises:
+            HTTPException: If the fetcher fails, the venue_slug is negatively cached, or the request's deadline passes (504)
+        """
+        entry = self._entries.get(venue_slug)
+        if entry is not None:
+            now = self.clock()
+            if now < entry.fresh_until:
+                self._entries.move_to_end(venue_slug)
+                if entry.error is not None:
+                    self.negative_hits += 1
+                    raise HTTPException(status_code=entry.error[0], detail=entry.error[1])
+                self.hits += 1
+                return entry.value
+            if entry.error is None and now < entry.stale_until:
+                self._entries.move_to_end(venue_slug)
+                self.stale_hits += 1
+                self._scheduleRefresh(venue_slug)
+                return entry.value
+        self.misses += 1
+        try:
+            return await self._flight.do(venue_slug, self._load, venue_slug)
+        except DeadlineExceededError:
+            # Only this caller gave up, the shared fetch still fills the cache for everybody else
+            raise HTTPException(status_code=504, detail=f"Timed out during request to Home Assignment {self.name.capitalize()} API.")
+
+    def peek(self, venue_slug: str):
+        """
+        This function returns the cached value for a venue without fetching, refreshing or counting, or None if there is none.
+        """
+        entry = self._entries.get(venue_slug)
+        if entry is None or entry.error is not None or self.clock() >= entry.stale_until:
+            return None
+        return entry.value
+
+    def isNegative(self, venue_slug: str) -> bool:
+        """
+        This function returns whether the venue is negatively cached, i.e. the Home Assignment API recently returned 404 for it.
+        """
+        entry = self._entries.get(venue_slug)
+        return entry is not None and entry.error is not None and self.clock() < entry.fresh_until
+
+    def age(self, venue_slug: str):
+        """
+        This function returns the number of seconds since the venue's entry was loaded, or None if it is not cached.
+        """
+        entry = self._entries.get(venue_slug)
+        if entry is None:
+            return None
+        return self.clock() - entry.loaded_at
+
+    def put(self, venue_slug: str, value):
+        """
+        This function stores a value for a venue, e.g. when it was fetched by some other means.
+        """
+        now = self.clock()
+        self._store(venue_slug, CacheEntry(value, None, now, now + self.ttl, now + self.stale_ttl))
+
+    def invalidate(self, venue_slug: str):
+        """
+        This function removes a venue from the cache.
+        """
+        self._entries.pop(venue_slug, None)
+
+    def clear(self):
+        """
+        This function removes all venues from the cache.
+        """
+        self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, venue_slug: str):
+        return venue_slug in self._entries
+
+    async def close(self):
+        """
+        This function cancels any background refreshes which are still running.
+        """
+        tasks = list(self._refresh_tasks.values())
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    def stats(self) -> dict:
+        """
+        This function returns the cache's counters.
+        """
+        lookups = self.hits + self.stale_hits + self.negative_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "negative_hits": self.negative_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "refreshes": self.refreshes,
+            "refresh_errors": self.refresh_errors,
+            "hit_ratio": (lookups - self.misses) / lookups if lookups else 0.0,
+        }
+
+    async def _load(self, venue_slug: str):
+        # Fetch the venue and store the result. A 404 is stored as a negative entry
+        try:
+            value = await self.fetcher(venue_slug)
+        except HTTPException as e:
+            if e.status_code == 404 and self.negative_ttl > 0:
+                now = self.clock()
+                self._store(venue_slug, CacheEntry(None, (e.status_code, e.detail), now, now + self.negative_ttl, now + self.negative_ttl))
+            raise
+        self.put(venue_slug, value)
+        return value
+
+    def _scheduleRefresh(self, venue_slug: str):
+        # Only one background refresh per venue at a time
+        if venue_slug in self._refresh_tasks:
+            return
+        # A refresh runs in an empty context, so it does not inherit any state of the request that triggered it
+        task = asyncio.create_task(self.refresh(venue_slug), context=contextvars.Context())
+        self._refresh_tasks[venue_slug] = task
+        task.add_done_callback(lambda done_task: self._refresh_tasks.pop(venue_slug, None))
+
+    async def refresh(self, venue_slug: str) -> bool:
+        """
+        This function fetches a venue again and replaces its entry. On failure the current entry is kept.
+
+        Parameters:
+            venue_slug: A string that uniquely identifies a venue
+        Returns:
+            True if the refresh succeeded, False otherwise
+        """
+        self.refreshes += 1
+        try:
+            await self._flight.do(venue_slug, self._load, venue_slug)
+            return True
+        except Exception as e:
+            self.refresh_errors += 1
+            logger.warning("Background refresh of %s data failed for slug: %s: %r", self.name, venue_slug, e, extra={"venue_slug": venue_slug})
+            return False
+
+    def _store(self, venue_slug: str, entry: CacheEntry):
+        self._entries[venue_slug] = entry
+        self._entries.move_to_end(venue_slug)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
@@ -0,0 +1,189 @@
+"""
+This file contains the code that gathers all the Home Assignment API data needed to price a delivery for a venue.
+The static and dynamic data do not depend on each other, so both are fetched concurrently.
+Both are served from in-process caches, and concurrent misses for the same venue_slug share one upstream request.
+Venues pushed to the venue store (see venue_store.py) or in a mapped venue file (see venue_file.py)
+are served from there without contacting the Home Assignment API.
+The most popular of the other venues are kept fresh in the caches by the cache warmer, see cache_warmer.py.
+"""
+import asyncio
+from fastapi import HTTPException
+from dopc.api_fetchers import fetchStaticData, fetchDynamicData
+from dopc.venue_cache import VenueDataCache
+from dopc.venue_store import VenueStore
+from dopc.venue_file import VenueFile
+from dopc.pricing import PricingTable
+from dopc.spatial import VenueGeoIndex
+from dopc.cache_warmer import CacheWarmer
+from dopc.metrics import registry, CallbackGauge, CallbackCounter, timeStage
+from dopc.config import (
+    STATIC_CACHE_TTL,
+    STATIC_CACHE_STALE_TTL,
+    DYNAMIC_CACHE_TTL,
+    DYNAMIC_CACHE_STALE_TTL,
+    NEGATIVE_CACHE_TTL,
+    VENUE_CACHE_MAX_ENTRIES,
+    GEO_INDEX_CELL_DEGREES,
+    GEO_INDEX_TTL,
+)
+
+
+def forgetMissingVenue(venue_slug: str, error: HTTPException):
+    """
+    This function removes the delivery area of a venue for which the Home Assignment API returned 404,
+    so that requests for it are answered with the 404 instead of being rejected as out of range by its old area.
+    """
+    if error.status_code == 404:
+        geo_index.remove(venue_slug)
+
+
+async def loadVenueCoordinates(venue_slug: str):
+    """
+    This function fetches a venue's coordinates from the Home Assignment API static URL.
+    """
+    try:
+        return await fetchStaticData(venue_slug)
+    except HTTPException as e:
+        forgetMissingVenue(venue_slug, e)
+        raise
+
+
+async def loadPricingTable(venue_slug: str) -> PricingTable:
+    """
+    This function fetches a venue's delivery specs from the Home Assignment API dynamic URL
+    and compiles them into a PricingTable, so this happens once per version of the dynamic data.
+    """
+    try:
+        minimum_order_value, delivery_base_price, distance_ranges = await fetchDynamicData(venue_slug)
+    except HTTPException as e:
+        forgetMissingVenue(venue_slug, e)
+        raise
+    return PricingTable(minimum_order_value, delivery_base_price, distance_ranges)
+
+
+# One cache per Home Assignment API endpoint, since they change at very different rates
+static_cache = VenueDataCache("static", loadVenueCoordinates, STATIC_CACHE_TTL, STATIC_CACHE_STALE_TTL, NEGATIVE_CACHE_TTL, VENUE_CACHE_MAX_ENTRIES)
+dynamic_cache = VenueDataCache("dynamic", loadPricingTable, DYNAMIC_CACHE_TTL, DYNAMIC_CACHE_STALE_TTL, NEGATIVE_CACHE_TTL, VENUE_CACHE_MAX_ENTRIES)
+
+# Keeps the caches fresh for the most popular venues, started in the lifespan of the service
+cache_warmer = CacheWarmer((static_cache, dynamic_cache))
+
+# Pushed venue data, which takes precedence over the venue file and the caches
+venue_store = VenueStore()
+# The delivery areas of the venues seen recently, whichever source their data came from
+geo_index = VenueGeoIndex(GEO_INDEX_CELL_DEGREES, GEO_INDEX_TTL)
+# The memory-mapped venue file, if one is opened with openVenueFile()
+venue_file = None
+
+
+def openVenueFile(path: str) -> VenueFile:
+    """
+    This function maps a venue file, whose venues are then priced without contacting the Home Assignment API.
+    A previously opened venue file is closed.
+    """
+    global venue_file
+    previous_file, venue_file = venue_file, VenueFile(path)
+    if previous_file is not None:
+        previous_file.close()
+    return venue_file
+
+
+def closeVenueFile():
+    """
+    This function unmaps the venue file, if there is one.
+    """
+    global venue_file
+    previous_file, venue_file = venue_file, None
+    if previous_file is not None:
+        previous_file.close()
+
+
+def getCacheStats() -> dict:
+    """
+    This function returns the counters of both venue caches, keyed by cache name.
+    """
+    return {cache.name: cache.stats() for cache in (static_cache, dynamic_cache)}
+
+
+registry.register(CallbackCounter(
+    "dopc_venue_cache_events_total", "Venue cache lookups and evictions since startup, by cache and event", ("cache", "event"),
+    lambda: {(name, event): value for name, stats in getCacheStats().items() for event, value in stats.items() if event not in ("entries", "hit_ratio")}))
+registry.register(CallbackGauge(
+    "dopc_venue_cache_hit_ratio", "Fraction of venue cache lookups answered without waiting for the Home Assignment API", ("cache",),
+    lambda: {(name,): stats["hit_ratio"] for name, stats in getCacheStats().items()}))
+registry.register(CallbackGauge(
+    "dopc_venue_cache_entries", "Venues currently held in each venue cache", ("cache",),
+    lambda: {(name,): stats["entries"] for name, stats in getCacheStats().items()}))
+registry.register(CallbackGauge(
+    "dopc_venue_store_entries", "Venues currently held in the venue store", (),
+    lambda: {(): len(venue_store)}))
+registry.register(CallbackGauge(
+    "dopc_venue_store_version", "Version of the venue store, incremented on every snapshot and update", (),
+    lambda: {(): venue_store.version}))
+registry.register(CallbackCounter(
+    "dopc_venue_store_lookups_total", "Venue store lookups since startup, by result", ("result",),
+    lambda: {("hit",): venue_store.hits, ("miss",): venue_store.misses}))
+registry.register(CallbackGauge(
+    "dopc_venue_file_entries", "Venues in the mapped venue file", (),
+    lambda: {(): len(venue_file) if venue_file is not None else 0}))
+registry.register(CallbackGauge(
+    "dopc_geo_index_entries", "Venue delivery areas in the geo index", (),
+    lambda: {(): len(geo_index)}))
+registry.register(CallbackCounter(
+    "dopc_geo_index_early_rejections_total", "Quotes rejected as out of range by the geo index without fetching venue data", (),
+    lambda: {(): geo_index.rejections}))
+
+registry.register(CallbackGauge(
+    "dopc_cache_warmer_queue_depth", "Venue cache refreshes queued by the cache warmer", (),
+    lambda: {(): cache_warmer.queue_depth}))
+registry.register(CallbackCounter(
+    "dopc_cache_warmer_refreshes_total", "Venue cache refreshes run by the cache warmer since startup, by result", ("result",),
+    lambda: {("ok",): cache_warmer.refreshes, ("error",): cache_warmer.refresh_errors}))
+registry.register(CallbackGauge(
+    "dopc_cache_warmer_oldest_hot_entry_age_seconds", "Age of the oldest cache entry of the venues kept fresh by the cache warmer", ("cache",),
+    lambda: {(cache.name,): cache_warmer.oldestHotEntryAge(cache) for cache in cache_warmer.caches}))
+
+
+async def _timedGet(cache: VenueDataCache, venue_slug: str):
+    # Each cache lookup is its own stage, since the static and dynamic fetches run concurrently
+    with timeStage(f"{cache.name}_fetch"):
+        return await cache.get(venue_slug)
+
+
+async def getVenueData(venue_slug: str):
+    """
+    This function gets the static and dynamic data of a venue from the venue store or the venue file,
+    or if it is in neither, concurrently from the caches where possible. The venue's delivery area is recorded in the geo index. If both fail, the static error is raised, matching the order in which they used to be awaited.
+
+    Parameters:
+        venue_slug: A string that uniquely identifies a venue
+    Returns:
+        venue_coordinates: A list containing two floats venue_lon and venue_lat
+        pricing_table: The venue's compiled PricingTable
+    """
+    stored_venue_data = venue_store.get(venue_slug)
+    if stored_venue_data is None and venue_file is not None:
+        stored_venue_data = venue_file.get(venue_slug)
+    if stored_venue_data is not None:
+        geo_index.update(venue_slug, *stored_venue_data)
+        return stored_venue_data
+    venue_coordinates, pricing_table = await asyncio.gather(
+        _timedGet(static_cache, venue_slug),
+        _timedGet(dynamic_cache, venue_slug),
+        return_exceptions=True,
+    )
+    if isinstance(venue_coordinates, BaseException):
+        raise venue_coordinates
+    if isinstance(pricing_table, BaseException):
+        raise pricing_table
+    geo_index.update(venue_slug, venue_coordinates, pricing_table)
+    # Only venues which exist count, so that unknown venue_slugs are never warmed
+    cache_warmer.recordRequest(venue_slug)
+    return venue_coordinates, pricing_table
+
+
+async def closeVenueCaches():
+    """
+    This function stops any background refreshes of the venue caches. It is called on shutdown of the service.
+    """
+    await asyncio.gather(static_cache.close(), dynamic_cache.close())
@@ -0,0 +1,261 @@
+"""
+This file contains a compact binary venue file, which is memory-mapped read-only by every worker.
+With many workers, each of them holding its own copy of every venue wastes memory, and each of them has to warm up
+from the Home Assignment API after starting. A venue file is built once (see buildVenueFile()), and all workers
+map the same file, so they share one copy in the page cache and can price quotes as soon as they start.
+
+All numbers are little-endian and every section starts at a multiple of 8 bytes:
+    header        magic, format version, venue count, range count, slug bytes, see HEADER_FORMAT
+    venue arrays  float64 lon, lat, minimum order value, base price, max distance, then uint32 first range,
+                  range count, sorted flag; one value per venue, with venues ordered by UTF-8 encoded venue_slug
+    slug offsets  uint32, venue count + 1 offsets into the slug blob
+    range arrays  float64 min, max, a, b of the usable distance ranges of all venues, as compiled by PricingTable
+    slug blob     the UTF-8 encoded venue_slugs, concatenated in order
+Lookups do not copy any venue data: a venue's PricingTable is built on memoryview slices of the mapped file.
+"""
+import asyncio
+import mmap
+import os
+import struct
+import sys
+import tempfile
+import time
+from array import array
+from fastapi import HTTPException
+from dopc.pricing import PricingTable
+from dopc.api_fetchers import fetchStaticData, fetchDynamicData
+from dopc.upstream_client import getUpstreamClient, startUpstreamClient, closeUpstreamClient
+from dopc.config import VENUE_FILE_FETCH_CONCURRENCY
+from dopc.venue_store import VenueRecord
+
+MAGIC = b"DOPCVENF"
+FORMAT_VERSION = 1
+HEADER_FORMAT = "<8sIIIIQ" # magic, format version, venue count, range count, unused, slug bytes
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+VENUE_FLOAT_FIELDS = ("lon", "lat", "minimum_order_value", "delivery_base_price", "max_distance")
+VENUE_UINT_FIELDS = ("range_start", "range_count", "sorted_ranges")
+RANGE_FIELDS = ("min", "max", "a", "b")
+
+
+def _align(offset: int) -> int:
+    return (offset + 7) & ~7
+
+
+def _checkPlatform():
+    # The mapped arrays are read in the native byte order without copying, so it has to match the file
+    if sys.byteorder != "little" or array("d").itemsize != 8 or array("I").itemsize != 4:
+        raise RuntimeError("Venue files need a little-endian platform with 8 byte doubles and 4 byte unsigned ints")
+
+
+def buildVenueFile(records: dict, path: str) -> int:
+    """
+    This function writes venues into a venue file. The file is written aside and renamed into place,
+    so workers which already mapped the previous file keep reading it undisturbed.
+
+    Parameters:
+        records: A dict of VenueRecords keyed by venue_slug, e.g. from parseSnapshotLines() in venue_store.py
+        path: The path of the venue file
+    Returns:
+        size: The size of the file in bytes
+    """
+    _checkPlatform()
+    venue_slugs = sorted(records, key=lambda venue_slug: venue_slug.encode("utf-8"))
+    venue_floats = {field: array("d") for field in VENUE_FLOAT_FIELDS}
+    venue_uints = {field: array("I") for field in VENUE_UINT_FIELDS}
+    ranges = {field: array("d") for field in RANGE_FIELDS}
+    slug_offsets = array("I", [0])
+    slug_blob = bytearray()
+    for venue_slug in venue_slugs:
+        record = records[venue_slug]
+        table = record.pricing_table
+        venue_lon, venue_lat = record.venue_coordinates
+        values = (venue_lon, venue_lat, table.minimum_order_value, table.delivery_base_price, table.max_distance)
+        for field, value in zip(VENUE_FLOAT_FIELDS, values):
+            venue_floats[field].append(value)
+        values = (len(ranges["min"]), len(table.range_min), table.sorted_ranges)
+        for field, value in zip(VENUE_UINT_FIELDS, values):
+            venue_uints[field].append(value)
+        values = (table.range_min, table.range_max, table.range_a, table.range_b)
+        for field, value in zip(RANGE_FIELDS, values):
+            ranges[field].extend(value)
+        slug_blob += venue_slug.encode("utf-8")
+        slug_offsets.append(len(slug_blob))
+
+    directory = os.path.dirname(os.path.abspath(path))
+    with tempfile.NamedTemporaryFile("wb", dir=directory, delete=False) as venue_file:
+        venue_file.write(struct.pack(HEADER_FORMAT, MAGIC, FORMAT_VERSION, len(venue_slugs), len(ranges["min"]), 0, len(slug_blob)))
+        for section in (*venue_floats.values(), *venue_uints.values(), slug_offsets, *ranges.values()):
+            venue_file.write(section.tobytes())
+            venue_file.write(b"\0" * (_align(venue_file.tell()) - venue_file.tell()))
+        venue_file.write(slug_blob)
+        size = venue_file.tell()
+    os.replace(venue_file.name, path)
+    return size
+
+
+async def fetchVenueRecords(venue_slugs: list, max_concurrency: int = VENUE_FILE_FETCH_CONCURRENCY) -> tuple:
+    """
+    This function fetches venues from the Home Assignment API, e.g. to build a venue file without a snapshot.
+    At most max_concurrency venues are fetched at once, each with two upstream calls, so that the calls stay
+    below UPSTREAM_MAX_CONCURRENCY and are never shed. The shared upstream client is started if it is not running.
+
+    Parameters:
+        venue_slugs: The venue_slugs to fetch
+        max_concurrency: The number of venues fetched at once
+    Returns:
+        records: A dict of VenueRecords keyed by venue_slug, of the venues which were fetched
+        failures: A dict of error messages keyed by venue_slug, of the venues which could not be fetched
+    """
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def fetchVenueRecord(venue_slug: str) -> VenueRecord:
+        async with semaphore:
+            venue_coordinates, (minimum_order_value, delivery_base_price, distance_ranges) = await asyncio.gather(
+                fetchStaticData(venue_slug), fetchDynamicData(venue_slug))
+        return VenueRecord(venue_coordinates, PricingTable(minimum_order_value, delivery_base_price, distance_ranges), 0, time.time())
+
+    started_client = getUpstreamClient() is None
+    if started_client:
+        await startUpstreamClient()
+    try:
+        results = await asyncio.gather(*(fetchVenueRecord(venue_slug) for venue_slug in venue_slugs), return_exceptions=True)
+    finally:
+        if started_client:
+            await closeUpstreamClient()
+
+    records, failures = {}, {}
+    for venue_slug, result in zip(venue_slugs, results):
+        if isinstance(result, HTTPException):
+            failures[venue_slug] = f"{result.status_code}: {result.detail}"
+        elif isinstance(result, Exception):
+            failures[venue_slug] = repr(result)
+        else:
+            records[venue_slug] = result
+    return records, failures
+
+
+class VenueFile:
+    """
+    A read-only, memory-mapped venue file. Venues are found with a binary search over the sorted venue_slugs.
+    Venues which were looked up once are remembered by venue_slug, so hot venues are found in O(1).
+    Their PricingTables share the mapped memory instead of copying it.
+    """
+
+    def __init__(self, path: str):
+        """
+        Parameters:
+            path: The path of a file written by buildVenueFile()
+        Raises:
+            ValueError: If the file is not a valid venue file
+        """
+        _checkPlatform()
+        self.path = path
+        self._tables = {}
+        with open(path, "rb") as venue_file:
+            if os.fstat(venue_file.fileno()).st_size < HEADER_SIZE:
+                raise ValueError(f"{path} is not a valid venue file: the file is too short")
+            self._mmap = mmap.mmap(venue_file.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            self._mapViews()
+        except (ValueError, TypeError) as e:
+            raise ValueError(f"{path} is not a valid venue file: {e}") from e
+
+    def _mapViews(self):
+        # Create one typed view per section, after checking that the file is large enough for all of them
+        magic, format_version, venue_count, range_count, _, slug_bytes = struct.unpack_from(HEADER_FORMAT, self._mmap, 0)
+        if magic != MAGIC or format_version != FORMAT_VERSION:
+            raise ValueError(f"unexpected magic {magic!r} or format version {format_version}")
+        buffer = memoryview(self._mmap)
+        self._buffer = buffer
+        offset = HEADER_SIZE
+        sections = [(field, "d", venue_count) for field in VENUE_FLOAT_FIELDS]
+        sections += [(field, "I", venue_count) for field in VENUE_UINT_FIELDS]
+        sections += [("slug_offsets", "I", venue_count + 1)]
+        sections += [(f"range_{field}", "d", range_count) for field in RANGE_FIELDS]
+        views = {}
+        for name, typecode, count in sections:
+            end = offset + count * (8 if typecode == "d" else 4)
+            if end > len(buffer):
+                raise ValueError("the file is truncated")
+            views[name] = buffer[offset:end].cast(typecode)
+            offset = _align(end)
+        if offset + slug_bytes > len(buffer):
+            raise ValueError("the file is truncated")
+        self._views = views
+        self._slug_start = offset
+        self.venue_count = venue_count
+        self.range_count = range_count
+
+    def _slugAt(self, idx: int) -> bytes:
+        # Slicing the mmap itself returns bytes directly, which is faster than going through the memoryview
+        slug_offsets = self._views["slug_offsets"]
+        return self._mmap[self._slug_start + slug_offsets[idx]:self._slug_start + slug_offsets[idx + 1]]
+
+    def find(self, venue_slug: str) -> int:
+        """
+        This function returns the index of a venue in the file, or -1 if it is not there.
+        """
+        key = venue_slug.encode("utf-8")
+        low, high = 0, self.venue_count
+        while low < high:
+            middle = (low + high) // 2
+            if self._slugAt(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+        if low < self.venue_count and self._slugAt(low) == key:
+            return low
+        return -1
+
+    def get(self, venue_slug: str):
+        """
+        This function returns the venue_coordinates and pricing_table of a venue, or None if it is not in the file.
+        """
+        venue_data = self._tables.get(venue_slug)
+        if venue_data is not None:
+            return venue_data
+        idx = self.find(venue_slug)
+        if idx < 0:
+            return None
+        views = self._views
+        start = views["range_start"][idx]
+        end = start + views["range_count"][idx]
+        table = PricingTable.fromArrays(
+            views["minimum_order_value"][idx],
+            views["delivery_base_price"][idx],
+            views["range_min"][start:end],
+            views["range_max"][start:end],
+            views["range_a"][start:end],
+            views["range_b"][start:end],
+            bool(views["sorted_ranges"][idx]),
+            views["max_distance"][idx],
+        )
+        venue_data = ([views["lon"][idx], views["lat"][idx]], table)
+        self._tables[venue_slug] = venue_data
+        return venue_data
+
+    def venueSlugs(self) -> list:
+        """
+        This function returns the venue_slugs in the file, in the order in which they are stored.
+        """
+        return [self._slugAt(idx).decode("utf-8") for idx in range(self.venue_count)]
+
+    def __len__(self):
+        return self.venue_count
+
+    def __contains__(self, venue_slug: str):
+        return self.find(venue_slug) >= 0
+
+    def close(self):
+        """
+        This function unmaps the file. If PricingTables of the file are still referenced elsewhere,
+        the mapping stays alive until they are garbage collected.
+        """
+        self._tables.clear()
+        for view in self._views.values():
+            view.release()
+        self._buffer.release()
+        try:
+            self._mmap.close()
+        except BufferError:
+            pass
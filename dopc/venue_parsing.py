@@ -0,0 +1,143 @@
+"""
+This file contains the parsing of the Home Assignment API static and dynamic venue payloads.
+Only the few fields DOPC needs are extracted into slotted venue objects, and they are validated once when the
+payload is ingested, so that malformed upstream data is reported clearly instead of failing later with a KeyError.
+Payloads are decoded with orjson if it is installed (pip install anik-wolt-backend-internship-2025[fast-json]),
+otherwise with the json module.
+"""
+import json
+import math
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+HAVE_ORJSON = orjson is not None
+
+
+class InvalidVenuePayloadError(ValueError):
+    """
+    Raised when a venue payload cannot be decoded or does not have the expected shape.
+    """
+
+
+class VenueLocation:
+    """
+    The fields of a static payload used by DOPC.
+    """
+    __slots__ = ("venue_lon", "venue_lat")
+
+    def __init__(self, venue_lon: float, venue_lat: float):
+        self.venue_lon = venue_lon
+        self.venue_lat = venue_lat
+
+    @property
+    def coordinates(self) -> list:
+        """
+        The coordinates in the [venue_lon, venue_lat] order of the Home Assignment API.
+        """
+        return [self.venue_lon, self.venue_lat]
+
+
+class DeliverySpecs:
+    """
+    The fields of a dynamic payload used by DOPC.
+    """
+    __slots__ = ("minimum_order_value", "delivery_base_price", "distance_ranges")
+
+    def __init__(self, minimum_order_value: float, delivery_base_price: float, distance_ranges: list):
+        self.minimum_order_value = minimum_order_value
+        self.delivery_base_price = delivery_base_price
+        self.distance_ranges = distance_ranges
+
+
+def decodeJson(payload):
+    """
+    This function decodes a JSON payload given as bytes or str.
+
+    Raises:
+        InvalidVenuePayloadError: If the payload is not valid JSON
+    """
+    try:
+        if orjson is not None:
+            return orjson.loads(payload)
+        return json.loads(payload)
+    except ValueError as e:
+        raise InvalidVenuePayloadError(f"The payload is not valid JSON: {e}") from e
+
+
+def _getPath(data, *keys, prefix: str = ""):
+    # Follows the keys into nested objects, naming the full path of the first one which is missing
+    for depth, key in enumerate(keys):
+        if not isinstance(data, dict) or key not in data:
+            raise InvalidVenuePayloadError(f"The payload has no field {prefix}{'.'.join(keys[:depth + 1])}")
+        data = data[key]
+    return data
+
+
+def _checkNumber(value, name: str, minimum: float = 0) -> float:
+    # bool is a subclass of int, but never a valid number here
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value) or value < minimum:
+        raise InvalidVenuePayloadError(f"The field {name} must be a number of at least {minimum}, got {value!r}")
+    return value
+
+
+def parseStaticPayload(static_data: dict) -> VenueLocation:
+    """
+    This function extracts and validates the venue's location from a Home Assignment API static payload.
+
+    Parameters:
+        static_data: The decoded JSON returned by the static URL
+    Returns:
+        location: The VenueLocation of the venue
+    Raises:
+        InvalidVenuePayloadError: If the payload does not have the expected shape
+    """
+    coordinates = _getPath(static_data, "venue_raw", "location", "coordinates")
+    if not isinstance(coordinates, list) or len(coordinates) != 2:
+        raise InvalidVenuePayloadError(f"The field venue_raw.location.coordinates must be a [lon, lat] pair, got {coordinates!r}")
+    venue_lon = _checkNumber(coordinates[0], "venue_raw.location.coordinates[0]", -180)
+    venue_lat = _checkNumber(coordinates[1], "venue_raw.location.coordinates[1]", -90)
+    if venue_lon > 180 or venue_lat > 90:
+        raise InvalidVenuePayloadError(f"The venue coordinates {coordinates!r} are out of range")
+    return VenueLocation(venue_lon, venue_lat)
+
+
+def parseDynamicPayload(dynamic_data: dict) -> DeliverySpecs:
+    """
+    This function extracts and validates the delivery specs from a Home Assignment API dynamic payload.
+    The distance ranges have to start at 0, be sorted and contiguous, and end with a range whose max is 0,
+    which marks the end of the delivery area.
+
+    Parameters:
+        dynamic_data: The decoded JSON returned by the dynamic URL
+    Returns:
+        specs: The DeliverySpecs of the venue
+    Raises:
+        InvalidVenuePayloadError: If the payload does not have the expected shape
+    """
+    delivery_specs = _getPath(dynamic_data, "venue_raw", "delivery_specs")
+    minimum_order_value = _checkNumber(_getPath(delivery_specs, "order_minimum_no_surcharge", prefix="venue_raw.delivery_specs."), "order_minimum_no_surcharge")
+    delivery_pricing = _getPath(delivery_specs, "delivery_pricing", prefix="venue_raw.delivery_specs.")
+    delivery_base_price = _checkNumber(_getPath(delivery_pricing, "base_price", prefix="delivery_pricing."), "delivery_pricing.base_price")
+    distance_ranges = _getPath(delivery_pricing, "distance_ranges", prefix="delivery_pricing.")
+    if not isinstance(distance_ranges, list) or not distance_ranges:
+        raise InvalidVenuePayloadError("The field delivery_pricing.distance_ranges must be a non-empty list")
+
+    expected_min = 0
+    for idx, distance_range in enumerate(distance_ranges):
+        name = f"distance_ranges[{idx}]"
+        if not isinstance(distance_range, dict):
+            raise InvalidVenuePayloadError(f"The field {name} must be an object")
+        range_min, range_max, _, _ = (
+            _checkNumber(_getPath(distance_range, key, prefix=f"{name}."), f"{name}.{key}") for key in ("min", "max", "a", "b"))
+        if range_min != expected_min:
+            raise InvalidVenuePayloadError(f"The distance ranges must be sorted and contiguous, but {name}.min is {range_min} instead of {expected_min}")
+        is_last = idx == len(distance_ranges) - 1
+        if is_last and range_max != 0:
+            raise InvalidVenuePayloadError(f"The last distance range must have max 0, got {range_max}")
+        if not is_last and range_max <= range_min:
+            raise InvalidVenuePayloadError(f"The field {name}.max must be larger than its min, got {range_max}")
+        expected_min = range_max
+    return DeliverySpecs(minimum_order_value, delivery_base_price, distance_ranges)
@@ -0,0 +1,178 @@
+"""
+This file contains an in-memory store of venue data which is pushed to DOPC instead of fetched per request.
+A whole snapshot of venues can be bulk loaded (e.g. from a JSON lines file at startup or through the admin endpoint),
+and single venues can be updated incrementally. Venues in the store are priced without any call to the
+Home Assignment API; venue_slugs which are not in the store fall back to the cached live fetchers, see venue_data.py.
+
+Each line of a snapshot is a JSON object with the payloads of the static and dynamic URLs, in the same shape:
+    {"venue_slug": "home-assignment-venue-helsinki", "static": {"venue_raw": {...}}, "dynamic": {"venue_raw": {...}}}
+"""
+import logging
+import time
+from dopc.venue_parsing import decodeJson, parseStaticPayload, parseDynamicPayload
+from dopc.pricing import PricingTable
+
+logger = logging.getLogger(__name__)
+
+
+class VenueRecord:
+    """
+    The pushed data of one venue, with the store version in which it was last changed.
+    """
+    __slots__ = ("venue_coordinates", "pricing_table", "version", "updated_at")
+
+    def __init__(self, venue_coordinates: list, pricing_table: PricingTable, version: int, updated_at: float):
+        self.venue_coordinates = venue_coordinates
+        self.pricing_table = pricing_table
+        self.version = version
+        self.updated_at = updated_at
+
+
+def buildVenueRecord(static_data: dict, dynamic_data: dict, version: int = 0) -> VenueRecord:
+    """
+    This function parses the static and dynamic payloads of a venue and compiles its PricingTable.
+
+    Parameters:
+        static_data: A payload in the shape returned by the Home Assignment API static URL
+        dynamic_data: A payload in the shape returned by the Home Assignment API dynamic URL
+        version: The store version the record belongs to
+    Returns:
+        record: The VenueRecord of the venue
+    Raises:
+        InvalidVenuePayloadError: If a payload does not have the expected shape, a subclass of ValueError
+    """
+    location = parseStaticPayload(static_data)
+    specs = parseDynamicPayload(dynamic_data)
+    pricing_table = PricingTable(specs.minimum_order_value, specs.delivery_base_price, specs.distance_ranges)
+    return VenueRecord(location.coordinates, pricing_table, version, time.time())
+
+
+def parseSnapshotLines(lines) -> dict:
+    """
+    This function parses the JSON lines of a venue snapshot. Empty lines are skipped,
+    and a venue_slug appearing several times keeps its last line.
+
+    Parameters:
+        lines: An iterable of str or bytes, e.g. an open file
+    Returns:
+        records: A dict of VenueRecords keyed by venue_slug, with version 0
+    Raises:
+        ValueError: If a line is not valid JSON or does not have the expected shape, naming the line number
+    """
+    records = {}
+    for line_number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            item = decodeJson(line)
+            venue_slug = item["venue_slug"]
+            if not isinstance(venue_slug, str):
+                raise ValueError(f"venue_slug must be a string, not {type(venue_slug).__name__}")
+            records[venue_slug] = buildVenueRecord(item["static"], item["dynamic"])
+        except (KeyError, TypeError, ValueError) as e:
+            raise ValueError(f"Invalid venue snapshot line {line_number}: {e}") from e
+    return records
+
+
+class VenueStore:
+    """
+    An in-memory store of pushed venue data, keyed by venue_slug.
+    Every change increments the version of the store. A snapshot replaces all venues at once by swapping
+    a single reference, so a lookup sees either the old or the new snapshot, never a mix of both.
+    """
+
+    def __init__(self):
+        self._records = {}
+        self.version = 0
+        self.loaded_at = None
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, venue_slug: str):
+        """
+        This function returns the venue_coordinates and pricing_table of a venue, or None if it is not in the store.
+        """
+        record = self._records.get(venue_slug)
+        if record is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return record.venue_coordinates, record.pricing_table
+
+    def getRecord(self, venue_slug: str):
+        """
+        This function returns the VenueRecord of a venue without counting the lookup, or None if it is not in the store.
+        """
+        return self._records.get(venue_slug)
+
+    def swap(self, records: dict) -> int:
+        """
+        This function replaces all venues of the store with a new snapshot.
+
+        Parameters:
+            records: A dict of VenueRecords keyed by venue_slug, e.g. from parseSnapshotLines()
+        Returns:
+            version: The new version of the store
+        """
+        version = self.version + 1
+        for record in records.values():
+            record.version = version
+        # A dict built aside and swapped in with one assignment, so lookups never see a partly loaded snapshot
+        self._records = dict(records)
+        self.version = version
+        self.loaded_at = time.time()
+        return version
+
+    def update(self, venue_slug: str, record: VenueRecord) -> int:
+        """
+        This function adds or replaces a single venue.
+
+        Returns:
+            version: The new version of the store
+        """
+        self.version += 1
+        record.version = self.version
+        self._records[venue_slug] = record
+        return self.version
+
+    def remove(self, venue_slug: str) -> bool:
+        """
+        This function removes a venue, so that it is fetched from the Home Assignment API again.
+
+        Returns:
+            True if the venue was in the store, False otherwise
+        """
+        if self._records.pop(venue_slug, None) is None:
+            return False
+        self.version += 1
+        return True
+
+    def loadFile(self, path: str) -> int:
+        """
+        This function bulk loads a JSON lines snapshot file. On an invalid line nothing is changed.
+
+        Returns:
+            version: The new version of the store
+        """
+        with open(path, encoding="utf-8") as snapshot_file:
+            records = parseSnapshotLines(snapshot_file)
+        version = self.swap(records)
+        logger.info("Loaded %d venues from snapshot %s, store version %d", len(records), path, version)
+        return version
+
+    def __len__(self):
+        return len(self._records)
+
+    def __contains__(self, venue_slug: str):
+        return venue_slug in self._records
+
+    def stats(self) -> dict:
+        """
+        This function returns the store's counters.
+        """
+        return {
+            "entries": len(self._records),
+            "version": self.version,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
@@ -0,0 +1,19 @@
+import pytest
+from fastapi import HTTPException
+from dopc import service
+from dopc.pricing import PricingTable
+from tests.support import SPEC_DISTANCE_RANGES
+
+
+@pytest.fixture
+def fakeVenueData(monkeypatch):
+    # A fake getVenueData, so that endpoint tests do not depend on the Home Assignment API.
+    # Only home-assignment-venue-helsinki exists, with the specification's delivery pricing
+    fetched_slugs = []
+    async def fakeGetVenueData(venue_slug):
+        fetched_slugs.append(venue_slug)
+        if venue_slug != "home-assignment-venue-helsinki":
+            raise HTTPException(status_code=404, detail="Error fetching data from Home Assignment API static URL. Please check the value of venue_slug.")
+        return [24.92813512, 60.17012143], PricingTable(1000, 190, SPEC_DISTANCE_RANGES)
+    monkeypatch.setattr(service, "getVenueData", fakeGetVenueData)
+    return fetched_slugs
@@ -0,0 +1,23 @@
+"""
+Shared helpers of the test modules. Fixtures are in conftest.py.
+"""
+
+# Distance ranges taken from the specification document
+SPEC_DISTANCE_RANGES = [
+    {"min": 0, "max": 500, "a": 0, "b": 0, "flag": None},
+    {"min": 500, "max": 1000, "a": 100, "b": 0, "flag": None},
+    {"min": 1000, "max": 1500, "a": 200, "b": 0, "flag": None},
+    {"min": 1500, "max": 2000, "a": 200, "b": 1, "flag": None},
+    {"min": 2000, "max": 0, "a": 0, "b": 0, "flag": None},
+]
+
+
+class FakeClock:
+    """
+    A clock for the clock parameters of caches, indexes and limiters, which only moves when now is set.
+    """
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
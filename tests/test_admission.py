@@ -0,0 +1,107 @@
+import asyncio
+import pytest
+from fastapi.testclient import TestClient
+from dopc.admission import AdmissionController, AdmissionMiddleware, TokenBucketLimiter, getClientKey, requests_shed
+from tests.support import FakeClock
+
+
+async def okApp(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"{}"})
+
+
+def makeClient(**limits) -> TestClient:
+    limits.setdefault("controller", AdmissionController(0, 0, 0))
+    limits.setdefault("client_limiter", TokenBucketLimiter(0, 0))
+    limits.setdefault("venue_limiter", TokenBucketLimiter(0, 0))
+    return TestClient(AdmissionMiddleware(okApp, paths=frozenset(("/price",)), **limits))
+
+def test_tokenBucketLimiter_refillsAtRate():
+    clock = FakeClock()
+    limiter = TokenBucketLimiter(rate=2, burst=2, clock=clock)
+    assert limiter.acquire("client") == 0
+    assert limiter.acquire("client") == 0
+    assert limiter.acquire("client") == pytest.approx(0.5)
+    # Other keys have their own bucket
+    assert limiter.acquire("other client") == 0
+    clock.now += 0.5
+    assert limiter.acquire("client") == 0
+    assert limiter.acquire("client") > 0
+
+def test_tokenBucketLimiter_cleanupRemovesFullBuckets():
+    clock = FakeClock()
+    limiter = TokenBucketLimiter(rate=1, burst=2, cleanup_interval=10, clock=clock)
+    limiter.acquire("idle")
+    clock.now += 10
+    limiter.acquire("busy")
+    limiter.acquire("busy")
+    limiter.cleanup()
+    assert len(limiter) == 1
+    # A removed bucket starts full again
+    assert limiter.acquire("idle") == 0
+
+def test_tokenBucketLimiter_maxKeys():
+    limiter = TokenBucketLimiter(rate=1, burst=5, max_keys=3, clock=FakeClock())
+    for key in range(5):
+        limiter.acquire(key)
+    assert len(limiter) <= 4
+
+@pytest.mark.asyncio
+async def test_admissionController_queuesAndSheds():
+    controller = AdmissionController(max_in_flight=1, max_queue=1, queue_timeout=0.05)
+    assert await controller.acquire() is None
+    queued = asyncio.create_task(controller.acquire())
+    await asyncio.sleep(0)
+    assert controller.queued == 1
+    # The queue is full, so the next request is rejected without waiting
+    assert await controller.acquire() == "queue_full"
+    controller.release()
+    assert await queued is None
+    assert controller.in_flight == 1
+    assert await controller.acquire() == "queue_timeout"
+    assert controller.queued == 0
+    controller.release()
+    assert controller.in_flight == 0
+
+@pytest.mark.asyncio
+async def test_admissionController_cancelledWaiterPassesSlotOn():
+    controller = AdmissionController(max_in_flight=1, max_queue=2, queue_timeout=1)
+    await controller.acquire()
+    cancelled = asyncio.create_task(controller.acquire())
+    waiting = asyncio.create_task(controller.acquire())
+    await asyncio.sleep(0)
+    cancelled.cancel()
+    await asyncio.sleep(0)
+    controller.release()
+    assert await waiting is None
+    assert controller.in_flight == 1 and controller.queued == 0
+
+def test_admissionMiddleware_rateLimitsClients():
+    client = makeClient(client_limiter=TokenBucketLimiter(rate=0.001, burst=1))
+    assert client.get("/price").status_code == 200
+    shed_before = requests_shed.get("client_rate_limit")
+    response = client.get("/price")
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) >= 1
+    assert response.json()["detail"]["message"]
+    assert requests_shed.get("client_rate_limit") == shed_before + 1
+    # Other paths are never limited
+    assert client.get("/metrics").status_code == 200
+
+def test_admissionMiddleware_rateLimitsVenues():
+    client = makeClient(venue_limiter=TokenBucketLimiter(rate=0.001, burst=1))
+    assert client.get("/price", params={"venue_slug": "busy-venue"}).status_code == 200
+    assert client.get("/price", params={"venue_slug": "busy-venue"}).status_code == 429
+    assert client.get("/price", params={"venue_slug": "quiet-venue"}).status_code == 200
+
+def test_admissionMiddleware_shedsWhenOverloaded():
+    controller = AdmissionController(max_in_flight=1, max_queue=0, queue_timeout=0)
+    controller.in_flight = 1
+    response = makeClient(controller=controller).get("/price")
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+
+def test_getClientKey_usesHeaderOnlyIfConfigured():
+    scope = {"headers": [(b"x-forwarded-for", b"10.0.0.1, 10.0.0.2")], "client": ("192.168.0.1", 1234)}
+    assert getClientKey(scope) == "192.168.0.1"
+    assert getClientKey(scope, b"x-forwarded-for") == "10.0.0.1"
@@ -0,0 +1,61 @@
+import random
+import pytest
+from dopc.bulk_pricing import computeDistances, computeDeliveryFees, OUT_OF_RANGE_FEE, HAVE_NUMPY
+from dopc.helpers import computeDistance, computeDeliveryFeeAndSurcharge
+from dopc.pricing import PricingTable
+from tests.support import SPEC_DISTANCE_RANGES
+
+VENUE_LAT, VENUE_LON = 60.17012143, 24.92813512
+
+# Run every test with the pure Python fallback, and with NumPy if it is installed
+implementations = [pytest.param(False, id="python"), pytest.param(True, id="numpy", marks=pytest.mark.skipif(not HAVE_NUMPY, reason="NumPy is not installed"))]
+
+
+def randomUserLocations(count: int, spread: float):
+    rng = random.Random(42)
+    user_lats = [VENUE_LAT + rng.uniform(-spread, spread) for _ in range(count)]
+    user_lons = [VENUE_LON + rng.uniform(-spread, spread) for _ in range(count)]
+    return user_lats, user_lons
+
+def expectedFee(distance, distance_ranges, delivery_base_price=190):
+    try:
+        return computeDeliveryFeeAndSurcharge(0, distance, 0, delivery_base_price, distance_ranges)[0]
+    except ValueError:
+        return OUT_OF_RANGE_FEE
+
+@pytest.mark.parametrize("use_numpy", implementations)
+def test_computeDistances_matchesScalar(use_numpy):
+    user_lats, user_lons = randomUserLocations(5000, 0.05)
+    # Also include points far away, on the other side of the earth, and the venue itself
+    user_lats += [-60.0, 22.498820, VENUE_LAT]
+    user_lons += [-155.0, 88.317073, VENUE_LON]
+    distances = computeDistances(user_lats, user_lons, VENUE_LAT, VENUE_LON, use_numpy=use_numpy)
+    expected = [computeDistance(lat, lon, VENUE_LAT, VENUE_LON) for lat, lon in zip(user_lats, user_lons)]
+    assert [int(distance) for distance in distances] == expected
+
+@pytest.mark.parametrize("use_numpy", implementations)
+def test_computeDistances_acceptsVenueSequences(use_numpy):
+    user_lats, user_lons = randomUserLocations(100, 0.05)
+    venue_lats, venue_lons = randomUserLocations(100, 1.0)
+    distances = computeDistances(user_lats, user_lons, venue_lats, venue_lons, use_numpy=use_numpy)
+    expected = [computeDistance(*coordinates) for coordinates in zip(user_lats, user_lons, venue_lats, venue_lons)]
+    assert [int(distance) for distance in distances] == expected
+
+@pytest.mark.parametrize("use_numpy", implementations)
+def test_computeDeliveryFees_matchesScalar(use_numpy):
+    distances = list(range(0, 2600, 7)) + [499, 500, 1999, 2000]
+    table = PricingTable(1000, 190, SPEC_DISTANCE_RANGES)
+    fees = computeDeliveryFees(distances, table, use_numpy=use_numpy)
+    assert [int(fee) for fee in fees] == [expectedFee(distance, SPEC_DISTANCE_RANGES) for distance in distances]
+
+@pytest.mark.parametrize("use_numpy", implementations)
+def test_computeDeliveryFees_unsortedRanges(use_numpy):
+    # Overlapping ranges: the first matching range wins, like the linear scan
+    distance_ranges = [
+        {"min": 500, "max": 1500, "a": 300, "b": 0.5},
+        {"min": 0, "max": 1000, "a": 0, "b": 1},
+        {"min": 1500, "max": 0, "a": 0, "b": 0},
+    ]
+    distances = list(range(0, 1700, 3))
+    fees = computeDeliveryFees(distances, PricingTable(0, 199.5, distance_ranges), use_numpy=use_numpy)
+    assert [int(fee) for fee in fees] == [expectedFee(distance, distance_ranges, 199.5) for distance in distances]
@@ -0,0 +1,132 @@
+import asyncio
+import pytest
+from fastapi import HTTPException
+from dopc.venue_cache import VenueDataCache
+from dopc.cache_warmer import CacheWarmer, VenuePopularity
+from tests.support import FakeClock
+
+
+def makeCache(name, calls, clock):
+    async def fetcher(venue_slug):
+        calls.append((name, venue_slug))
+        if venue_slug == "unknown":
+            raise RuntimeError("no such venue")
+        if venue_slug == "missing":
+            raise HTTPException(status_code=404, detail="missing")
+        return venue_slug
+    return VenueDataCache(name, fetcher, ttl=10, stale_ttl=60, negative_ttl=5, max_entries=100, clock=clock)
+
+
+async def waitForQueue(warmer: CacheWarmer):
+    while warmer.queue_depth or warmer._queued:
+        await asyncio.sleep(0)
+
+def test_venuePopularity_topDecayAndLimit():
+    popularity = VenuePopularity(decay=0.5, max_tracked=4)
+    for venue_slug, requests in (("a", 1), ("b", 3), ("c", 2)):
+        for _ in range(requests):
+            popularity.record(venue_slug)
+    assert popularity.top(2) == ["b", "c"]
+    for _ in range(7):
+        popularity.decay()
+    # After enough rounds without requests, venues are forgotten
+    assert popularity.top(3) == ["b", "c"]
+    for venue_slug in "defgh":
+        popularity.record(venue_slug)
+    assert len(popularity) <= 4
+
+@pytest.mark.asyncio
+async def test_cacheWarmer_warmsSeedVenues():
+    calls = []
+    clock = FakeClock()
+    static_cache, dynamic_cache = makeCache("static", calls, clock), makeCache("dynamic", calls, clock)
+    warmer = CacheWarmer((static_cache, dynamic_cache), interval=60, max_concurrency=2, clock=clock)
+    warmer.start(["helsinki", "berlin"])
+    try:
+        assert warmer.queue_depth == 4
+        await waitForQueue(warmer)
+        assert sorted(calls) == [("dynamic", "berlin"), ("dynamic", "helsinki"), ("static", "berlin"), ("static", "helsinki")]
+        assert dynamic_cache.peek("helsinki") == "helsinki"
+        assert warmer.refreshes == 4
+        # Loaded seed venues are kept fresh like popular venues
+        assert sorted(warmer.popularity.top(10)) == ["berlin", "helsinki"]
+    finally:
+        await warmer.stop()
+    assert not warmer.running
+
+@pytest.mark.asyncio
+async def test_cacheWarmer_refreshesTopVenuesBeforeTTL():
+    calls = []
+    clock = FakeClock()
+    dynamic_cache = makeCache("dynamic", calls, clock)
+    warmer = CacheWarmer((dynamic_cache,), top_n=1, interval=60, jitter=0, refresh_ahead=2, clock=clock)
+    warmer.start()
+    try:
+        for venue_slug in ("hot", "hot", "cold"):
+            dynamic_cache.put(venue_slug, venue_slug)
+            warmer.recordRequest(venue_slug)
+        # Not due yet
+        clock.now = 7
+        assert warmer.scheduleRound() == 0
+        # Within refresh_ahead of the TTL only the most popular venue is refreshed
+        clock.now = 8
+        assert warmer.scheduleRound() == 1
+        await waitForQueue(warmer)
+        assert calls == [("dynamic", "hot")]
+        assert dynamic_cache.age("hot") == 0
+        assert warmer.stats()["hot_venues"] == {"hot": {"dynamic": 0}}
+    finally:
+        await warmer.stop()
+
+@pytest.mark.asyncio
+async def test_cacheWarmer_countsFailedRefreshes():
+    calls = []
+    clock = FakeClock()
+    warmer = CacheWarmer((makeCache("dynamic", calls, clock),), interval=60, clock=clock)
+    warmer.start(["unknown"])
+    try:
+        await waitForQueue(warmer)
+        assert warmer.refresh_errors == 1 and warmer.refreshes == 0
+    finally:
+        await warmer.stop()
+
+@pytest.mark.asyncio
+async def test_cacheWarmer_dropsMissingVenues():
+    calls = []
+    clock = FakeClock()
+    static_cache, dynamic_cache = makeCache("static", calls, clock), makeCache("dynamic", calls, clock)
+    warmer = CacheWarmer((static_cache, dynamic_cache), interval=60, jitter=0, clock=clock)
+    warmer.start(["missing"])
+    try:
+        await waitForQueue(warmer)
+        # A seed venue answered with 404 does not become popular, so it is not fetched every round
+        assert len(warmer.popularity) == 0
+        assert warmer.scheduleRound() == 0
+        assert warmer.warm(["missing"]) == 0
+        # A popular venue which starts to answer 404 is dropped as well
+        warmer.recordRequest("missing")
+        assert warmer.scheduleRound() == 0
+        assert len(warmer.popularity) == 0
+        assert len(calls) == 2
+    finally:
+        await warmer.stop()
+
+@pytest.mark.asyncio
+async def test_cacheWarmer_boundsConcurrency():
+    running = []
+    peak = [0]
+    async def fetcher(venue_slug):
+        running.append(venue_slug)
+        peak[0] = max(peak[0], len(running))
+        await asyncio.sleep(0.01)
+        running.remove(venue_slug)
+        return venue_slug
+    cache = VenueDataCache("dynamic", fetcher, ttl=10, stale_ttl=60, negative_ttl=5, max_entries=100)
+    warmer = CacheWarmer((cache,), interval=60, max_concurrency=3)
+    warmer.start([f"venue-{idx}" for idx in range(10)])
+    try:
+        await waitForQueue(warmer)
+        assert peak[0] == 3
+        assert len(cache) == 10
+    finally:
+        await warmer.stop()
@@ -4,6 +4,7 @@ from dopc.helpers import (
     getDynamicInformationURL,
     computeDistance,
     computeDeliveryFeeAndSurcharge,
+    getInvalidParams,
     getServicePort,
 )
 from dopc.config import HOME_API_BASE, DOPC_DEFAULT_PORT
@@ -69,6 +70,12 @@ def test_computeDeliveryFeeAndSurcharge_deliveryRangeExceeded():
             cart_value, distance, minimum_order_value, delivery_base_price, distance_ranges
         )
 
+# Test that every invalid or missing parameter is reported
+def test_getInvalidParams():
+    assert getInvalidParams("home-assignment-venue-helsinki", 1000, 60.17094, 24.93087) == {}
+    assert getInvalidParams("", -1, None, 200.0) == {"venue_slug": "", "cart_value": -1, "user_lat": None, "user_lon": 200.0}
+    assert getInvalidParams("home-assignment-venue-helsinki", 0, 90.5, -180.0) == {"user_lat": 90.5}
+
 # Test that the function in fact returns the correct value from the configuration file
 def test_getServicePort():
     assert getServicePort() == DOPC_DEFAULT_PORT
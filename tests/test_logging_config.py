@@ -0,0 +1,36 @@
+import json
+import logging
+from dopc.logging_config import setupLogging, stopLogging, logSampled
+
+
+def test_setupLogging_writesStructuredRecords(tmp_path):
+    setupLogging(level="INFO", log_directory=str(tmp_path), log_file="test.log", log_format="json")
+    try:
+        logger = logging.getLogger("dopc.test")
+        logger.info("Static URL returned %s for slug: %s", 200, "home-assignment-venue-helsinki",
+                    extra={"venue_slug": "home-assignment-venue-helsinki", "status": 200, "latency_ms": 12.5})
+        logger.debug("Below the configured level")
+    finally:
+        # Stopping the listener writes all queued records
+        stopLogging()
+    records = [json.loads(line) for line in (tmp_path / "test.log").read_text().splitlines()]
+    assert len(records) == 1
+    assert records[0]["message"] == "Static URL returned 200 for slug: home-assignment-venue-helsinki"
+    assert records[0]["level"] == "INFO"
+    assert records[0]["venue_slug"] == "home-assignment-venue-helsinki"
+    assert records[0]["status"] == 200
+    assert records[0]["latency_ms"] == 12.5
+
+def test_logSampled_respectsSampleRate(tmp_path):
+    setupLogging(level="INFO", log_directory=str(tmp_path), log_file="test.log", log_format="text")
+    try:
+        logger = logging.getLogger("dopc.test")
+        for _ in range(100):
+            logSampled(logger, "never logged", sample_rate=0.0)
+        for _ in range(3):
+            logSampled(logger, "always logged", sample_rate=1.0)
+    finally:
+        stopLogging()
+    lines = (tmp_path / "test.log").read_text().splitlines()
+    assert len(lines) == 3
+    assert all("always logged" in line for line in lines)
@@ -0,0 +1,45 @@
+from fastapi.testclient import TestClient
+from dopc.metrics import CallbackCounter, Counter, Histogram, Registry
+from dopc.service import dopc
+
+client = TestClient(dopc)
+
+
+def test_histogram_rendersCumulativeBuckets():
+    registry = Registry()
+    histogram = registry.register(Histogram("test_latency_seconds", "Test latency", ("stage",), buckets=(0.1, 1.0)))
+    histogram.observe(0.05, "fee")
+    histogram.observe(0.5, "fee")
+    histogram.observe(5, "fee")
+    lines = registry.render().splitlines()
+    assert '# TYPE test_latency_seconds histogram' in lines
+    assert 'test_latency_seconds_bucket{stage="fee",le="0.1"} 1' in lines
+    assert 'test_latency_seconds_bucket{stage="fee",le="1.0"} 2' in lines
+    assert 'test_latency_seconds_bucket{stage="fee",le="+Inf"} 3' in lines
+    assert 'test_latency_seconds_count{stage="fee"} 3' in lines
+
+def test_counter_escapesLabelValues():
+    registry = Registry()
+    counter = registry.register(Counter("test_total", "Test counter", ("error",)))
+    counter.inc('quote"d')
+    counter.inc('quote"d', amount=2)
+    assert 'test_total{error="quote\\"d"} 3' in registry.render().splitlines()
+
+def test_callbackCounter_rendersCounterType():
+    registry = Registry()
+    registry.register(CallbackCounter("test_events_total", "Test events", ("event",), lambda: {("hit",): 2}))
+    lines = registry.render().splitlines()
+    assert '# TYPE test_events_total counter' in lines
+    assert 'test_events_total{event="hit"} 2' in lines
+
+def test_metricsEndpoint_countsInvalidParams():
+    client.get("/api/v1/delivery-order-price", params={"venue_slug": "home-assignment-venue-berlin", "cart_value": -100, "user_lat": 60.0, "user_lon": 30.0})
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    lines = response.text.splitlines()
+    assert any(line.startswith('dopc_errors_total{error="invalid_params"}') for line in lines)
+    assert any(line.startswith('dopc_http_requests_total{route="/api/v1/delivery-order-price",status="400"}') for line in lines)
+    assert any(line.startswith('dopc_stage_latency_seconds_count{stage="validation"}') for line in lines)
+    assert any(line.startswith('dopc_venue_cache_hit_ratio{cache="static"}') for line in lines)
+    assert '# TYPE dopc_venue_cache_events_total counter' in lines
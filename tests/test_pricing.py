@@ -0,0 +1,67 @@
+import random
+import pytest
+from dopc.helpers import computeDeliveryFeeAndSurcharge
+from dopc.pricing import PricingTable
+from tests.support import SPEC_DISTANCE_RANGES
+
+
+
+def computeBoth(cart_value, distance, minimum_order_value, delivery_base_price, distance_ranges):
+    # Returns the result or the error of both implementations, so that they can be compared
+    results = []
+    table = PricingTable(minimum_order_value, delivery_base_price, distance_ranges)
+    for compute in (
+        lambda: computeDeliveryFeeAndSurcharge(cart_value, distance, minimum_order_value, delivery_base_price, distance_ranges),
+        lambda: table.computeDeliveryFeeAndSurcharge(cart_value, distance),
+    ):
+        try:
+            results.append(compute())
+        except ValueError as e:
+            results.append(str(e))
+    return results
+
+def test_pricingTable_matchesSpecificationExample():
+    table = PricingTable(1000.0, 190.0, SPEC_DISTANCE_RANGES)
+    assert table.computeDeliveryFeeAndSurcharge(1000, 177) == (190, 0)
+    assert table.computeDeliveryFeeAndSurcharge(800, 1600) == (550, 200)
+
+@pytest.mark.parametrize("distance", [0, 1, 499, 500, 999, 1000, 1499, 1500, 1999, 2000, 2001, 100000])
+def test_pricingTable_rangeBoundaries(distance):
+    old, new = computeBoth(790, distance, 1000, 190, SPEC_DISTANCE_RANGES)
+    assert old == new
+
+def test_pricingTable_lastRangeMeansOutOfRange():
+    table = PricingTable(1000, 190, SPEC_DISTANCE_RANGES)
+    with pytest.raises(ValueError, match="The delivery distance is too large! Delivery not possible!"):
+        table.computeDeliveryFeeAndSurcharge(1000, 2000)
+    # A single range only marks the end of the delivery area, so nothing can be delivered
+    with pytest.raises(ValueError):
+        PricingTable(1000, 190, [{"min": 0, "max": 0, "a": 0, "b": 0}]).computeDeliveryFeeAndSurcharge(1000, 0)
+
+def test_pricingTable_matchesLinearScanOnRandomRanges():
+    rng = random.Random(2025)
+    for _ in range(300):
+        # Mostly contiguous tiers, sometimes with gaps, overlaps or unsorted ranges
+        distance_ranges = []
+        lower = 0
+        for _ in range(rng.randint(1, 12)):
+            upper = lower + rng.randint(0, 700)
+            distance_ranges.append({"min": lower, "max": upper, "a": rng.randint(0, 500), "b": rng.choice([0, 1, 2, 0.5]), "flag": None})
+            lower = upper + rng.choice([0, 0, 0, 50, -50])
+        if rng.random() < 0.2:
+            rng.shuffle(distance_ranges)
+        distance_ranges.append({"min": lower, "max": 0, "a": 0, "b": 0, "flag": None})
+        minimum_order_value = rng.choice([0, 1000, 1000.5])
+        delivery_base_price = rng.choice([190, 199.5, 0])
+        for _ in range(20):
+            distance = rng.randint(0, lower + 200)
+            cart_value = rng.randint(0, 2000)
+            old, new = computeBoth(cart_value, distance, minimum_order_value, delivery_base_price, distance_ranges)
+            assert old == new, (distance_ranges, distance)
+
+def test_pricingTable_versionFollowsDeliverySpecs():
+    assert PricingTable(0, 0, SPEC_DISTANCE_RANGES).version == PricingTable(0, 0, SPEC_DISTANCE_RANGES).version
+    assert PricingTable(0, 0, SPEC_DISTANCE_RANGES).version != PricingTable(0, 10, SPEC_DISTANCE_RANGES).version
+    changed_ranges = [dict(distance_range) for distance_range in SPEC_DISTANCE_RANGES]
+    changed_ranges[0]["a"] += 1
+    assert PricingTable(0, 0, SPEC_DISTANCE_RANGES).version != PricingTable(0, 0, changed_ranges).version
@@ -0,0 +1,80 @@
+import random
+import pytest
+from dopc import service, venue_data
+from dopc.pricing import PricingTable
+from dopc.quote_cache import QuoteCache
+from tests.support import SPEC_DISTANCE_RANGES
+
+HELSINKI = [24.92813512, 60.17012143]
+
+
+@pytest.fixture
+def quoteCache(monkeypatch):
+    cache = QuoteCache(max_entries=2, precision=7)
+    monkeypatch.setattr(service, "quote_cache", cache)
+    return cache
+
+def test_priceQuote_reusesCachedPrices(quoteCache, monkeypatch):
+    table = PricingTable(1000, 190, SPEC_DISTANCE_RANGES)
+    price = service.priceQuote(1000, 60.17094, 24.93087, HELSINKI, table)
+    assert price["delivery"] == {"fee": 190, "distance": 177}
+    # A nearby location rounding to the same coordinates is served without computing the distance again
+    monkeypatch.setattr(service, "computeExactDistance", None)
+    assert service.priceQuote(1000, 60.17094001, 24.93087001, HELSINKI, table) is price
+    assert quoteCache.stats()["hits"] == 1
+
+def test_priceQuote_newPricingTableInvalidatesPrices(quoteCache):
+    table = PricingTable(1000, 190, SPEC_DISTANCE_RANGES)
+    assert service.priceQuote(1000, 60.17094, 24.93087, HELSINKI, table)["total_price"] == 1190
+    # New dynamic data compiles a new PricingTable, so the old price is not used anymore
+    table = PricingTable(1000, 290, SPEC_DISTANCE_RANGES)
+    assert service.priceQuote(1000, 60.17094, 24.93087, HELSINKI, table)["total_price"] == 1290
+    assert quoteCache.stats()["hits"] == 0
+
+@pytest.mark.asyncio
+async def test_priceQuote_refetchedUnchangedSpecsKeepPrices(quoteCache, monkeypatch):
+    async def fakeDynamic(venue_slug):
+        return 1000, 190, SPEC_DISTANCE_RANGES
+    monkeypatch.setattr(venue_data, "fetchDynamicData", fakeDynamic)
+    price = service.priceQuote(1000, 60.17094, 24.93087, HELSINKI, await venue_data.loadPricingTable("helsinki"))
+    # A refetch after the TTL compiles a new PricingTable from the same specs, which keeps the cached prices
+    assert service.priceQuote(1000, 60.17094, 24.93087, HELSINKI, await venue_data.loadPricingTable("helsinki")) is price
+    assert quoteCache.stats()["hits"] == 1
+
+def test_priceQuote_cachesOutOfRangeAndEvicts(quoteCache):
+    table = PricingTable(1000, 190, SPEC_DISTANCE_RANGES)
+    for _ in range(2):
+        with pytest.raises(ValueError):
+            service.priceQuote(1000, 22.49882, 88.317073, HELSINKI, table)
+    assert quoteCache.stats()["hits"] == 1
+    service.priceQuote(100, 60.17094, 24.93087, HELSINKI, table)
+    service.priceQuote(200, 60.17094, 24.93087, HELSINKI, table)
+    assert len(quoteCache) == 2
+    assert quoteCache.stats()["evictions"] == 1
+
+def test_priceQuote_skipsPricesNearRoundingBoundary(quoteCache):
+    table = PricingTable(1000, 190, SPEC_DISTANCE_RANGES)
+    # 499.5 metres north of the venue, where the distance rounds to 499 or 500 within one cell of the coordinates
+    user_lat = HELSINKI[1] + 499.5 / 111194.93
+    price = service.priceQuote(1000, user_lat, HELSINKI[0], HELSINKI, table)
+    assert len(quoteCache) == 0
+    assert quoteCache.stats()["skipped"] == 1
+    assert service.priceQuote(1000, user_lat, HELSINKI[0], HELSINKI, table) == price
+
+def test_priceQuote_cachedPricesEqualComputedPrices(monkeypatch):
+    table = PricingTable(1000, 190, SPEC_DISTANCE_RANGES)
+    rng = random.Random(16)
+    for precision in (6, 7):
+        cache = QuoteCache(max_entries=100000, precision=precision)
+        monkeypatch.setattr(service, "quote_cache", cache)
+        half_cell = 0.5 * 10 ** -precision
+        for _ in range(500):
+            # Several locations within one cell of the coordinates, around the 500 metre boundary of the distance ranges
+            cell_lat = round(HELSINKI[1] + rng.uniform(0.0044, 0.0046), precision)
+            cell_lon = round(HELSINKI[0] + rng.uniform(-0.0005, 0.0005), precision)
+            for _ in range(4):
+                user_lat = cell_lat + rng.uniform(-half_cell, half_cell) * 0.999
+                user_lon = cell_lon + rng.uniform(-half_cell, half_cell) * 0.999
+                distance = service.measureDistance(user_lat, user_lon, HELSINKI[1], HELSINKI[0])
+                assert service.priceQuote(1000, user_lat, user_lon, HELSINKI, table) == service.computeQuote(1000, distance, table)
+        assert cache.stats()["hits"] > 0 and cache.stats()["skipped"] > 0
@@ -0,0 +1,221 @@
+import asyncio
+import httpx
+import pytest
+from fastapi import HTTPException
+from dopc import resilience
+from dopc.api_fetchers import fetchStaticData
+from dopc.single_flight import SingleFlight
+from dopc.resilience import (
+    CircuitBreaker,
+    DeadlineMiddleware,
+    DeadlineExceededError,
+    UpstreamUnavailableError,
+    resilientGet,
+    resetCircuitBreakers,
+    setRequestDeadline,
+    resetRequestDeadline,
+)
+from dopc.upstream_client import buildUpstreamClient, startUpstreamClient, closeUpstreamClient
+
+STATIC_URL = "http://fake-home-api/home-assignment-venue-helsinki/static"
+STATIC_PAYLOAD = {"venue_raw": {"location": {"coordinates": [24.9, 60.1]}}}
+
+
+class FakeUpstream:
+    """
+    A fake Home Assignment API which answers every request after a delay, with scripted status codes or errors.
+    """
+    def __init__(self, outcomes=(), latency: float = 0.0):
+        self.outcomes = list(outcomes)
+        self.latency = latency
+        self.calls = 0
+        self.concurrent = 0
+        self.max_concurrent = 0
+
+    async def __call__(self, request):
+        self.calls += 1
+        self.concurrent += 1
+        self.max_concurrent = max(self.max_concurrent, self.concurrent)
+        try:
+            if self.latency:
+                await asyncio.sleep(self.latency)
+            outcome = self.outcomes.pop(0) if self.outcomes else 200
+            if isinstance(outcome, Exception):
+                raise outcome
+            return httpx.Response(outcome, json=STATIC_PAYLOAD)
+        finally:
+            self.concurrent -= 1
+
+    def client(self, read_timeout: float = 3.0):
+        return buildUpstreamClient(transport=httpx.MockTransport(self), read_timeout=read_timeout)
+
+
+@pytest.fixture(autouse=True)
+def closedCircuits(monkeypatch):
+    # Keep retries fast and start every test with closed circuits
+    monkeypatch.setattr(resilience, "UPSTREAM_RETRY_BASE_DELAY", 0.001)
+    resetCircuitBreakers()
+    yield
+    resetCircuitBreakers()
+
+@pytest.mark.asyncio
+async def test_resilientGet_retriesServerErrors():
+    upstream = FakeUpstream([503, httpx.ConnectError("refused"), 200])
+    async with upstream.client() as client:
+        response = await resilientGet(client, STATIC_URL)
+    assert response.status_code == 200
+    assert upstream.calls == 3
+
+@pytest.mark.asyncio
+async def test_resilientGet_doesNotRetryNotFound():
+    upstream = FakeUpstream([404])
+    async with upstream.client() as client:
+        response = await resilientGet(client, STATIC_URL)
+    assert response.status_code == 404
+    assert upstream.calls == 1
+
+@pytest.mark.asyncio
+async def test_resilientGet_opensCircuitAfterRepeatedFailures():
+    upstream = FakeUpstream([500] * 100)
+    async with upstream.client() as client:
+        for _ in range(resilience.CIRCUIT_BREAKER_FAILURE_THRESHOLD):
+            await resilientGet(client, STATIC_URL, max_retries=0)
+        calls = upstream.calls
+        with pytest.raises(UpstreamUnavailableError):
+            await resilientGet(client, STATIC_URL)
+    # The open circuit rejects the call without contacting the upstream server
+    assert upstream.calls == calls
+
+def test_circuitBreaker_halfOpenAllowsOneTrial():
+    now = [0.0]
+    circuit_breaker = CircuitBreaker(failure_threshold=2, reset_timeout=10, clock=lambda: now[0])
+    circuit_breaker.recordFailure()
+    circuit_breaker.recordFailure()
+    assert circuit_breaker.state == "open"
+    assert not circuit_breaker.allowRequest()
+    now[0] = 11
+    assert circuit_breaker.allowRequest()
+    assert not circuit_breaker.allowRequest()
+    # A failed trial opens the circuit again, a successful one closes it
+    circuit_breaker.recordFailure()
+    assert circuit_breaker.state == "open"
+    now[0] = 22
+    assert circuit_breaker.allowRequest()
+    circuit_breaker.recordSuccess()
+    assert circuit_breaker.state == "closed"
+
+@pytest.mark.asyncio
+async def test_resilientGet_respectsRequestDeadline():
+    upstream = FakeUpstream(latency=1.0)
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    token = setRequestDeadline(0.1)
+    try:
+        async with upstream.client() as client:
+            with pytest.raises((httpx.TimeoutException, DeadlineExceededError)):
+                await resilientGet(client, STATIC_URL)
+    finally:
+        resetRequestDeadline(token)
+    # The slow upstream call is abandoned at the deadline instead of the 3 second read timeout
+    assert loop.time() - start < 0.5
+
+@pytest.mark.asyncio
+async def test_resilientGet_callerDeadlineDoesNotOpenCircuit():
+    upstream = FakeUpstream(latency=0.05)
+    async with upstream.client() as client:
+        for _ in range(resilience.CIRCUIT_BREAKER_FAILURE_THRESHOLD + 1):
+            token = setRequestDeadline(0.001)
+            try:
+                with pytest.raises(DeadlineExceededError):
+                    await resilientGet(client, STATIC_URL)
+            finally:
+                resetRequestDeadline(token)
+        # Requests without a short deadline of their own are not affected
+        response = await resilientGet(client, STATIC_URL)
+    assert response.status_code == 200
+    assert resilience.getCircuitBreaker("fake-home-api").state == "closed"
+
+async def sharedGet(flight, client, timeout):
+    token = setRequestDeadline(timeout)
+    try:
+        return await flight.do("helsinki", resilientGet, client, STATIC_URL)
+    finally:
+        resetRequestDeadline(token)
+
+@pytest.mark.asyncio
+async def test_singleFlight_sharedCallStopsAtDeadline():
+    upstream = FakeUpstream(latency=2.0)
+    flight = SingleFlight()
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    async with upstream.client() as client:
+        with pytest.raises(DeadlineExceededError):
+            await sharedGet(flight, client, 0.05)
+        # Nobody waits for the shared call anymore, so its upstream call is abandoned at the deadline as well
+        await asyncio.sleep(0.05)
+        assert resilience.getInFlightCalls() == 0
+        assert flight.inFlight() == 0
+    assert loop.time() - start < 0.5
+    assert upstream.calls == 1
+
+@pytest.mark.asyncio
+async def test_singleFlight_sharedCallKeepsLatestDeadline():
+    upstream = FakeUpstream(latency=0.1)
+    flight = SingleFlight()
+    async with upstream.client() as client:
+        impatient = asyncio.create_task(sharedGet(flight, client, 0.03))
+        await asyncio.sleep(0.01)
+        # A caller with a later deadline joins the call while it is running, which extends the deadline of the call
+        patient = await sharedGet(flight, client, 1.0)
+        with pytest.raises(DeadlineExceededError):
+            await impatient
+    assert patient.status_code == 200
+    assert upstream.calls == 1
+
+@pytest.mark.asyncio
+async def test_deadlineMiddleware_enforcesMinimumDeadline():
+    remaining = []
+    async def app(scope, receive, send):
+        remaining.append(resilience.getRemainingTime())
+    middleware = DeadlineMiddleware(app, default_timeout=4.0, min_timeout=0.1)
+    for value in (b"1", b"-5", b"2000", b"10000"):
+        await middleware({"type": "http", "headers": [(b"x-request-timeout-ms", value)]}, None, None)
+    assert [round(seconds, 1) for seconds in remaining] == [0.1, 0.1, 2.0, 4.0]
+
+@pytest.mark.asyncio
+async def test_resilientGet_limitsConcurrentCalls(monkeypatch):
+    monkeypatch.setattr(resilience, "UPSTREAM_MAX_CONCURRENCY", 3)
+    monkeypatch.setattr(resilience, "UPSTREAM_ACQUIRE_TIMEOUT", 0.05)
+    monkeypatch.setattr(resilience, "_limiter", None)
+    upstream = FakeUpstream(latency=0.2)
+    async with upstream.client() as client:
+        results = await asyncio.gather(*(resilientGet(client, STATIC_URL) for _ in range(10)), return_exceptions=True)
+    # Calls that could not get a slot in time are shed instead of queueing
+    assert upstream.max_concurrent == 3
+    assert sum(isinstance(result, UpstreamUnavailableError) for result in results) == 7
+
+@pytest.mark.asyncio
+async def test_fetchStaticData_shedCallReturns503():
+    upstream = FakeUpstream([500] * 100)
+    await startUpstreamClient(transport=httpx.MockTransport(upstream))
+    try:
+        for _ in range(resilience.CIRCUIT_BREAKER_FAILURE_THRESHOLD):
+            with pytest.raises(HTTPException):
+                await fetchStaticData("home-assignment-venue-helsinki")
+        with pytest.raises(HTTPException) as exc_info:
+            await fetchStaticData("home-assignment-venue-helsinki")
+        assert exc_info.value.status_code == 503
+        assert exc_info.value.headers == {"Retry-After": "1"}
+    finally:
+        await closeUpstreamClient()
+
+@pytest.mark.asyncio
+async def test_drainUpstreamCalls_waitsForInFlightCalls():
+    upstream = FakeUpstream(latency=0.1)
+    async with upstream.client() as client:
+        call = asyncio.create_task(resilientGet(client, STATIC_URL))
+        await asyncio.sleep(0.01)
+        assert resilience.getInFlightCalls() == 1
+        assert not await resilience.drainUpstreamCalls(0.01)
+        assert await resilience.drainUpstreamCalls(1.0)
+        assert call.done()
@@ -0,0 +1,42 @@
+import pytest
+from fastapi.testclient import TestClient
+from dopc import service
+from dopc.responses import renderPrice, dumpJson
+from dopc.service import dopc
+
+client = TestClient(dopc)
+
+HELSINKI = {"venue_slug": "home-assignment-venue-helsinki", "cart_value": 1000, "user_lat": 60.17094, "user_lon": 24.93087}
+
+
+def test_renderPrice_matchesJsonResponse():
+    price = {"total_price": 1190, "small_order_surcharge": 0, "cart_value": 1000, "delivery": {"fee": 190, "distance": 177}}
+    assert renderPrice(price) == dumpJson(price)
+    price["delivery"]["fee"] = 190.5
+    assert renderPrice(price) == dumpJson(price)
+
+@pytest.mark.parametrize("params", [
+    HELSINKI,
+    {**HELSINKI, "cart_value": 10},
+    {**HELSINKI, "cart_value": -100, "user_lat": 91},
+    {**HELSINKI, "user_lat": 22.498820, "user_lon": 88.317073},
+    {**HELSINKI, "venue_slug": "home-assignment-venue-kolkata"},
+])
+def test_fastResponses_areByteCompatible(fakeVenueData, monkeypatch, params):
+    responses = []
+    for fast_responses in (False, True):
+        monkeypatch.setattr(service, "FAST_RESPONSES", fast_responses)
+        responses.append(client.get("/api/v1/delivery-order-price", params=params))
+    slow, fast = responses
+    assert fast.status_code == slow.status_code
+    assert fast.content == slow.content
+    assert fast.headers["content-type"] == slow.headers["content-type"]
+    assert fast.headers["content-length"] == slow.headers["content-length"]
+
+def test_fastResponses_batchIsByteCompatible(fakeVenueData, monkeypatch):
+    items = [HELSINKI, {**HELSINKI, "cart_value": -100}, {**HELSINKI, "venue_slug": "home-assignment-venue-kolkata"}, {**HELSINKI, "user_lat": 22.49882}]
+    responses = []
+    for fast_responses in (False, True):
+        monkeypatch.setattr(service, "FAST_RESPONSES", fast_responses)
+        responses.append(client.post("/api/v1/delivery-order-price/batch", json={"items": items}))
+    assert responses[1].content == responses[0].content
@@ -1,5 +1,6 @@
 import pytest
 from fastapi.testclient import TestClient
+from dopc import service
 from dopc.service import dopc
 
 client = TestClient(dopc)
@@ -75,3 +76,34 @@ async def test_getDeliveryOrderPrice_deliveryDistanceLimitExceeded():
     assert response.status_code == 400
     data = response.json()
     assert data["detail"]["message"] == "Invalid request! Delivery distance is too large! Delivery not possible!"
+
+# The batch endpoint tests use a fake getVenueData, so they do not depend on the Home Assignment API
+
+
+def test_getDeliveryOrderPriceBatch_perItemResults(fakeVenueData):
+    helsinki = {"venue_slug": "home-assignment-venue-helsinki", "cart_value": 1000, "user_lat": 60.17094, "user_lon": 24.93087}
+    response = client.post("/api/v1/delivery-order-price/batch", json={"items": [
+        helsinki,
+        {**helsinki, "cart_value": -100},
+        {**helsinki, "venue_slug": "home-assignment-venue-kolkata"},
+        {**helsinki, "user_lat": 22.498820, "user_lon": 88.317073},
+        helsinki,
+    ]})
+    assert response.status_code == 200
+    results = response.json()["results"]
+    expected_price = {"total_price": 1190, "small_order_surcharge": 0, "cart_value": 1000, "delivery": {"fee": 190, "distance": 177}}
+    assert results[0] == {"status_code": 200, "price": expected_price}
+    assert results[1]["status_code"] == 400
+    assert "cart_value" in results[1]["detail"]["invalid_parameters"]
+    assert results[2]["status_code"] == 404
+    assert results[3] == {"status_code": 400, "detail": {"message": "Invalid request! Delivery distance is too large! Delivery not possible!"}}
+    assert results[4] == results[0]
+    # Each distinct venue is fetched once, and invalid items are not fetched at all
+    assert sorted(fakeVenueData) == ["home-assignment-venue-helsinki", "home-assignment-venue-kolkata"]
+
+def test_getDeliveryOrderPriceBatch_tooManyItems(fakeVenueData, monkeypatch):
+    monkeypatch.setattr(service, "BATCH_MAX_ITEMS", 2)
+    item = {"venue_slug": "home-assignment-venue-helsinki", "cart_value": 1000, "user_lat": 60.17094, "user_lon": 24.93087}
+    response = client.post("/api/v1/delivery-order-price/batch", json={"items": [item] * 3})
+    assert response.status_code == 413
+    assert fakeVenueData == []
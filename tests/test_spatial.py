@@ -0,0 +1,91 @@
+import random
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+from dopc import venue_data
+from dopc.helpers import computeDistance
+from dopc.pricing import PricingTable
+from dopc.service import dopc
+from dopc.spatial import DeliveryArea, VenueGeoIndex
+from tests.support import FakeClock, SPEC_DISTANCE_RANGES
+
+client = TestClient(dopc)
+
+HELSINKI = [24.92813512, 60.17012143]
+
+
+@pytest.fixture
+def emptyGeoIndex():
+    # The index is module level, so make sure no test sees another test's venues
+    venue_data.geo_index.clear()
+    yield venue_data.geo_index
+    venue_data.geo_index.clear()
+
+@pytest.mark.parametrize("venue_coordinates", [HELSINKI, [179.999, 0.0], [-179.999, -45.0], [10.0, 89.99]])
+def test_deliveryArea_neverExcludesDeliverablePoints(venue_coordinates):
+    table = PricingTable(1000, 190, SPEC_DISTANCE_RANGES)
+    area = DeliveryArea(venue_coordinates, table, 0.0)
+    venue_lon, venue_lat = venue_coordinates
+    rng = random.Random(0)
+    for _ in range(5000):
+        user_lat = max(-90.0, min(90.0, venue_lat + rng.uniform(-0.03, 0.03)))
+        user_lon = venue_lon + rng.uniform(-0.1, 0.1)
+        user_lon = (user_lon + 180.0) % 360.0 - 180.0
+        distance = computeDistance(user_lat, user_lon, venue_lat, venue_lon)
+        if area.excludes(user_lat, user_lon):
+            assert distance >= table.max_distance
+
+def test_venueGeoIndex_venuesDeliveringTo():
+    clock = FakeClock()
+    index = VenueGeoIndex(0.05, ttl=60, clock=clock)
+    table = PricingTable(1000, 190, SPEC_DISTANCE_RANGES)
+    index.update("helsinki", HELSINKI, table)
+    index.update("helsinki-east", [HELSINKI[0] + 0.02, HELSINKI[1]], table)
+    index.update("stockholm", [18.0314984, 59.3466978], table)
+    results = index.venuesDeliveringTo(60.17094, 24.93087)
+    assert [venue_slug for venue_slug, _ in results] == ["helsinki", "helsinki-east"]
+    assert results[0][1] == 177
+    assert index.venuesDeliveringTo(60.5, 24.93087) == []
+    # Areas which were not seen within the TTL are not used anymore
+    clock.now = 61
+    assert index.venuesDeliveringTo(60.17094, 24.93087) == []
+    assert not index.excludes("helsinki", 60.5, 24.93087)
+
+def test_venueGeoIndex_prunesExpiredAreas():
+    clock = FakeClock()
+    index = VenueGeoIndex(0.05, ttl=60, clock=clock)
+    table = PricingTable(1000, 190, SPEC_DISTANCE_RANGES)
+    for idx in range(100):
+        index.update(f"venue-{idx}", [HELSINKI[0] + idx * 0.01, HELSINKI[1]], table)
+    clock.now = 30
+    index.update("helsinki", HELSINKI, table)
+    assert len(index) == 101
+    # Adding an area after the TTL removes the areas which were not seen since, with their grid cells
+    clock.now = 70
+    index.update("stockholm", [18.0314984, 59.3466978], table)
+    assert sorted(index._areas) == ["helsinki", "stockholm"]
+    assert sum(len(venue_slugs) for venue_slugs in index._cells.values()) == len(index._getCells(index.get("helsinki"))) + len(index._getCells(index.get("stockholm")))
+
+@pytest.mark.asyncio
+async def test_getVenueData_removesAreaOfMissingVenue(emptyGeoIndex, monkeypatch):
+    async def missingVenue(venue_slug):
+        raise HTTPException(status_code=404, detail="static")
+    monkeypatch.setattr(venue_data, "fetchStaticData", missingVenue)
+    emptyGeoIndex.update("home-assignment-venue-helsinki", HELSINKI, PricingTable(1000, 190, SPEC_DISTANCE_RANGES))
+    with pytest.raises(HTTPException):
+        await venue_data.loadVenueCoordinates("home-assignment-venue-helsinki")
+    # The venue is answered with its 404 again instead of being rejected as out of range
+    assert "home-assignment-venue-helsinki" not in emptyGeoIndex
+
+def test_getDeliveryOrderPrice_rejectsOutOfRangeWithoutFetching(emptyGeoIndex, monkeypatch):
+    async def failingGetVenueData(venue_slug):
+        raise AssertionError("Venue data must not be fetched for coordinates outside the delivery area")
+    monkeypatch.setattr("dopc.service.getVenueData", failingGetVenueData)
+    emptyGeoIndex.update("home-assignment-venue-helsinki", HELSINKI, PricingTable(1000, 190, SPEC_DISTANCE_RANGES))
+    response = client.get("/api/v1/delivery-order-price", params={
+        "venue_slug": "home-assignment-venue-helsinki", "cart_value": 1000, "user_lat": 60.5, "user_lon": 24.93087})
+    assert response.status_code == 400
+    assert response.json()["detail"] == {"message": "Invalid request! Delivery distance is too large! Delivery not possible!"}
+    response = client.get("/api/v1/venues/delivering-to", params={"user_lat": 60.17094, "user_lon": 24.93087})
+    assert response.json() == {"venues": [{"venue_slug": "home-assignment-venue-helsinki", "distance": 177}]}
+    assert client.get("/api/v1/venues/delivering-to", params={"user_lat": 100}).status_code == 400
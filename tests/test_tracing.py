@@ -0,0 +1,106 @@
+import asyncio
+import logging
+import pytest
+from fastapi.testclient import TestClient
+from dopc import tracing, venue_data
+from dopc.service import dopc
+from dopc.venue_store import buildVenueRecord
+from dopc.tracing import TracingMiddleware, Trace, traceSpan, getRequestId
+from dopc.single_flight import SingleFlight
+from dopc.logging_config import RequestIdFilter
+from tests.test_venue_store import STATIC_PAYLOAD, DYNAMIC_PAYLOAD
+
+client = TestClient(dopc)
+
+
+async def slowApp(scope, receive, send):
+    with traceSpan("outer"):
+        with traceSpan("inner"):
+            await asyncio.sleep(0.002)
+        with traceSpan("inner"):
+            pass
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"{}"})
+
+
+@pytest.fixture
+def slowTraces(monkeypatch):
+    buffer = tracing.deque(maxlen=2)
+    monkeypatch.setattr(tracing, "slow_traces", buffer)
+    return buffer
+
+def test_tracingMiddleware_keepsSpanTreeOfSlowRequests(slowTraces):
+    response = TestClient(TracingMiddleware(slowApp, enabled=True, slow_threshold_ms=1)).get("/slow")
+    assert response.headers["X-Request-ID"]
+    assert response.headers["Server-Timing"].startswith("outer;dur=")
+    assert "inner;dur=" in response.headers["Server-Timing"]
+    [trace] = tracing.getSlowTraces()
+    assert trace["request_id"] == response.headers["X-Request-ID"]
+    assert trace["path"] == "/slow" and trace["status"] == 200
+    [outer] = trace["spans"]
+    assert [child["name"] for child in outer["children"]] == ["inner", "inner"]
+    assert outer["children"][0]["duration_ms"] >= 2
+
+def test_tracingMiddleware_ringBufferKeepsNewestTraces(slowTraces):
+    app = TestClient(TracingMiddleware(slowApp, enabled=True, slow_threshold_ms=1))
+    for request_id in ("first", "second", "third"):
+        app.get("/slow", headers={"X-Request-ID": request_id})
+    assert [trace["request_id"] for trace in tracing.getSlowTraces()] == ["third", "second"]
+
+def test_tracingMiddleware_samplingDisabled(slowTraces):
+    TestClient(TracingMiddleware(slowApp, enabled=True, slow_threshold_ms=0)).get("/slow")
+    assert len(slowTraces) == 0
+
+def test_tracingMiddleware_replacesInvalidRequestId(slowTraces):
+    app = TestClient(TracingMiddleware(slowApp, enabled=True, slow_threshold_ms=0))
+    assert app.get("/slow", headers={"X-Request-ID": "abc-123"}).headers["X-Request-ID"] == "abc-123"
+    assert app.get("/slow", headers={"X-Request-ID": "x" * 200}).headers["X-Request-ID"] != "x" * 200
+    # Request IDs generated by the worker are unique
+    assert app.get("/slow").headers["X-Request-ID"] != app.get("/slow").headers["X-Request-ID"]
+
+def test_traceSpan_outsideRequest():
+    assert getRequestId() is None
+    with traceSpan("nothing") as span:
+        assert span.trace is None
+
+@pytest.mark.asyncio
+async def test_singleFlight_sharedCallKeepsRequestId():
+    async def fetcher():
+        with traceSpan("static_upstream"):
+            return getRequestId()
+    trace = Trace("coalesced", "GET", "/api/v1/delivery-order-price")
+    token = tracing._current_trace.set(trace)
+    try:
+        assert await SingleFlight().do("helsinki", fetcher) == "coalesced"
+    finally:
+        tracing._current_trace.reset(token)
+    # The logs and spans of the shared call belong to the request which started it
+    assert [span[0] for span in trace.spans] == ["static_upstream"]
+
+def test_requestIdFilter_addsRequestId():
+    async def loggingApp(scope, receive, send):
+        record = logging.LogRecord("dopc", logging.INFO, __file__, 0, "message", (), None)
+        RequestIdFilter().filter(record)
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": record.request_id.encode()})
+    response = TestClient(TracingMiddleware(loggingApp, enabled=True, slow_threshold_ms=0)).get("/", headers={"X-Request-ID": "logged"})
+    assert response.text == "logged"
+
+def test_deliveryOrderPrice_serverTimingHasStages():
+    venue_data.venue_store.update("traced-venue", buildVenueRecord(STATIC_PAYLOAD, DYNAMIC_PAYLOAD))
+    try:
+        response = client.get("/api/v1/delivery-order-price", params={
+            "venue_slug": "traced-venue", "cart_value": 1000, "user_lat": 60.17094, "user_lon": 24.93087})
+    finally:
+        venue_data.venue_store.remove("traced-venue")
+    assert response.status_code == 200
+    stages = [part.split(";")[0] for part in response.headers["Server-Timing"].split(", ")]
+    # A venue in the venue store is priced without fetching its data
+    assert stages == ["validation", "distance", "fee", "total"]
+
+def test_debugTraces_requiresToken(monkeypatch):
+    monkeypatch.setattr("dopc.service.ADMIN_TOKEN", "secret")
+    assert client.get("/debug/traces").status_code == 401
+    response = client.get("/debug/traces", headers={"X-Admin-Token": "secret"})
+    assert response.status_code == 200
+    assert "traces" in response.json()
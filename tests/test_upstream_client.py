@@ -0,0 +1,33 @@
+import httpx
+import pytest
+from dopc.api_fetchers import fetchStaticData
+from dopc.resilience import resetCircuitBreakers
+from dopc.upstream_client import buildUpstreamClient, startUpstreamClient, closeUpstreamClient, getUpstreamClient
+
+
+def test_buildUpstreamClient_appliesTimeouts():
+    client = buildUpstreamClient(connect_timeout=1.5, read_timeout=2.5, pool_timeout=0.5)
+    assert client.timeout.connect == 1.5
+    assert client.timeout.read == 2.5
+    assert client.timeout.pool == 0.5
+
+@pytest.mark.asyncio
+async def test_sharedClient_isReusedByFetchers():
+    # Count requests going through the shared client's transport to make sure the fetchers use it
+    requests_seen = []
+    def handler(request):
+        requests_seen.append(request.url)
+        return httpx.Response(200, json={"venue_raw": {"location": {"coordinates": [24.9, 60.1]}}})
+
+    # Earlier tests may have opened the circuit of the real Home Assignment API host
+    resetCircuitBreakers()
+    await startUpstreamClient(transport=httpx.MockTransport(handler))
+    try:
+        shared_client = getUpstreamClient()
+        assert await fetchStaticData("home-assignment-venue-helsinki") == [24.9, 60.1]
+        assert await fetchStaticData("home-assignment-venue-helsinki") == [24.9, 60.1]
+        assert getUpstreamClient() is shared_client
+        assert len(requests_seen) == 2
+    finally:
+        await closeUpstreamClient()
+    assert getUpstreamClient() is None
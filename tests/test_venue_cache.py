@@ -0,0 +1,78 @@
+import asyncio
+import pytest
+from fastapi import HTTPException
+from dopc.venue_cache import VenueDataCache
+from tests.support import FakeClock
+
+
+def makeCache(fetcher, clock, max_entries=100):
+    return VenueDataCache("test", fetcher, ttl=10, stale_ttl=60, negative_ttl=5, max_entries=max_entries, clock=clock)
+
+@pytest.mark.asyncio
+async def test_venueDataCache_servesFreshEntriesWithoutFetching():
+    calls = []
+    async def fetcher(venue_slug):
+        calls.append(venue_slug)
+        return [24.9, 60.1]
+
+    cache = makeCache(fetcher, FakeClock())
+    assert await cache.get("helsinki") == [24.9, 60.1]
+    assert await cache.get("helsinki") == [24.9, 60.1]
+    assert calls == ["helsinki"]
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+@pytest.mark.asyncio
+async def test_venueDataCache_staleWhileRevalidate():
+    values = iter([1, 2])
+    async def fetcher(venue_slug):
+        return next(values)
+
+    clock = FakeClock()
+    cache = makeCache(fetcher, clock)
+    assert await cache.get("berlin") == 1
+    # Past the TTL, the stale value is served immediately and refreshed in the background
+    clock.now = 20
+    assert await cache.get("berlin") == 1
+    await asyncio.sleep(0)
+    await asyncio.sleep(0)
+    assert await cache.get("berlin") == 2
+    assert cache.stats()["stale_hits"] == 1
+    # Past the stale TTL, the value is fetched again on the request path
+    values = iter([3])
+    clock.now = 200
+    assert await cache.get("berlin") == 3
+
+@pytest.mark.asyncio
+async def test_venueDataCache_negativeCachesNotFound():
+    calls = []
+    async def fetcher(venue_slug):
+        calls.append(venue_slug)
+        raise HTTPException(status_code=404, detail="not found")
+
+    clock = FakeClock()
+    cache = makeCache(fetcher, clock)
+    for _ in range(3):
+        with pytest.raises(HTTPException) as exc_info:
+            await cache.get("potato")
+        assert exc_info.value.status_code == 404
+    assert calls == ["potato"]
+    assert cache.stats()["negative_hits"] == 2
+    # The negative entry expires after negative_ttl
+    clock.now = 6
+    with pytest.raises(HTTPException):
+        await cache.get("potato")
+    assert calls == ["potato", "potato"]
+
+@pytest.mark.asyncio
+async def test_venueDataCache_evictsLeastRecentlyUsed():
+    async def fetcher(venue_slug):
+        return venue_slug
+
+    cache = makeCache(fetcher, FakeClock(), max_entries=2)
+    await cache.get("a")
+    await cache.get("b")
+    await cache.get("a")
+    await cache.get("c")
+    assert "a" in cache and "c" in cache and "b" not in cache
+    assert cache.stats()["evictions"] == 1
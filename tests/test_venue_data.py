@@ -0,0 +1,101 @@
+import asyncio
+import pytest
+from fastapi import HTTPException
+from dopc import venue_data
+from dopc.pricing import PricingTable
+from dopc.single_flight import SingleFlight
+from dopc.resilience import DeadlineExceededError, setRequestDeadline, resetRequestDeadline, getRemainingTime
+
+
+@pytest.fixture
+def emptyVenueCaches():
+    # The caches are module level, so make sure no test sees another test's venues
+    venue_data.static_cache.clear()
+    venue_data.dynamic_cache.clear()
+    venue_data.geo_index.clear()
+    yield
+    venue_data.static_cache.clear()
+    venue_data.dynamic_cache.clear()
+    venue_data.geo_index.clear()
+
+@pytest.mark.asyncio
+async def test_singleFlight_coalescesConcurrentCalls():
+    calls = []
+    async def fetcher(venue_slug):
+        calls.append(venue_slug)
+        await asyncio.sleep(0.01)
+        return venue_slug.upper()
+
+    flight = SingleFlight()
+    results = await asyncio.gather(*(flight.do("berlin", fetcher, "berlin") for _ in range(50)))
+    assert results == ["BERLIN"] * 50
+    assert calls == ["berlin"]
+    assert flight.inFlight() == 0
+
+@pytest.mark.asyncio
+async def test_singleFlight_propagatesErrorsToAllCallers():
+    async def fetcher():
+        await asyncio.sleep(0.01)
+        raise HTTPException(status_code=404)
+
+    flight = SingleFlight()
+    results = await asyncio.gather(*(flight.do("potato", fetcher) for _ in range(3)), return_exceptions=True)
+    assert all(isinstance(result, HTTPException) and result.status_code == 404 for result in results)
+
+@pytest.mark.asyncio
+async def test_singleFlight_appliesEachCallersOwnDeadline():
+    deadlines = []
+    async def fetcher():
+        deadlines.append(getRemainingTime())
+        await asyncio.sleep(0.05)
+        return "ok"
+
+    async def callWithDeadline(timeout):
+        token = setRequestDeadline(timeout)
+        try:
+            return await flight.do("helsinki", fetcher)
+        finally:
+            resetRequestDeadline(token)
+
+    flight = SingleFlight()
+    impatient, patient = await asyncio.gather(callWithDeadline(0.01), callWithDeadline(4.0), return_exceptions=True)
+    assert isinstance(impatient, DeadlineExceededError)
+    assert patient == "ok"
+    # The shared call runs until the latest deadline of its callers, not the deadline of the caller which started it
+    [remaining] = deadlines
+    assert 3.5 < remaining <= 4.0
+
+@pytest.mark.asyncio
+async def test_getVenueData_fetchesConcurrently(monkeypatch, emptyVenueCaches):
+    async def fakeStatic(venue_slug):
+        await asyncio.sleep(0.05)
+        return [24.9, 60.1]
+    async def fakeDynamic(venue_slug):
+        await asyncio.sleep(0.05)
+        return 1000, 190, []
+    monkeypatch.setattr(venue_data, "fetchStaticData", fakeStatic)
+    monkeypatch.setattr(venue_data, "fetchDynamicData", fakeDynamic)
+
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    coordinates, pricing_table = await venue_data.getVenueData("home-assignment-venue-helsinki")
+    # Both fetches sleep 50ms, so running them one after the other would take at least 100ms
+    assert loop.time() - start < 0.09
+    assert coordinates == [24.9, 60.1]
+    assert isinstance(pricing_table, PricingTable)
+    assert pricing_table.minimum_order_value == 1000
+    assert pricing_table.delivery_base_price == 190
+
+@pytest.mark.asyncio
+async def test_getVenueData_prefersStaticError(monkeypatch, emptyVenueCaches):
+    async def failingStatic(venue_slug):
+        await asyncio.sleep(0.02)
+        raise HTTPException(status_code=404, detail="static")
+    async def failingDynamic(venue_slug):
+        raise HTTPException(status_code=404, detail="dynamic")
+    monkeypatch.setattr(venue_data, "fetchStaticData", failingStatic)
+    monkeypatch.setattr(venue_data, "fetchDynamicData", failingDynamic)
+
+    with pytest.raises(HTTPException) as exc_info:
+        await venue_data.getVenueData("home-assignment-venue-potato")
+    assert exc_info.value.detail == "static"
@@ -0,0 +1,112 @@
+import asyncio
+import random
+import httpx
+import pytest
+from dopc import venue_data, resilience
+from dopc.pricing import PricingTable
+from dopc.upstream_client import startUpstreamClient, closeUpstreamClient
+from dopc.venue_file import VenueFile, buildVenueFile, fetchVenueRecords
+from dopc.venue_store import VenueRecord
+from tests.test_venue_store import STATIC_PAYLOAD, DYNAMIC_PAYLOAD
+from tests.support import SPEC_DISTANCE_RANGES
+
+UNSORTED_DISTANCE_RANGES = [
+    {"min": 500, "max": 1000, "a": 100, "b": 0, "flag": None},
+    {"min": 0, "max": 600, "a": 0, "b": 2, "flag": None},
+    {"min": 1000, "max": 0, "a": 0, "b": 0, "flag": None},
+]
+
+
+def makeRecord(venue_lon, venue_lat, minimum_order_value, delivery_base_price, distance_ranges):
+    return VenueRecord([venue_lon, venue_lat], PricingTable(minimum_order_value, delivery_base_price, distance_ranges), 0, 0.0)
+
+
+@pytest.fixture
+def records():
+    return {
+        "home-assignment-venue-helsinki": makeRecord(24.92813512, 60.17012143, 1000, 190, SPEC_DISTANCE_RANGES),
+        "home-assignment-venue-berlin": makeRecord(13.4536149, 52.5003197, 1000, 190, UNSORTED_DISTANCE_RANGES),
+        "café-ünicode": makeRecord(18.0314984, 59.3466978, 0, 0, [{"min": 0, "max": 0, "a": 0, "b": 0, "flag": None}]),
+    }
+
+def test_venueFile_matchesCompiledPricingTables(tmp_path, records):
+    path = tmp_path / "venues.bin"
+    buildVenueFile(records, str(path))
+    venue_file = VenueFile(str(path))
+    assert len(venue_file) == 3
+    assert sorted(venue_file.venueSlugs()) == sorted(records)
+    rng = random.Random(0)
+    for venue_slug, record in records.items():
+        venue_coordinates, table = venue_file.get(venue_slug)
+        assert venue_coordinates == record.venue_coordinates
+        for _ in range(200):
+            cart_value, distance = rng.randrange(0, 2000), rng.randrange(0, 2500)
+            try:
+                expected = record.pricing_table.computeDeliveryFeeAndSurcharge(cart_value, distance)
+            except ValueError:
+                with pytest.raises(ValueError):
+                    table.computeDeliveryFeeAndSurcharge(cart_value, distance)
+            else:
+                assert table.computeDeliveryFeeAndSurcharge(cart_value, distance) == expected
+    assert venue_file.get("home-assignment-venue-tokyo") is None
+    assert "home-assignment-venue-tokyo" not in venue_file
+    venue_file.close()
+
+def test_venueFile_lookupsDoNotCopy(tmp_path, records):
+    path = tmp_path / "venues.bin"
+    buildVenueFile(records, str(path))
+    venue_file = VenueFile(str(path))
+    _, table = venue_file.get("home-assignment-venue-helsinki")
+    assert isinstance(table.range_min, memoryview)
+    assert venue_file.get("home-assignment-venue-helsinki")[1] is table
+
+def test_venueFile_rejectsInvalidFiles(tmp_path, records):
+    path = tmp_path / "venues.bin"
+    path.write_bytes(b"not a venue file at all, but long enough for a header")
+    with pytest.raises(ValueError):
+        VenueFile(str(path))
+    buildVenueFile(records, str(path))
+    path.write_bytes(path.read_bytes()[:-10])
+    with pytest.raises(ValueError, match="truncated"):
+        VenueFile(str(path))
+
+@pytest.mark.asyncio
+async def test_getVenueData_servedFromVenueFile(tmp_path, records, monkeypatch):
+    async def failingFetch(venue_slug):
+        raise AssertionError("The Home Assignment API must not be called for venues in the venue file")
+    monkeypatch.setattr(venue_data.static_cache, "get", failingFetch)
+    monkeypatch.setattr(venue_data.dynamic_cache, "get", failingFetch)
+    path = tmp_path / "venues.bin"
+    buildVenueFile(records, str(path))
+    venue_data.openVenueFile(str(path))
+    try:
+        venue_coordinates, table = await venue_data.getVenueData("home-assignment-venue-helsinki")
+        assert venue_coordinates == [24.92813512, 60.17012143]
+        assert table.computeDeliveryFeeAndSurcharge(1000, 177) == (190, 0)
+    finally:
+        venue_data.closeVenueFile()
+
+@pytest.mark.asyncio
+async def test_fetchVenueRecords_boundsConcurrencyAndReportsFailures(monkeypatch):
+    # Calls waiting longer than the acquire timeout for one of the few slots would be shed
+    monkeypatch.setattr(resilience, "UPSTREAM_MAX_CONCURRENCY", 10)
+    monkeypatch.setattr(resilience, "UPSTREAM_ACQUIRE_TIMEOUT", 0.01)
+    monkeypatch.setattr(resilience, "_limiter", None)
+
+    async def upstream(request):
+        await asyncio.sleep(0.02)
+        if "missing" in request.url.path:
+            return httpx.Response(404, json={})
+        return httpx.Response(200, json=STATIC_PAYLOAD if request.url.path.endswith("/static") else DYNAMIC_PAYLOAD)
+
+    venue_slugs = [f"venue-{idx}" for idx in range(60)] + ["missing-venue"]
+    await startUpstreamClient(transport=httpx.MockTransport(upstream))
+    try:
+        records, failures = await fetchVenueRecords(venue_slugs, max_concurrency=5)
+    finally:
+        await closeUpstreamClient()
+        resilience.resetCircuitBreakers()
+    assert len(records) == 60
+    assert records["venue-0"].venue_coordinates == [24.92813512, 60.17012143]
+    assert list(failures) == ["missing-venue"]
+    assert failures["missing-venue"].startswith("404")
@@ -0,0 +1,67 @@
+import copy
+import httpx
+import pytest
+from fastapi import HTTPException
+from dopc import api_fetchers, venue_parsing
+from dopc.venue_parsing import decodeJson, parseStaticPayload, parseDynamicPayload, InvalidVenuePayloadError
+
+STATIC_PAYLOAD = {"venue_raw": {"location": {"coordinates": [24.92813512, 60.17012143]}, "name": "Helsinki"}}
+DYNAMIC_PAYLOAD = {"venue_raw": {"delivery_specs": {
+    "order_minimum_no_surcharge": 1000,
+    "delivery_pricing": {"base_price": 190, "distance_ranges": [
+        {"min": 0, "max": 500, "a": 0, "b": 0, "flag": None},
+        {"min": 500, "max": 1000, "a": 100, "b": 0, "flag": None},
+        {"min": 1000, "max": 0, "a": 0, "b": 0, "flag": None},
+    ]},
+}}}
+
+
+def withRanges(distance_ranges):
+    payload = copy.deepcopy(DYNAMIC_PAYLOAD)
+    payload["venue_raw"]["delivery_specs"]["delivery_pricing"]["distance_ranges"] = distance_ranges
+    return payload
+
+def test_parsePayloads_extractFields():
+    assert parseStaticPayload(STATIC_PAYLOAD).coordinates == [24.92813512, 60.17012143]
+    specs = parseDynamicPayload(DYNAMIC_PAYLOAD)
+    assert (specs.minimum_order_value, specs.delivery_base_price, len(specs.distance_ranges)) == (1000, 190, 3)
+
+@pytest.mark.parametrize("payload, message", [
+    ({"venue_raw": {}}, "venue_raw.location"),
+    ({"venue_raw": {"location": {"coordinates": [24.9]}}}, "pair"),
+    ({"venue_raw": {"location": {"coordinates": [24.9, 91]}}}, "out of range"),
+    ({"venue_raw": {"location": {"coordinates": ["24.9", 60.1]}}}, "must be a number"),
+])
+def test_parseStaticPayload_rejectsMalformedData(payload, message):
+    with pytest.raises(InvalidVenuePayloadError, match=message):
+        parseStaticPayload(payload)
+
+@pytest.mark.parametrize("distance_ranges, message", [
+    ([], "non-empty"),
+    ([{"min": 0, "max": 500, "a": 0, "b": 0}, {"min": 600, "max": 0, "a": 0, "b": 0}], "contiguous"),
+    ([{"min": 0, "max": 500, "a": 0, "b": 0}, {"min": 500, "max": 1000, "a": 0, "b": 0}], "last distance range"),
+    ([{"min": 0, "max": 500, "a": -1, "b": 0}, {"min": 500, "max": 0, "a": 0, "b": 0}], "a must be a number"),
+    ([{"min": 0, "max": 500, "a": 0}, {"min": 500, "max": 0, "a": 0, "b": 0}], r"distance_ranges\[0\].b"),
+])
+def test_parseDynamicPayload_rejectsMalformedRanges(distance_ranges, message):
+    with pytest.raises(InvalidVenuePayloadError, match=message):
+        parseDynamicPayload(withRanges(distance_ranges))
+
+@pytest.mark.parametrize("use_orjson", [False, True])
+def test_decodeJson_rejectsInvalidJson(monkeypatch, use_orjson):
+    if use_orjson and not venue_parsing.HAVE_ORJSON:
+        pytest.skip("orjson is not installed")
+    if not use_orjson:
+        monkeypatch.setattr(venue_parsing, "orjson", None)
+    assert decodeJson(b'{"a": [1, 2.5]}') == {"a": [1, 2.5]}
+    with pytest.raises(InvalidVenuePayloadError):
+        decodeJson(b'{"a": ')
+
+@pytest.mark.asyncio
+async def test_fetchDynamicData_malformedPayloadIs502(monkeypatch):
+    async def fakeGetFromUpstream(url):
+        return httpx.Response(200, json=withRanges([{"min": 0, "max": 500, "a": 0, "b": 0}]))
+    monkeypatch.setattr(api_fetchers, "getFromUpstream", fakeGetFromUpstream)
+    with pytest.raises(HTTPException) as exc_info:
+        await api_fetchers.fetchDynamicData("home-assignment-venue-helsinki")
+    assert exc_info.value.status_code == 502
@@ -0,0 +1,102 @@
+import json
+import pytest
+from fastapi.testclient import TestClient
+from dopc import service, venue_data
+from dopc.service import dopc
+from dopc.venue_store import VenueStore, buildVenueRecord, parseSnapshotLines
+
+client = TestClient(dopc, headers={"X-Admin-Token": "secret"})
+
+STATIC_PAYLOAD = {"venue_raw": {"location": {"coordinates": [24.92813512, 60.17012143]}}}
+DYNAMIC_PAYLOAD = {"venue_raw": {"delivery_specs": {
+    "order_minimum_no_surcharge": 1000,
+    "delivery_pricing": {"base_price": 190, "distance_ranges": [
+        {"min": 0, "max": 500, "a": 0, "b": 0, "flag": None},
+        {"min": 500, "max": 1000, "a": 100, "b": 0, "flag": None},
+        {"min": 1000, "max": 0, "a": 0, "b": 0, "flag": None},
+    ]},
+}}}
+
+
+def makeSnapshotLine(venue_slug: str) -> str:
+    return json.dumps({"venue_slug": venue_slug, "static": STATIC_PAYLOAD, "dynamic": DYNAMIC_PAYLOAD})
+
+
+@pytest.fixture
+def emptyVenueStore(monkeypatch):
+    # The store is module level, so make sure no test sees another test's venues
+    monkeypatch.setattr(service, "ADMIN_TOKEN", "secret")
+    venue_data.venue_store.swap({})
+    yield venue_data.venue_store
+    venue_data.venue_store.swap({})
+
+def test_parseSnapshotLines_keepsLastLinePerVenue():
+    lines = [makeSnapshotLine("helsinki"), "", makeSnapshotLine("berlin"), makeSnapshotLine("helsinki")]
+    records = parseSnapshotLines(lines)
+    assert sorted(records) == ["berlin", "helsinki"]
+    assert records["helsinki"].venue_coordinates == [24.92813512, 60.17012143]
+    assert records["helsinki"].pricing_table.delivery_base_price == 190
+
+def test_parseSnapshotLines_reportsInvalidLine():
+    with pytest.raises(ValueError, match="line 2"):
+        parseSnapshotLines([makeSnapshotLine("helsinki"), json.dumps({"venue_slug": "berlin", "static": {}, "dynamic": DYNAMIC_PAYLOAD})])
+
+def test_parseSnapshotLines_rejectsNonStringSlug():
+    with pytest.raises(ValueError, match="line 1: venue_slug must be a string"):
+        parseSnapshotLines([json.dumps({"venue_slug": 42, "static": STATIC_PAYLOAD, "dynamic": DYNAMIC_PAYLOAD})])
+
+def test_venueStore_swapAndUpdateAreVersioned():
+    store = VenueStore()
+    assert store.get("helsinki") is None
+    assert store.swap(parseSnapshotLines([makeSnapshotLine("helsinki")])) == 1
+    assert store.get("helsinki")[0] == [24.92813512, 60.17012143]
+    assert store.update("berlin", buildVenueRecord(STATIC_PAYLOAD, DYNAMIC_PAYLOAD)) == 2
+    assert store.getRecord("berlin").version == 2
+    assert store.getRecord("helsinki").version == 1
+    # A new snapshot replaces every venue
+    store.swap(parseSnapshotLines([makeSnapshotLine("tokyo")]))
+    assert "berlin" not in store and "tokyo" in store
+    assert store.stats() == {"entries": 1, "version": 3, "hits": 1, "misses": 1}
+
+def test_getDeliveryOrderPrice_servedFromVenueStore(emptyVenueStore, monkeypatch):
+    async def failingFetch(venue_slug):
+        raise AssertionError("The Home Assignment API must not be called for venues in the store")
+    monkeypatch.setattr(venue_data.static_cache, "get", failingFetch)
+    monkeypatch.setattr(venue_data.dynamic_cache, "get", failingFetch)
+
+    response = client.post("/admin/venues/snapshot", content="\n".join([makeSnapshotLine("pushed-venue")]))
+    assert response.status_code == 200
+    assert response.json()["venues"] == 1
+    response = client.get("/api/v1/delivery-order-price", params={
+        "venue_slug": "pushed-venue", "cart_value": 1000, "user_lat": 60.17094, "user_lon": 24.93087})
+    assert response.status_code == 200
+    assert response.json()["total_price"] == 1190
+
+def test_adminVenueEndpoints_updateAndRemove(emptyVenueStore):
+    response = client.put("/admin/venues/pushed-venue", json={"static": STATIC_PAYLOAD, "dynamic": DYNAMIC_PAYLOAD})
+    assert response.status_code == 200
+    assert "pushed-venue" in emptyVenueStore
+    assert client.put("/admin/venues/pushed-venue", json={"static": {}, "dynamic": DYNAMIC_PAYLOAD}).status_code == 400
+    assert client.delete("/admin/venues/pushed-venue").status_code == 200
+    assert client.delete("/admin/venues/pushed-venue").status_code == 404
+    # An invalid snapshot leaves the store unchanged
+    version = emptyVenueStore.version
+    assert client.post("/admin/venues/snapshot", content="not json").status_code == 400
+    assert emptyVenueStore.version == version
+
+def test_adminVenueEndpoints_requireToken(emptyVenueStore):
+    assert client.get("/admin/venues", headers={"X-Admin-Token": "wrong"}).status_code == 401
+    assert client.get("/admin/venues").status_code == 200
+
+def test_adminVenueEndpoints_closedWithoutToken(emptyVenueStore, monkeypatch):
+    local_client = TestClient(dopc, client=("127.0.0.1", 50000))
+    remote_client = TestClient(dopc, client=("203.0.113.7", 50000))
+    monkeypatch.setattr(service, "ADMIN_TOKEN", None)
+    # Behind a reverse proxy on the same host, every request comes from a loopback address
+    assert local_client.post("/admin/venues/snapshot", content=makeSnapshotLine("pushed-venue")).status_code == 403
+    assert remote_client.get("/debug/traces").status_code == 403
+    assert "pushed-venue" not in emptyVenueStore
+    # Without a proxy, loopback clients can be let in explicitly
+    monkeypatch.setattr(service, "ADMIN_ALLOW_LOOPBACK", True)
+    assert local_client.get("/admin/venues").status_code == 200
+    assert remote_client.get("/admin/venues").status_code == 403